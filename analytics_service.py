@@ -0,0 +1,337 @@
+import numpy as np
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qsl
+
+import live_state
+import param_sweep
+import results_store
+from horse_events import load_events
+from strategy_engine import make_spec, run_strategies, simulator_specs
+from streaks import streaks, STREAMS
+
+INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
+STATE_FILE = r"c:\Users\Admin\Desktop\SniperStrategyProject\live_state.json"
+
+HOST = '127.0.0.1'
+PORT = 8765
+SOCKET_PATH = None # Serve on this Unix socket instead of HOST:PORT
+WORKERS = 2 # Process pool for backtests and sweeps
+MEMO_SIZE = 256 # Backtest / sweep results kept in memory (LRU)
+MAX_BODY = 1 << 20
+SWEEP_TOP = 20
+MAX_SWEEP_CONFIGS = 5000 # Product of the axis lengths; bigger grids are rejected (400)
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+SWEEP_AXES = ('step_mults', 'recovery_mults', 'entry_gaps', 'max_steps', 'base_stakes')
+
+_WORKER_EVENTS = None
+_WORKER_CSV = None
+
+
+def _init_worker(csv_path):
+    global _WORKER_EVENTS, _WORKER_CSV
+    _WORKER_CSV = csv_path
+    _WORKER_EVENTS = load_events(csv_path)
+    run_strategies(_WORKER_EVENTS, [make_spec()], record=False) # Compiles the kernel before the first query
+
+
+def _ready():
+    return os.getpid()
+
+
+def _backtest(specs):
+    """Summary numbers of each spec (no per-event arrays), run in a pool worker."""
+    return [{k: v for k, v in res.items() if not isinstance(v, np.ndarray)}
+            for res in run_strategies(_WORKER_EVENTS, specs, record=False)]
+
+
+def _sweep(grid, payout_odds):
+    return param_sweep.sweep(**grid, csv_path=_WORKER_CSV, payout_odds=payout_odds)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def streak_stats(events, stream='all'):
+    """
+    Closed-streak distribution of one stream plus where the open streak
+    stands in it: the share of closed streaks that lasted longer, and the
+    chance it breaks on the next event given it got this far.
+    """
+    st = streaks(events, stream)
+    closed = st['length'][~st['censored']]
+    current = int(st['length'][-1]) if len(closed) < len(st['length']) else 0
+    reached = int(np.sum(closed >= current))
+    return {
+        'stream': stream,
+        'streaks': len(closed),
+        'mean': float(closed.mean()) if len(closed) else None,
+        'median': float(np.median(closed)) if len(closed) else None,
+        'p90': float(np.percentile(closed, 90)) if len(closed) else None,
+        'max': int(closed.max()) if len(closed) else None,
+        'current': current,
+        'longer_pct': float(np.mean(closed > current) * 100) if len(closed) else None,
+        'break_next_pct': float(np.sum(closed == current) / reached * 100) if reached else None,
+        'histogram': np.bincount(closed).tolist(),
+    }
+
+
+class AnalyticsService:
+    """
+    Keeps the events, streak stats and live strategy state in memory and
+    answers JSON queries over HTTP. Quick lookups are answered on the event
+    loop; backtests and sweeps go to a process pool and are memoized, so a
+    repeated query costs a dict lookup. The data is reloaded (and the pool
+    restarted) when the CSV or the state file changes.
+    """
+
+    def __init__(self, csv_path=INPUT_CSV, state_path=STATE_FILE, workers=WORKERS):
+        self.csv_path = csv_path
+        self.state_path = state_path
+        self.workers = workers
+        self.pool = None
+        self.source = None
+        self.state_mtime = None
+        self.memo = OrderedDict()
+        self._reload = asyncio.Lock()
+        self.routes = {
+            ('GET', '/health'): self.health,
+            ('GET', '/streaks'): self.streaks,
+            ('GET', '/next-bet'): self.next_bet,
+            ('POST', '/backtest'): self.backtest,
+            ('POST', '/sweep'): self.sweep,
+        }
+
+    # --- Data ---
+
+    def _load(self):
+        """Everything the quick queries need, built off the event loop."""
+        ev = load_events(self.csv_path)
+        stats = {s: streak_stats(ev, s) for s in STREAMS}
+        presets = {spec['name']: spec for spec in simulator_specs()}
+        return ev, stats, presets
+
+    def _load_state(self):
+        if os.path.exists(self.state_path):
+            return live_state.load_state(self.state_path), os.stat(self.state_path).st_mtime_ns
+        return live_state.bootstrap(self.csv_path), None
+
+    async def refresh(self):
+        """Reloads what changed on disk since the last query (a stat call otherwise)."""
+        source = results_store.source_stat(self.csv_path)
+        state_mtime = os.stat(self.state_path).st_mtime_ns if os.path.exists(self.state_path) else None
+        if source == self.source and state_mtime == self.state_mtime:
+            return
+        async with self._reload:
+            if source == self.source and state_mtime == self.state_mtime:
+                return # Reloaded by a concurrent query
+            loop = asyncio.get_running_loop()
+            if source != self.source:
+                self.events, self.stream_stats, self.presets = await loop.run_in_executor(None, self._load)
+                self.memo.clear()
+                if self.pool is not None:
+                    self.pool.shutdown(wait=False)
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                initargs=(self.csv_path,))
+                # Start (and warm) every worker now rather than on the first heavy query
+                for _ in range(self.workers):
+                    self.pool.submit(_ready)
+            self.state, self.state_mtime = await loop.run_in_executor(None, self._load_state)
+            self.source = source
+
+    async def _memoized(self, key, make):
+        """Awaits make() once per key; concurrent and later callers share the result."""
+        if key in self.memo:
+            self.memo.move_to_end(key)
+        else:
+            self.memo[key] = asyncio.ensure_future(make())
+            while len(self.memo) > MEMO_SIZE:
+                self.memo.popitem(last=False)
+        task = self.memo[key]
+        try:
+            return await task
+        except Exception:
+            self.memo.pop(key, None)
+            raise
+
+    def _pooled(self, key, fn, *args):
+        """fn(*args) on the process pool, memoized."""
+        return self._memoized(key, lambda: asyncio.get_running_loop().run_in_executor(self.pool, fn, *args))
+
+    # --- Queries ---
+
+    async def health(self, params):
+        return {
+            'status': 'ok',
+            'events': len(self.events['winner']),
+            'last_date': str(self.events['dates'][-1]) if len(self.events['dates']) else None,
+            'state_date': self.state['date'],
+            'memo': len(self.memo),
+        }
+
+    async def streaks(self, params):
+        stream = params.get('stream', 'all')
+        if stream not in STREAMS:
+            raise ValueError(f"Unknown streak stream {stream!r}, expected one of {STREAMS}")
+        return self.stream_stats[stream]
+
+    async def next_bet(self, params):
+        """
+        live_state.instructions for the next race. `results` = today's winners
+        so far ("3,7"), simulated on top of the state; `date` optional.
+        """
+        results = params.get('results')
+        if isinstance(results, str):
+            results = [int(r) for r in results.split(',') if r.strip()]
+        out = live_state.instructions(self.state, results, params.get('date'))
+        out.update({'date': self.state['date'], 'bankroll': self.state['kernel'][live_state.ST_BANKROLL]})
+        return out
+
+    def _spec(self, fields):
+        fields = dict(fields)
+        preset = fields.pop('preset', None)
+        if preset is not None and preset not in self.presets:
+            raise ValueError(f"Unknown preset {preset!r}, expected one of {sorted(self.presets)}")
+        return make_spec(self.presets.get(preset), **fields)
+
+    async def backtest(self, params):
+        """Body: spec fields (optionally "preset": simulator name), or {"specs": [...]}."""
+        specs = [self._spec(p) for p in params['specs']] if 'specs' in params else [self._spec(params)]
+        key = ('backtest', json.dumps(specs, sort_keys=True, default=_json_default))
+        return {'results': await self._pooled(key, _backtest, specs)}
+
+    async def sweep(self, params):
+        """
+        Body: the sweep axes (param_sweep.sweep), then the slice to return:
+        "where" (column -> value), "sort" (column), "ascending", "top".
+        """
+        unknown = set(params) - set(SWEEP_AXES) - {'payout_odds', 'where', 'sort', 'ascending', 'top'}
+        if unknown:
+            raise ValueError(f"Unknown sweep field(s) {sorted(unknown)}, axes are {SWEEP_AXES}")
+        grid = {axis: list(params[axis]) for axis in SWEEP_AXES}
+        configs = int(np.prod([len(values) for values in grid.values()]))
+        if configs > MAX_SWEEP_CONFIGS:
+            raise ValueError(f"Sweep of {configs} configs is over the {MAX_SWEEP_CONFIGS} limit, narrow the axes")
+        payout_odds = float(params.get('payout_odds', param_sweep.PAYOUT_ODDS))
+        key = ('sweep', json.dumps([grid, payout_odds], sort_keys=True))
+        view = {k: params.get(k) for k in ('where', 'sort', 'ascending', 'top')}
+        # The slice is memoized too: filtering and sorting the table costs more than the lookup
+        return await self._memoized(key + (json.dumps(view, sort_keys=True),),
+                                    lambda: self._sweep_slice(key, grid, payout_odds, params))
+
+    async def _sweep_slice(self, key, grid, payout_odds, params):
+        table = await self._pooled(key, _sweep, grid, payout_odds)
+        for column, value in (params.get('where') or {}).items():
+            if column not in table.columns:
+                raise ValueError(f"Unknown sweep column {column!r}, expected one of {list(table.columns)}")
+            table = table[np.isclose(table[column], value)]
+        sort = params.get('sort', 'net_profit')
+        if sort not in table.columns:
+            raise ValueError(f"Unknown sweep column {sort!r}, expected one of {list(table.columns)}")
+        table = table.sort_values(sort, ascending=bool(params.get('ascending', False)))
+        # JSON has no NaN / inf
+        rows = table.head(int(params.get('top', SWEEP_TOP))).replace([np.inf, -np.inf], np.nan)
+        return {'configs': len(table), 'rows': rows.astype(object).where(rows.notna(), None).to_dict('records')}
+
+    # --- HTTP ---
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            allowed = [m for m, path in self.routes if path == url.path]
+            return (405, {'error': f"{method} not allowed, use {allowed}"}) if allowed else \
+                   (404, {'error': f"Unknown query {url.path!r}", 'queries': sorted({p for _, p in self.routes})})
+        try:
+            params = dict(parse_qsl(url.query, keep_blank_values=True))
+            if body:
+                params.update(json.loads(body))
+            await self.refresh()
+            return 200, await handler(params)
+        except (ValueError, TypeError, KeyError) as e:
+            return 400, {'error': f"{type(e).__name__}: {e}"}
+        except Exception as e:
+            return 500, {'error': f"{type(e).__name__}: {e}"}
+
+    async def handle(self, reader, writer):
+        """One connection, kept alive for as many requests as the client sends."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                method, target, _ = line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY:
+                    status, payload, elapsed = 413, {'error': f"Body over {MAX_BODY} bytes"}, 0.0
+                    headers['connection'] = 'close'
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    t0 = time.perf_counter()
+                    status, payload = await self.dispatch(method.upper(), target, body)
+                    elapsed = (time.perf_counter() - t0) * 1000
+                data = json.dumps(payload, default=_json_default).encode()
+                keep = headers.get('connection', '').lower() != 'close'
+                writer.write((f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                              f"Content-Type: application/json\r\n"
+                              f"Content-Length: {len(data)}\r\n"
+                              f"X-Response-Time: {elapsed:.3f}ms\r\n"
+                              f"Connection: {'keep-alive' if keep else 'close'}\r\n\r\n").encode() + data)
+                await writer.drain()
+                if not keep:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT, socket_path=SOCKET_PATH):
+        await self.refresh()
+        if socket_path:
+            server = await asyncio.start_unix_server(self.handle, path=socket_path)
+            where = socket_path
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            where = f"http://{host}:{port}"
+        print(f"Analytics service on {where} ({len(self.events['winner'])} events, {self.workers} workers)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(wait=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Warm analytics service for the Node backend")
+    parser.add_argument('--csv', default=INPUT_CSV)
+    parser.add_argument('--state', default=STATE_FILE)
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--socket', default=SOCKET_PATH, help="Unix socket path (instead of host:port)")
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    args = parser.parse_args()
+    service = AnalyticsService(args.csv, args.state, args.workers)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
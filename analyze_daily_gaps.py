@@ -1,82 +1,116 @@
 import pandas as pd
 import numpy as np
 
+from horse_events import load_game_events
+import result_cache
+
 INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
 
+
+def repeat_days(ev):
+    """
+    One entry per (game, date): game code and whether any race that day
+    repeated an earlier winner. Rows sharing a date (dedupe=False) count
+    as one day.
+    """
+    series, dates = ev['day_series'], ev['dates']
+    new_day = np.ones(len(dates), dtype=bool)
+    new_day[1:] = (series[1:] != series[:-1]) | (dates[1:] != dates[:-1])
+    day_of_row = np.cumsum(new_day) - 1
+    repeats = np.bincount(day_of_row[ev['date_idx']], weights=ev['is_repeat'], minlength=int(new_day.sum()))
+    return series[new_day], repeats > 0
+
+
+def cold_runs(has_repeat, group):
+    """
+    Cold days before each repeat day (0 = repeat on the very next day),
+    counted from the game's previous repeat day or its first day; a cold
+    run still open at the end is left out. Returns (gaps, game of each).
+    """
+    rep = np.nonzero(has_repeat)[0]
+    first_day = np.searchsorted(group, group[rep], side='left')
+    prev = np.concatenate(([-1], rep[:-1]))
+    same_game = (prev >= 0) & (group[np.maximum(prev, 0)] == group[rep])
+    start = np.where(same_game, prev + 1, first_day)
+    return rep - start, group[rep]
+
+
+def grouped_percentile(values, group, n_groups, q):
+    """np.percentile (linear) of each group's values, NaN for empty groups."""
+    order = np.lexsort((values, group))
+    v = values[order].astype(np.float64)
+    counts = np.bincount(group, minlength=n_groups)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    out = np.full(n_groups, np.nan)
+    has = counts > 0
+    pos = (counts[has] - 1) * (q / 100)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, counts[has] - 1)
+    t = pos - lo
+    a, b = v[offsets[has] + lo], v[offsets[has] + hi]
+    # Same lerp as numpy, so results match np.percentile exactly
+    diff = b - a
+    out[has] = np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+    return out
+
+
+def daily_gap_stats(ev):
+    """
+    Day-level repeat / cold-streak stats for every game in one pass.
+    Returns (stats, distribution): stats has one row per game (days,
+    repeat days and rate, average / max / P90 gap), distribution one
+    column per game with the count of each cold-run length.
+    """
+    names = ev.get('names', [''])
+    group, has_repeat = repeat_days(ev)
+    gaps, gap_group = cold_runs(has_repeat, group)
+    n = len(names)
+    n_gaps = np.bincount(gap_group, minlength=n)
+    max_gap = np.zeros(n, dtype=np.int64)
+    np.maximum.at(max_gap, gap_group, gaps)
+
+    days = np.bincount(group, minlength=n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stats = pd.DataFrame({
+            'days': days,
+            'repeat_days': np.bincount(group, weights=has_repeat, minlength=n).astype(np.int64),
+            'avg_gap': np.where(n_gaps > 0, np.bincount(gap_group, weights=gaps, minlength=n) / n_gaps, 0.0),
+            'max_gap': max_gap,
+            'p90_gap': np.nan_to_num(grouped_percentile(gaps, gap_group, n, 90)),
+        }, index=pd.Index(names, name='game'))
+    stats.insert(2, 'repeat_rate', stats['repeat_days'] / stats['days'] * 100)
+
+    table = np.zeros((int(gaps.max(initial=0)) + 1, n), dtype=np.int64)
+    np.add.at(table, (gaps, gap_group), 1)
+    distribution = pd.DataFrame(table, columns=pd.Index(names, name='game'))
+    distribution.index.name = 'gap'
+    return stats, distribution
+
+
 def analyze_daily_gaps():
-    df = pd.read_csv(INPUT_CSV)
-    df['Date'] = pd.to_datetime(df['Date'])
-    df = df.sort_values('Date')
-    
-    unique_dates = df['Date'].unique()
-    
-    daily_results = []
-    
-    for dt in unique_dates:
-        day_rows = df[df['Date'] == dt]
-        day_has_repeat = False
-        
-        # Reconstruct day logic
-        # We need to iterate rows for that day? Usually 1 row per day.
-        for idx, row in day_rows.iterrows():
-            races = []
-            for r_col in ['R1', 'R2', 'R3', 'R4']:
-                val = str(row[r_col]).strip()
-                if val.endswith('.0'): val = val[:-2]
-                if val and val.isdigit(): races.append(val)
-            
-            if not races: continue
-            
-            day_winners = [races[0]]
-            for winner in races[1:]:
-                if winner in day_winners:
-                    day_has_repeat = True
-                day_winners.append(winner)
-        
-        daily_results.append({
-            'Date': dt,
-            'HasRepeat': day_has_repeat
-        })
-        
-    # Analyze Consecutive Days without Repeat
-    day_gaps = []
-    current_day_gap = 0
-    
-    for res in daily_results:
-        if res['HasRepeat']:
-            if current_day_gap > 0:
-                day_gaps.append(current_day_gap)
-            else:
-                day_gaps.append(0) # Immediate repeat day
-            current_day_gap = 0
-        else:
-            current_day_gap += 1
-            
-    # Stats
-    total_days = len(daily_results)
-    days_with_repeat = sum(1 for r in daily_results if r['HasRepeat'])
-    repeat_rate = (days_with_repeat / total_days) * 100
-    
-    avg_gap = np.mean(day_gaps) if day_gaps else 0
-    max_gap = np.max(day_gaps) if day_gaps else 0
-    p90_gap = np.percentile(day_gaps, 90) if day_gaps else 0
-    
-    print(f"Total Days Analyzed: {total_days}")
-    print(f"Days WITH Repetition: {days_with_repeat} ({repeat_rate:.1f}%)")
-    print(f"Days WITHOUT Repetition: {total_days - days_with_repeat}")
-    
-    print(f"\n--- Gap Analysis (Consecutive Days without ANY repeat) ---")
-    print(f"Average Gap: {avg_gap:.2f} Days")
-    print(f"Max Gap Seen: {max_gap} Days")
-    print(f"P90 Gap: {p90_gap:.1f} Days")
-    
-    print("\nGap Distribution (How long do cold streaks last?):")
-    gap_counts = {}
-    for g in day_gaps:
-        gap_counts[g] = gap_counts.get(g, 0) + 1
-        
-    for g in sorted(gap_counts.keys()):
-        print(f"Gap {g} Days: {gap_counts[g]} occurrences")
+    ev = load_game_events(INPUT_CSV, dedupe=False)
+    stats, distribution = result_cache.on_events(ev, daily_gap_stats)
+
+    for game, s in stats.iterrows():
+        if len(stats) > 1:
+            print(f"\n=== {game} ===")
+        total_days, days_with_repeat = int(s['days']), int(s['repeat_days'])
+
+        print(f"Total Days Analyzed: {total_days}")
+        print(f"Days WITH Repetition: {days_with_repeat} ({s['repeat_rate']:.1f}%)")
+        print(f"Days WITHOUT Repetition: {total_days - days_with_repeat}")
+
+        print(f"\n--- Gap Analysis (Consecutive Days without ANY repeat) ---")
+        print(f"Average Gap: {s['avg_gap']:.2f} Days")
+        print(f"Max Gap Seen: {int(s['max_gap'])} Days")
+        print(f"P90 Gap: {s['p90_gap']:.1f} Days")
+
+        print("\nGap Distribution (How long do cold streaks last?):")
+        counts = distribution[game]
+        for g, c in counts[counts > 0].items():
+            print(f"Gap {g} Days: {c} occurrences")
+
+    return stats, distribution
 
 if __name__ == '__main__':
     analyze_daily_gaps()
@@ -1,7 +1,9 @@
-import pandas as pd
 import numpy as np
 import os
 
+from horse_events import load_events
+from streaks import streaks
+
 INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
 
 def analyze_streaks():
@@ -9,49 +11,20 @@ def analyze_streaks():
         print("Data file not found.")
         return
 
-    df = pd.read_csv(INPUT_CSV)
-    df['Date'] = pd.to_datetime(df['Date'])
-    df = df.drop_duplicates(subset=['Date'])
-    df = df.sort_values('Date')
-    
-    # Flatten checks
-    outcomes = [] # 1 if Repeat, 0 if No Repeat
-    
-    for idx, row in df.iterrows():
-        races = []
-        for r_col in ['R1', 'R2', 'R3', 'R4']:
-            val = str(row[r_col]).strip()
-            if val.endswith('.0'): val = val[:-2]
-            if val and val.isdigit(): races.append(val)
-        if not races: continue
-
-        # Race 1: Is it a repeat of previous? Daily prevs are empty.
-        # But we treat R1 as a "Non-Repeat" event for Gap counting.
-        # So Outcome=0.
-        outcomes.append(0)
-        
-        day_winners = [races[0]]
-        for i, winner in enumerate(races[1:], start=2):
-            is_rep = (winner in day_winners)
-            outcomes.append(1 if is_rep else 0)
-            day_winners.append(winner)
-            
-    # Calculate Gaps (Lengths of consecutive 0s)
-    streaks = []
-    current = 0
-    for res in outcomes:
-        if res == 0:
-            current += 1
-        else:
-            if current > 0:
-                streaks.append(current)
-            current = 0
-    if current > 0: streaks.append(current)
+    ev = load_events(INPUT_CSV)
     
-    streaks = np.array(streaks)
+    # 1 if Repeat, 0 if No Repeat
+    # Race 1: Is it a repeat of previous? Daily prevs are empty.
+    # But we treat R1 as a "Non-Repeat" event for Gap counting.
+    # Gaps = lengths of consecutive 0s (empty ones skipped). The open streak
+    # at the end counts for "reached", never as having ended.
+    st = streaks(ev)
+    nonempty = st['length'] > 0
+    lengths = st['length'][nonempty]
+    ended = ~st['censored'][nonempty]
     
-    print(f"Total Sequences Analyzed: {len(streaks)}")
-    print(f"Max Streak Length: {streaks.max()}")
+    print(f"Total Sequences Analyzed: {len(lengths)}")
+    print(f"Max Streak Length: {lengths.max()}")
     
     # Analysis Points
     # Strategy: Wait 4, Stop 6.
@@ -59,10 +32,10 @@ def analyze_streaks():
     # 1st Stop Loss Point: Gap 10 (4 + 6).
     # 2nd Stop Loss Point: Gap 16/17 approx (10 + 6 more bets).
     
-    count_reach_4 = np.sum(streaks >= 4)
-    count_reach_10 = np.sum(streaks >= 10)
-    count_reach_17 = np.sum(streaks >= 17)
-    count_reach_23 = np.sum(streaks >= 23)
+    count_reach_4 = np.sum(lengths >= 4)
+    count_reach_10 = np.sum(lengths >= 10)
+    count_reach_17 = np.sum(lengths >= 17)
+    count_reach_23 = np.sum(lengths >= 23)
     
     print(f"\n--- Streak Survival Analysis ---")
     print(f"Reached Gap 4 (Entry): {count_reach_4}")
@@ -89,8 +62,8 @@ def analyze_streaks():
     
     print(f"\n--- Deep Dive on Critical Zone (Gap 10 to 17) ---")
     # Count where streaks ended between 10 and 16
-    ends_in_zone = np.sum((streaks >= 10) & (streaks < 17))
-    continues_past = np.sum(streaks >= 17)
+    ends_in_zone = np.sum(ended & (lengths >= 10) & (lengths < 17))
+    continues_past = np.sum(lengths >= 17)
     
     print(f"Streaks ending between Gap 10-16 (Recovery Zone): {ends_in_zone}")
     print(f"Streaks continuing past Gap 16 (Danger Zone): {continues_past}")
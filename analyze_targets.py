@@ -1,37 +1,17 @@
-import pandas as pd
-import ast
+from horse_events import load_events
+from pricing import price
 
 INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
 
 def analyze():
-    df = pd.read_csv(INPUT_CSV)
+    ev = load_events(INPUT_CSV, dedupe=False)
     
-    # Re-construct events logic briefly to get targets
-    r2_targets = []
-    r3_targets = []
-    r4_targets = []
-    
-    for _, row in df.iterrows():
-        # Get races
-        races = []
-        for c in ['R1','R2','R3','R4']:
-            val = str(row[c]).strip()
-            if val.endswith('.0'): val = val[:-2]
-            if val and val.isdigit(): races.append(val)
-            
-        if len(races) < 4: continue # Focus on full days for fair comparison
-        
-        # R2 targets = [R1]
-        t2 = {races[0]}
-        r2_targets.append(len(t2))
-        
-        # R3 targets = [R1, R2]
-        t3 = {races[0], races[1]}
-        r3_targets.append(len(t3))
-        
-        # R4 targets = [R1, R2, R3]
-        t4 = {races[0], races[1], races[2]}
-        r4_targets.append(len(t4))
+    # Focus on full days for fair comparison
+    full = ev['day_counts'][ev['date_idx']] == 4
+    # Distinct numbers available to bet on, same count the simulators are charged
+    targets = price(ev)['targets'][full]
+    race = ev['race'][full]
+    r2_targets, r3_targets, r4_targets = (targets[race == r].tolist() for r in (2, 3, 4))
 
     print("Average Targets (Numbers available to bet on):")
     print(f"Race 2: {sum(r2_targets)/len(r2_targets):.2f}")
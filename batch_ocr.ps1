@@ -1,5 +1,7 @@
 param(
-    [string]$Directory
+    [string]$Directory,
+    [string]$ListFile, # Optional: text file with one image path per line (only those are OCR'd)
+    [string]$OutFile   # Optional: defaults to $Directory\ocr_results.json
 )
 
 try {
@@ -19,10 +21,17 @@ try {
     [Windows.Media.Ocr.OcrEngine, Windows.Foundation.UniversalApiContract, ContentType = WindowsRuntime] | Out-Null
     [Windows.Storage.StorageFile, Windows.Foundation.UniversalApiContract, ContentType = WindowsRuntime] | Out-Null
 
-    if (-not (Test-Path $Directory)) {
+    if ($ListFile) {
+        $Files = Get-Content -Path $ListFile | Where-Object { $_ } | ForEach-Object { Get-Item -LiteralPath $_ }
+    }
+    elseif (-not (Test-Path $Directory)) {
         Write-Error "Directory not found: $Directory"
         exit 1
     }
+    else {
+        $Files = Get-ChildItem -Path $Directory -Filter "*.jpg"
+    }
+    if (-not $OutFile) { $OutFile = "$Directory\ocr_results.json" }
 
     $Engine = [Windows.Media.Ocr.OcrEngine]::TryCreateFromUserProfileLanguages()
     if ($null -eq $Engine) {
@@ -30,7 +39,6 @@ try {
         exit 1
     }
 
-    $Files = Get-ChildItem -Path $Directory -Filter "*.jpg"
     $AllResults = @()
 
     foreach ($FileItem in $Files) {
@@ -74,9 +82,9 @@ try {
         }
     }
 
-    $Json = $AllResults | ConvertTo-Json -Depth 4 -Compress
-    $Json | Out-File -FilePath "$Directory\ocr_results.json" -Encoding UTF8
-    Write-Host "Saved JSON to $Directory\ocr_results.json"
+    $Json = ConvertTo-Json -InputObject @($AllResults) -Depth 4 -Compress
+    $Json | Out-File -FilePath $OutFile -Encoding UTF8
+    Write-Host "Saved JSON to $OutFile"
 }
 catch {
     Write-Error $_
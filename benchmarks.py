@@ -0,0 +1,347 @@
+import pandas as pd
+import numpy as np
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import result_cache
+import results_store
+from horse_events import load_days, build_events, load_game_events
+from pricing import price
+from sim_kernel import run_kernel, run_batch, trade_log
+from strategy_engine import make_spec, run_strategies, simulator_specs
+from streak_ev import cycle_ev_table
+from streaks import run_lengths
+from gap_pnl import gap_histogram, gap_pnl_table, real_target_pnl_table
+from portfolio import simulate_portfolio
+from analyze_daily_gaps import daily_gap_stats
+import param_sweep
+
+OUTPUT_REPORT = r"c:\Users\Admin\Desktop\SniperStrategyProject\bench_output.txt"
+BASELINE_FILE = r"c:\Users\Admin\Desktop\SniperStrategyProject\bench_baseline.json"
+
+BASE_DAYS = 520 # ~ the current NY history
+SYNTH_END = '2020-01-01' # Histories end here and grow backwards, so ~240x still fits pandas' date range
+SCALES = (1, 10, 100)
+GAMES = [('NY', 'Midday'), ('NY', 'Evening'), ('FL', 'Midday'), ('FL', 'Evening')]
+MISSING_RATE = 0.02 # Share of days without an R4 result (partial OCR days)
+SEED = 7
+REPEATS = 3 # Best of N
+REGRESSION_RATIO = 1.25 # Slower than baseline by more than this = regression
+
+# Script -> entry point, run against the synthetic single-game CSVs
+SCRIPTS = {
+    'sim_horses': 'run_simulation',
+    'sim_horses_sniper': 'run_simulation',
+    'sim_horses_master': 'run_simulation',
+    'sim_horses_compound': 'run_simulation',
+    'sim_horses_long_term': 'run_simulation',
+    'sim_horses_final': 'run_simulation',
+    'analyze_daily_gaps': 'analyze_daily_gaps',
+    'analyze_optimization': 'run_analysis',
+    'analyze_patterns': 'analyze_patterns',
+    'analyze_post_streak': 'analyze_clustering',
+    'analyze_stop_ev': 'analyze_ev',
+    'analyze_streak_survival': 'analyze_streaks',
+    'analyze_targets': 'analyze',
+}
+
+# Stage -> names a script may call; each one found in the script (or in
+# param_sweep, which analyze_optimization goes through) is timed. The
+# betting loop is everything else: loop = total - timed stages.
+STAGE_HOOKS = {
+    'load': ['load_events', 'load_opportunities'],
+    'pricing': ['price'],
+    'engine': ['run_kernel', 'run_strategy', 'sweep', 'cycle_ev_table', 'gap_pnl_table', 'real_target_pnl_table'],
+    'report': ['open', 'trade_log', 'kernel_monthly_profit'],
+}
+STAGES = list(STAGE_HOOKS) + ['loop']
+
+
+def synth_results(n_days, games=None, seed=SEED, missing_rate=MISSING_RATE):
+    """
+    Synthetic results table in process_horses' CSV layout: uniform digits,
+    one row per day (per game), consecutive dates up to SYNTH_END,
+    `missing_rate` of days without R4. games=[(lottery, draw), ...] adds the Lottery/Draw columns.
+    """
+    rng = np.random.default_rng(seed)
+    keys = games or [None]
+    dates = np.datetime64(SYNTH_END) - n_days + np.arange(n_days)
+    frames = []
+    for key in keys:
+        digits = rng.integers(0, 10, size=(n_days, 4)).astype(str).astype(object)
+        digits[rng.random(n_days) < missing_rate, 3] = ''
+        df = pd.DataFrame(digits, columns=results_store.RACE_COLS)
+        df.insert(0, 'Date', np.datetime_as_string(dates, unit='D'))
+        df['Raw'] = df['R1'] + df['R2'] + df['R3'] + ' - ' + df['R4']
+        if key is not None:
+            df.insert(0, 'Draw', key[1])
+            df.insert(0, 'Lottery', key[0])
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def make_datasets(root, scales=SCALES, games=GAMES, seed=SEED):
+    """Writes the 1x/10x/... single-game and multi-game CSVs. Returns [(name, scale, n_games, path)]."""
+    out = []
+    for scale in scales:
+        n_days = BASE_DAYS * scale
+        path = os.path.join(root, f"synth_{scale}x.csv")
+        synth_results(n_days, seed=seed).to_csv(path, index=False)
+        out.append((f"{scale}x", scale, 1, path))
+        if games:
+            path = os.path.join(root, f"synth_{scale}x_{len(games)}games.csv")
+            synth_results(n_days, games=games, seed=seed).to_csv(path, index=False)
+            out.append((f"{scale}x_{len(games)}games", scale, len(games), path))
+    return out
+
+
+class StageTimer:
+    """Wall time per stage; nested timed calls only count for the outermost one."""
+
+    def __init__(self):
+        self.totals = dict.fromkeys(STAGE_HOOKS, 0.0)
+        self._depth = 0
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            if self._depth:
+                return fn(*args, **kwargs)
+            self._depth += 1
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.totals[stage] += time.perf_counter() - t0
+                self._depth -= 1
+        return timed
+
+    def wrap_class(self, stage, cls):
+        timer = self
+
+        class Timed(cls):
+            pass
+        for name in ('add', 'advance', 'value'):
+            if hasattr(cls, name):
+                setattr(Timed, name, timer.wrap(stage, getattr(cls, name)))
+        return Timed
+
+
+@contextlib.contextmanager
+def patched(targets):
+    """Temporarily sets attributes: targets = [(obj, name, value)]."""
+    saved = [(obj, name, name in vars(obj), getattr(obj, name, None)) for obj, name, _ in targets]
+    try:
+        for obj, name, value in targets:
+            setattr(obj, name, value)
+        yield
+    finally:
+        for obj, name, existed, value in reversed(saved):
+            if existed:
+                setattr(obj, name, value)
+            else:
+                delattr(obj, name)
+
+
+def _script_patches(module, csv_path, out_dir, timer):
+    targets = []
+    for attr in dir(module):
+        if attr == 'INPUT_CSV':
+            targets.append((module, attr, csv_path))
+        elif attr.startswith('OUTPUT_'):
+            targets.append((module, attr, os.path.join(out_dir, f"{module.__name__}.{attr}")))
+    for stage, names in STAGE_HOOKS.items():
+        for name in names:
+            for owner in (module, param_sweep):
+                if name == 'open' and owner is module:
+                    # Module global shadows the builtin for report writes
+                    targets.append((module, 'open', timer.wrap(stage, open)))
+                elif name in vars(owner):
+                    value = vars(owner)[name]
+                    wrapped = timer.wrap_class(stage, value) if isinstance(value, type) else timer.wrap(stage, value)
+                    targets.append((owner, name, wrapped))
+    targets.append((pd.DataFrame, 'to_csv', timer.wrap('report', pd.DataFrame.to_csv)))
+    return targets
+
+
+def run_script(name, csv_path, out_dir):
+    """One silent run of a script against `csv_path`. Returns (total seconds, stage seconds)."""
+    module = importlib.import_module(name)
+    getattr(module, '_EVENTS_CACHE', {}).clear() # Every run loads its data
+    timer = StageTimer()
+    with patched(_script_patches(module, csv_path, out_dir, timer)), contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        getattr(module, SCRIPTS[name])()
+        total = time.perf_counter() - t0
+    stages = dict(timer.totals)
+    stages['loop'] = max(total - sum(stages.values()), 0.0)
+    return total, stages
+
+
+def peak_memory(fn):
+    """Peak traced Python/numpy allocation of one call, in MB (memory-mapped files are not counted)."""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def best_of(fn, repeats=REPEATS):
+    """Runs fn `repeats` times, returns the result of the fastest run (fn returns (seconds, ...))."""
+    return min((fn() for _ in range(repeats)), key=lambda r: r[0])
+
+
+def _timed(fn):
+    def run():
+        t0 = time.perf_counter()
+        fn()
+        return (time.perf_counter() - t0,)
+    return run
+
+
+def components(csv_path):
+    """The hot paths behind the scripts, callable on their own: name -> fn()."""
+    ev = build_events(*load_days(csv_path, dedupe=False))
+    opp = ev['is_opp']
+    is_rep = ev['is_repeat'][opp]
+    hist = gap_histogram(is_rep)
+    mults = np.round(np.arange(1.1, 3.01, 0.01), 2)
+    # The six simulators plus a Gap/Stop grid of Final variants, one pass
+    specs = simulator_specs()
+    quantile = make_spec(entry='quantile')
+    specs += [make_spec(specs[-1], entry_gap=g, max_steps=m) for g in range(2, 9) for m in range(4, 9)]
+
+    return {
+        'csv_parse': lambda: results_store.read_csv_arrays(csv_path),
+        'store_sync': lambda: results_store.sync(csv_path),
+        'store_load': lambda: results_store.load(csv_path),
+        'build_events': lambda: build_events(*load_days(csv_path, dedupe=False)),
+        'pricing': lambda: price(dict(ev, pricing={})),
+        # sim_horses' P90 entry: the running quantile lives in the engine kernel
+        'quantile_entry': lambda: run_strategies(ev, [quantile], record=False),
+        'run_kernel': lambda: run_kernel(ev),
+        'trade_log': lambda: trade_log(ev, run_kernel(ev)),
+        'strategies': lambda: run_strategies(ev, specs, record=False),
+        'gap_pnl_table': lambda: gap_pnl_table(hist, range(0, 16), mults, range(2, 13)),
+        'real_target_pnl_table': lambda: real_target_pnl_table(run_lengths(is_rep), price(ev)['targets'][opp], range(0, 16),
+                                                               mults, range(2, 13)),
+        'cycle_ev_table': lambda: cycle_ev_table(ev, range(0, 11), range(3, 11), [1.5, 2.0, 2.5]),
+        'param_sweep': lambda: param_sweep.simulate_grid(
+            is_rep, param_sweep.make_grid([1.5, 2.0, 2.5], [1.0, 2.0], range(0, 11), range(3, 11), [1.0])),
+    }
+
+
+def game_components(csv_path):
+    """Multi-game hot paths (one batch over every game)."""
+    ev = load_game_events(csv_path)
+    return {
+        'load_game_events': lambda: load_game_events(csv_path),
+        'run_batch': lambda: run_batch(ev, ev['starts']),
+        'portfolio': lambda: simulate_portfolio(ev),
+        'daily_gap_stats': lambda: daily_gap_stats(ev),
+    }
+
+
+def run_suite(scales=SCALES, games=GAMES, repeats=REPEATS, memory=True, scripts=None, log=print):
+    """
+    Builds the synthetic datasets in a temp dir and measures every script and
+    component on each. One row per (dataset, target) with stage seconds,
+    total seconds, events/sec and peak memory.
+    """
+    scripts = list(SCRIPTS) if scripts is None else scripts
+    root = tempfile.mkdtemp(prefix='bench_')
+    rows = []
+    warmed = set()
+    # Timings are of the computations, not of result_cache hits
+    cache_setting = os.environ.get(result_cache.CACHE_ENV)
+    os.environ[result_cache.CACHE_ENV] = 'off'
+    try:
+        for dataset, scale, n_games, path in make_datasets(root, scales, games):
+            results_store.load(path) # Store built once; store_sync measures the cold path
+            if n_games == 1:
+                n_events = len(build_events(*load_days(path, dedupe=False))['winner'])
+                targets = [(name, 'script', lambda name=name: run_script(name, path, root)) for name in scripts]
+                targets += [(name, 'component', _timed(fn)) for name, fn in components(path).items()]
+            else:
+                n_events = len(load_game_events(path)['winner'])
+                targets = [(name, 'component', _timed(fn)) for name, fn in game_components(path).items()]
+
+            for name, kind, fn in targets:
+                if name not in warmed:
+                    fn() # Imports and numba compilation stay out of the timings
+                    warmed.add(name)
+                result = best_of(fn, repeats)
+                row = {'dataset': dataset, 'scale': scale, 'games': n_games, 'kind': kind, 'target': name,
+                       'total_s': result[0], 'events': n_events, 'events_per_sec': n_events / result[0] if result[0] else np.nan}
+                if kind == 'script':
+                    row.update({f"{s}_s": result[1][s] for s in STAGES})
+                row['peak_mb'] = peak_memory(fn) if memory else np.nan
+                rows.append(row)
+                log(f"{dataset:>12} {name:<24} {result[0] * 1000:10.1f} ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        if cache_setting is None:
+            os.environ.pop(result_cache.CACHE_ENV, None)
+        else:
+            os.environ[result_cache.CACHE_ENV] = cache_setting
+
+    cols = ['dataset', 'scale', 'games', 'kind', 'target'] + [f"{s}_s" for s in STAGES] + \
+           ['total_s', 'events', 'events_per_sec', 'peak_mb']
+    return pd.DataFrame(rows).reindex(columns=cols)
+
+
+def save_baseline(table, path=BASELINE_FILE):
+    base = {f"{r.dataset}/{r.target}": {'total_s': r.total_s, 'peak_mb': r.peak_mb}
+            for r in table.itertuples()}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(base, f, indent=2)
+
+
+def compare_baseline(table, path=BASELINE_FILE, ratio=REGRESSION_RATIO):
+    """Adds baseline_s, ratio (now / baseline) and a regression flag (ratio > `ratio`)."""
+    out = table.copy()
+    if not os.path.exists(path):
+        out['baseline_s'], out['ratio'], out['regression'] = np.nan, np.nan, False
+        return out
+    with open(path, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    keys = out['dataset'] + '/' + out['target']
+    out['baseline_s'] = [base.get(k, {}).get('total_s', np.nan) for k in keys]
+    out['ratio'] = out['total_s'] / out['baseline_s']
+    out['regression'] = out['ratio'] > ratio
+    return out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the simulation and analysis hot paths on synthetic data.")
+    parser.add_argument('--scales', type=int, nargs='+', default=list(SCALES))
+    parser.add_argument('--games', type=int, default=len(GAMES), help="Games in the multi-lottery variant (0 = none)")
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--scripts', nargs='*', default=None, help="Subset of scripts to run")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc pass")
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    table = run_suite(args.scales, GAMES[:args.games], args.repeats, memory=not args.no_memory, scripts=args.scripts)
+    table = compare_baseline(table)
+    text = table.to_string(index=False, float_format=lambda x: f"{x:,.4f}")
+    regressions = table[table['regression']]
+    if len(regressions):
+        text += f"\n\nREGRESSIONS (> {REGRESSION_RATIO:g}x baseline):\n"
+        text += regressions[['dataset', 'target', 'baseline_s', 'total_s', 'ratio']].to_string(index=False)
+    with open(OUTPUT_REPORT, 'w', encoding='utf-8') as f:
+        f.write(text + "\n")
+    print(text)
+    if args.save_baseline:
+        save_baseline(table)
+        print(f"\nBaseline saved to {BASELINE_FILE}")
@@ -0,0 +1,93 @@
+import pandas as pd
+import numpy as np
+
+from horse_events import load_events
+from streaks import closed_lengths
+
+INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
+
+THRESHOLDS = range(6, 17) # "Monster" gap sizes
+WINDOWS = (1, 2, 3, 5, 10) # Aftershock windows, in gap resets
+
+
+def next_occurrence(gaps, thresholds):
+    """
+    (breaks x thresholds) index of the next break AFTER each one whose gap
+    reaches the threshold, len(gaps) when there is none. One reverse
+    minimum-scan covers every threshold.
+    """
+    gaps = np.asarray(gaps)
+    thresholds = np.asarray(list(thresholds))
+    n = len(gaps)
+    hits = np.where(gaps[:, None] >= thresholds[None, :], np.arange(n)[:, None], n)
+    # at_or_after[i] = first hit at index >= i; shifted by one for "strictly after"
+    at_or_after = np.minimum.accumulate(hits[::-1], axis=0)[::-1]
+    nxt = np.full_like(hits, n)
+    nxt[:-1] = at_or_after[1:]
+    return nxt
+
+
+def inter_arrivals(gaps, thresholds, nxt=None):
+    """Threshold -> resets from each monster to the next one (the last monster has none)."""
+    gaps = np.asarray(gaps)
+    thresholds = list(thresholds)
+    nxt = next_occurrence(gaps, thresholds) if nxt is None else nxt
+    out = {}
+    for k, t in enumerate(thresholds):
+        monsters = np.nonzero(gaps >= t)[0]
+        follow = nxt[monsters, k]
+        out[t] = follow[follow < len(gaps)] - monsters[follow < len(gaps)]
+    return out
+
+
+def interarrival_table(gaps, thresholds=THRESHOLDS, distances=None):
+    """One row per threshold: monsters, share of breaks, inter-arrival mean / median / min / P25."""
+    gaps = np.asarray(gaps)
+    distances = inter_arrivals(gaps, thresholds) if distances is None else distances
+    rows = []
+    for t, d in distances.items():
+        monsters = int(np.sum(gaps >= t))
+        rows.append({
+            'threshold': t,
+            'monsters': monsters,
+            'rate_pct': monsters / len(gaps) * 100 if len(gaps) else np.nan,
+            'pairs': len(d),
+            'mean': d.mean() if len(d) else np.nan,
+            'median': np.median(d) if len(d) else np.nan,
+            'min': d.min() if len(d) else np.nan,
+            'p25': np.percentile(d, 25) if len(d) else np.nan,
+        })
+    return pd.DataFrame(rows).set_index('threshold')
+
+
+def aftershock_matrix(gaps, thresholds=THRESHOLDS, windows=WINDOWS, distances=None):
+    """
+    (thresholds x windows) % of monsters followed by another within w
+    resets, and the same under independence, 1 - (1 - p)^w with p the
+    share of breaks reaching the threshold. Returns (observed, expected).
+    """
+    gaps = np.asarray(gaps)
+    distances = inter_arrivals(gaps, thresholds) if distances is None else distances
+    windows = np.asarray(list(windows))
+    observed = np.full((len(distances), len(windows)), np.nan)
+    expected = np.full_like(observed, np.nan)
+    for k, (t, d) in enumerate(distances.items()):
+        if len(d):
+            # Share of inter-arrivals <= w for every window at once
+            observed[k] = np.searchsorted(np.sort(d), windows, side='right') / len(d) * 100
+        p = np.mean(gaps >= t) if len(gaps) else np.nan
+        expected[k] = (1 - (1 - p) ** windows) * 100
+    index = pd.Index(list(distances), name='threshold')
+    columns = pd.Index(windows, name='window')
+    return pd.DataFrame(observed, index, columns), pd.DataFrame(expected, index, columns)
+
+
+if __name__ == '__main__':
+    gaps = closed_lengths(load_events(INPUT_CSV))
+    distances = inter_arrivals(gaps, THRESHOLDS)
+    print(interarrival_table(gaps, THRESHOLDS, distances).to_string(float_format=lambda x: f"{x:.1f}"))
+    observed, expected = aftershock_matrix(gaps, THRESHOLDS, WINDOWS, distances)
+    print("\nAftershock risk % (observed):")
+    print(observed.to_string(float_format=lambda x: f"{x:.1f}"))
+    print("\nIf monsters were independent:")
+    print(expected.to_string(float_format=lambda x: f"{x:.1f}"))
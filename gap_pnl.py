@@ -0,0 +1,151 @@
+import pandas as pd
+import numpy as np
+import time
+
+from horse_events import load_events
+from streaks import run_lengths
+from pricing import price
+
+INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
+BASE_STAKE = 1.0
+PAYOUT_ODDS = 9.0
+
+
+def ladder_tables(multipliers, max_steps, base_stake=BASE_STAKE, payout_odds=PAYOUT_ODDS):
+    """
+    Geometric ladder per multiplier, built once: (cost, revenue), each
+    (multipliers x max_steps). cost[:, k-1] is the total staked by a
+    k-step session, revenue[:, k-1] the payout if step k wins.
+    """
+    m = np.asarray(multipliers, dtype=np.float64)[:, None]
+    stakes = base_stake * m ** np.arange(max_steps)
+    return np.cumsum(stakes, axis=1), stakes * payout_odds
+
+
+def gap_histogram(is_repeat):
+    """Count per closed gap size (same gaps analyze_patterns collected, open streak left out)."""
+    rl = run_lengths(is_repeat)
+    return np.bincount(rl['length'][~rl['censored']])
+
+
+def gap_pnl_table(hist, entry_gaps, multipliers, max_steps_list,
+                  base_stake=BASE_STAKE, payout_odds=PAYOUT_ODDS):
+    """
+    analyze_patterns' model (cost = stake, one session per gap that reaches
+    the entry, win if the gap closes within max_steps) for every
+    (entry_gap, multiplier, max_steps) from the gap histogram alone.
+
+    A session entered at gap e on a streak of length g needs g - e + 1
+    steps, so each cell is a dot product of the histogram with the ladder
+    table: O(distinct gaps x configs), no per-gap loop.
+    """
+    hist = np.asarray(hist, dtype=np.float64)
+    entry_gaps = np.asarray(list(entry_gaps), dtype=np.int64)
+    multipliers = np.asarray(multipliers, dtype=np.float64)
+    max_s = max(max_steps_list)
+    cost, revenue = ladder_tables(multipliers, max_s, base_stake, payout_odds)
+
+    # Histogram padded so every (entry, step) lookup is in range; suffix[g] = streaks with gap >= g
+    size = int(entry_gaps.max(initial=0)) + max_s + 1
+    h = np.zeros(max(size, len(hist)) + 1)
+    h[:len(hist)] = hist
+    suffix = np.cumsum(h[::-1])[::-1]
+    # hs[e, r] = streaks that close on step r + 1 after entering at gap e
+    hs = h[entry_gaps[:, None] + np.arange(max_s)]
+
+    frames = []
+    for max_steps in max_steps_list:
+        wins = hs[:, :max_steps].sum(axis=1)
+        losses = suffix[entry_gaps + max_steps]
+        attempts = wins + losses
+        # (multipliers x entries)
+        net = (revenue[:, :max_steps] - cost[:, :max_steps]) @ hs[:, :max_steps].T \
+            - cost[:, max_steps - 1][:, None] * losses[None, :]
+        frames.append(pd.DataFrame({
+            'entry_gap': np.tile(entry_gaps, len(multipliers)),
+            'multiplier': np.repeat(multipliers, len(entry_gaps)),
+            'max_steps': max_steps,
+            'attempts': np.tile(attempts, len(multipliers)).astype(np.int64),
+            'wins': np.tile(wins, len(multipliers)).astype(np.int64),
+            'win_rate_pct': np.tile(np.divide(wins * 100, attempts, out=np.zeros_like(wins), where=attempts > 0), len(multipliers)),
+            'net_profit': net.ravel(),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def real_target_pnl_table(runs, targets, entry_gaps, multipliers, max_steps_list,
+                          base_stake=BASE_STAKE, payout_odds=PAYOUT_ODDS):
+    """
+    Same model, but every bet costs stake * targets of its own event (real
+    ticket counts instead of cost = stake), so P&L depends on the sequence,
+    not only on the gap size. `runs` is run_lengths() of the stream the
+    targets belong to (e.g. the cached streaks.streaks(events, 'opps')).
+
+    Per multiplier m, one cumulative sum of m**offset * targets along each
+    streak prices any session in O(1): the session entered at gap e costs
+    base * m**-e * (P[e + steps] - P[e]). Every (entry, max_steps, streak)
+    is then evaluated in one broadcast per multiplier.
+    """
+    targets = np.asarray(targets, dtype=np.float64)
+    streak_id, offset, lengths, censored = runs['streak_id'], runs['offset'], runs['length'], runs['censored']
+    closed = np.nonzero(~censored)[0]
+    L = lengths[closed]
+
+    # (closed streaks x offsets) targets table; one row per streak keeps the
+    # cumulative sums below from mixing magnitudes across streaks
+    row = np.full(len(lengths), -1)
+    row[closed] = np.arange(len(closed))
+    in_closed = row[streak_id] >= 0
+    table = np.zeros((len(closed), int(L.max(initial=0)) + 1))
+    table[row[streak_id[in_closed]], offset[in_closed]] = targets[in_closed]
+    powers = np.arange(table.shape[1], dtype=np.float64)
+
+    e = np.asarray(list(entry_gaps), dtype=np.int64)[:, None, None] # (E, 1, 1)
+    S = np.asarray(list(max_steps_list), dtype=np.int64)[None, :, None] # (1, S, 1)
+    L3 = L[None, None, :]
+    entered = L3 >= e
+    win = entered & (L3 - e + 1 <= S)
+    lose = entered & ~win
+    steps = np.where(win, L3 - e + 1, S) # Bets placed in the session
+    width = table.shape[1]
+    first = np.broadcast_to(np.minimum(e, width), steps.shape) # Entry bet column (clipped when not entered)
+    last = np.minimum(e + steps, width)
+    rows3 = np.broadcast_to(np.arange(len(closed))[None, None, :], steps.shape)
+    wins = win.sum(axis=2)
+    attempts = wins + lose.sum(axis=2)
+
+    multipliers = np.asarray(multipliers, dtype=np.float64)
+    net = np.empty((len(multipliers),) + wins.shape) # (multipliers x entries x max_steps)
+    for k, m in enumerate(multipliers):
+        prefix = np.zeros((len(closed), width + 1))
+        np.cumsum(table * m ** powers, axis=1, out=prefix[:, 1:])
+        cost = np.where(entered, base_stake * m ** (-e) * (prefix[rows3, last] - prefix[rows3, first]), 0.0)
+        revenue = np.where(win, base_stake * m ** (L3 - e) * payout_odds, 0.0)
+        net[k] = (revenue - cost).sum(axis=2)
+
+    # Same row order as gap_pnl_table: max_steps, then multiplier, then entry gap
+    n_m, n_e, n_s = net.shape
+    return pd.DataFrame({
+        'entry_gap': np.tile(e[:, 0, 0], n_s * n_m),
+        'multiplier': np.tile(np.repeat(multipliers, n_e), n_s),
+        'max_steps': np.repeat(S[0, :, 0], n_m * n_e),
+        'attempts': np.tile(attempts.T, (1, n_m)).ravel(),
+        'wins': np.tile(wins.T, (1, n_m)).ravel(),
+        'win_rate_pct': np.tile(np.divide(wins * 100.0, attempts, out=np.zeros(wins.shape), where=attempts > 0).T, (1, n_m)).ravel(),
+        'net_profit': net.transpose(2, 0, 1).ravel(),
+    })
+
+
+if __name__ == '__main__':
+    ev = load_events(INPUT_CSV, dedupe=False)
+    is_rep = ev['is_repeat'][ev['is_opp']]
+    hist = gap_histogram(is_rep)
+    mults = np.round(np.arange(1.1, 3.01, 0.01), 2)
+
+    t0 = time.perf_counter()
+    table = gap_pnl_table(hist, range(0, 16), mults, range(2, 13))
+    print(f"Abstract model: {len(table)} configurations in {(time.perf_counter() - t0) * 1000:.1f} ms")
+    t0 = time.perf_counter()
+    real = real_target_pnl_table(run_lengths(is_rep), price(ev)['targets'][ev['is_opp']], range(0, 16), mults, range(2, 13))
+    print(f"Real targets:   {len(real)} configurations in {(time.perf_counter() - t0) * 1000:.1f} ms")
+    print(real.sort_values('net_profit', ascending=False).head(15).to_string(index=False))
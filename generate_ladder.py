@@ -3,6 +3,7 @@ import pandas as pd
 # Constants from previous analysis
 AVG_MONTHLY_PROFIT_PER_DOLLAR_STAKE = 132.67 / 2.0  # Approx $66.33 per $1 stake
 SAFE_BANKROLL_PER_DOLLAR_STAKE = 2397.0 / 2.0      # Approx $1198.50 per $1 stake
+# Re-derive from percentiles instead of one replay: monte_carlo.bankroll_per_dollar_stake(pct=99)
 TARGET_INCOME = 4000.0
 
 def generate_ladder():
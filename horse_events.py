@@ -0,0 +1,167 @@
+import numpy as np
+
+import result_cache
+import results_store
+from results_store import RACE_COLS
+
+INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
+
+# Every digit 0-9 gets one bit, so a whole day of winners fits in a uint16.
+DIGIT_BITS = (1 << np.arange(10)).astype(np.uint16)
+
+
+def load_days(csv_path=INPUT_CSV, dedupe=True, series=None):
+    """
+    Loads the results into day-level arrays, from the memory-mapped column
+    store next to the CSV (the CSV is only parsed when the store is missing
+    or out of date).
+
+    Returns (dates, digits, counts):
+    - dates:  datetime64[D] per day, sorted.
+    - digits: uint8 matrix (days x 4). Valid winners are packed to the left
+              in race order, same as the old `races` list per row.
+    - counts: number of valid winners per day.
+
+    `series` ("LOTTERY/Draw") picks one game from a multi-game file.
+    """
+    store = results_store.load(csv_path)
+    if series is None:
+        if len(store['names']) > 1:
+            raise ValueError(f"{csv_path} holds several games {store['names']}, pass series=")
+        keep = np.arange(len(store['day']))
+    else:
+        code = store['names'].index(series) if series in store['names'] else -1
+        keep = np.nonzero(np.asarray(store['series']) == code)[0]
+    day = np.asarray(store['day'][keep])
+    if dedupe:
+        # First row of each date, already in date order
+        _, first = np.unique(day, return_index=True)
+        keep = keep[first]
+    else:
+        keep = keep[np.argsort(day, kind='stable')]
+    day, raw, valid = (np.asarray(a[keep]) for a in (store['day'], store['digits'], store['valid']))
+    return _pack(day, raw, valid)
+
+
+def _pack(day, raw, valid):
+    """Store rows (day ordinals, digits by position, validity) -> (dates, digits, counts)."""
+    # Pack valid cells to the left (stable, so race order is kept)
+    order = np.argsort(~valid, axis=1, kind='stable')
+    digits = np.take_along_axis(raw, order, axis=1)
+    counts = valid.sum(axis=1).astype(np.uint8)
+    digits[np.arange(len(RACE_COLS)) >= counts[:, None]] = 0
+
+    dates = day.astype('datetime64[D]')
+    return dates, digits, counts
+
+
+def load_game_days(csv_path=INPUT_CSV, dedupe=True):
+    """
+    Every game in the file at once, as load_days arrays stacked game by
+    game (dates sorted within each game).
+
+    Returns (dates, digits, counts, day_series, names): day_series is the
+    game code of each day, names[code] its "LOTTERY/Draw".
+    """
+    store = results_store.load(csv_path)
+    day = np.asarray(store['day'])
+    series = np.asarray(store['series'])
+    # Game, then date; stable so the first CSV row of a (game, date) comes first
+    order = np.lexsort((day, series))
+    if dedupe:
+        s, d = series[order], day[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (s[1:] != s[:-1]) | (d[1:] != d[:-1])
+        order = order[first]
+    dates, digits, counts = _pack(day[order], np.asarray(store['digits'][order]), np.asarray(store['valid'][order]))
+    return dates, digits, counts, series[order], list(store['names'])
+
+
+def build_events(dates, digits, counts):
+    """
+    Turns day-level arrays into the flat race event stream, in one vectorized pass.
+
+    Each day contributes one event per valid race. R1 is never an opportunity
+    (nothing to repeat yet) but it is still part of the gap sequence.
+    """
+    slots = digits.shape[1]
+    in_day = np.arange(slots) < counts[:, None]
+
+    # Bitmask of winners seen so far in the day, BEFORE each race
+    bits = np.where(in_day, DIGIT_BITS[digits], 0).astype(np.uint16)
+    seen = np.bitwise_or.accumulate(bits, axis=1)
+    prev = np.zeros_like(seen)
+    prev[:, 1:] = seen[:, :-1]
+
+    day_idx, slot = np.nonzero(in_day)
+    winner = digits[day_idx, slot]
+    prev_mask = prev[day_idx, slot]
+
+    return {
+        'dates': dates,
+        'day_digits': digits,
+        'day_counts': counts,
+        'date_idx': day_idx.astype(np.int32),
+        'race': (slot + 1).astype(np.uint8),
+        'winner': winner,
+        'prev_mask': prev_mask,
+        # One per previous winner (len(prevs)), duplicates included; pricing.price turns
+        # prev_mask into the ticket count the simulators actually charge
+        'n_targets': slot.astype(np.uint8),
+        'is_repeat': (prev_mask & DIGIT_BITS[winner]) != 0,
+        'is_opp': slot > 0,
+    }
+
+
+def _events(csv_path, dedupe=True, series=None):
+    return build_events(*load_days(csv_path, dedupe=dedupe, series=series))
+
+
+def load_events(csv_path=INPUT_CSV, dedupe=True, series=None):
+    """
+    build_events over the CSV. The events are rebuilt from the memory-mapped
+    store every time (cheaper than unpickling them), but carry a 'source'
+    keyed on the dataset's content, so results computed from them through
+    result_cache.on_events are cached.
+    """
+    ev = _events(csv_path, dedupe, series=series)
+    source = result_cache.dataset_source(csv_path, _events, dedupe, series=series)
+    if source is not None:
+        ev['source'] = source
+    return ev
+
+
+def load_game_events(csv_path=INPUT_CSV, dedupe=True):
+    """
+    build_events over every game in one pass (days never span games, so the
+    stacked days give each game's own event stream, back to back).
+
+    Adds 'series' (game code per event), 'day_series', 'names' and
+    'starts' (first event of each game + total, for sim_kernel.run_batch).
+    Carries a 'source' like load_events.
+    """
+    ev = _game_events(csv_path, dedupe)
+    source = result_cache.dataset_source(csv_path, _game_events, dedupe)
+    if source is not None:
+        ev['source'] = source
+    return ev
+
+
+def _game_events(csv_path, dedupe=True):
+    dates, digits, counts, day_series, names = load_game_days(csv_path, dedupe=dedupe)
+    ev = build_events(dates, digits, counts)
+    ev['series'] = day_series[ev['date_idx']]
+    ev['day_series'] = day_series
+    ev['names'] = names
+    ev['starts'] = np.searchsorted(ev['series'], np.arange(len(names) + 1), side='left')
+    return ev
+
+
+def day_races(events, d_i):
+    """Winners of one day as strings, like the old per-row `races` list."""
+    return [str(d) for d in events['day_digits'][d_i, :events['day_counts'][d_i]]]
+
+
+if __name__ == '__main__':
+    ev = load_events()
+    print(f"Days: {len(ev['dates'])} | Events: {len(ev['winner'])} | Repeats: {ev['is_repeat'].sum()}")
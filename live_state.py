@@ -0,0 +1,204 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import sys
+
+from horse_events import load_events, build_events
+from pricing import bet_targets, TARGET_MODE
+from sim_kernel import (run_kernel, render_note, initial_state, DEFAULT_PARAMS,
+                        ST_BANKROLL, ST_GAP, ST_IN_SESSION, ST_STEP, ST_STAKE, ST_COOLING, ST_RESETS)
+
+INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
+STATE_FILE = r"c:\Users\Admin\Desktop\SniperStrategyProject\live_state.json"
+
+RACES_PER_DAY = 4
+
+
+def new_state(**params):
+    p = dict(DEFAULT_PARAMS)
+    p.update(params)
+    return {
+        'params': p,
+        'kernel': initial_state(float(p['starting_bankroll']), float(p['min_stake'])).tolist(),
+        'date': None,       # Last day applied (YYYY-MM-DD)
+        'day_results': [],  # Winners applied so far for that day
+        'day_closed': True, # That day is complete (nothing more will be added to it)
+        'monthly_pnl': {},  # 'YYYY-MM' -> bankroll change
+    }
+
+
+def load_state(path=STATE_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_FILE):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def bootstrap(csv_path=INPUT_CSV, **params):
+    """Builds the state by replaying the full history once (only needed the first time)."""
+    state = new_state(**params)
+    ev = load_events(csv_path)
+    res = run_kernel(ev, **state['params'])
+
+    months = pd.to_datetime(ev['dates']).strftime('%Y-%m').to_numpy()[ev['date_idx']]
+    before = np.concatenate(([state['params']['starting_bankroll']], res['bankroll'][:-1]))
+    pnl = pd.Series(res['bankroll'] - before).groupby(months, sort=True).sum()
+
+    last = len(ev['dates']) - 1
+    state['kernel'] = res['state'].tolist()
+    state['date'] = str(ev['dates'][last])
+    state['day_results'] = [int(d) for d in ev['day_digits'][last, :ev['day_counts'][last]]]
+    state['day_closed'] = True
+    state['monthly_pnl'] = {m: float(v) for m, v in pnl.items()}
+    return state
+
+
+def _day_events(date, results, done):
+    """Events of one day's `results` (repeats judged against the whole day), from race done+1 on."""
+    digits = np.zeros((1, RACES_PER_DAY), dtype=np.uint8)
+    digits[0, :len(results)] = results
+    counts = np.array([len(results)], dtype=np.uint8)
+    ev = build_events(np.array([date], dtype='datetime64[D]'), digits, counts)
+    return {k: v[done:] for k, v in ev.items() if k in ('n_targets', 'prev_mask', 'is_repeat', 'is_opp', 'winner', 'race')}
+
+
+def _applied(state, date, results):
+    """How many of `results` were already applied: the state's own day must be continued, not rewritten."""
+    if date != state['date']:
+        return 0
+    applied = state['day_results']
+    if results[:len(applied)] != applied[:len(results)]:
+        raise ValueError(f"Results {results} for {date} don't start with the ones already applied {applied}")
+    return len(applied)
+
+
+def step(state, date, results, closed=None):
+    """
+    Advances the state with the results of `date` (winning digits in race order).
+
+    Can be called intraday with a partial list and again later with the full
+    day: only races not applied yet are simulated. Cost is O(races), not a replay.
+    `closed` marks the day complete (default: once it has RACES_PER_DAY races).
+    Returns one dict per newly applied race.
+    """
+    date = str(np.datetime64(date, 'D'))
+    results = [int(r) for r in results][:RACES_PER_DAY]
+    if state['date'] is not None and date < state['date']:
+        raise ValueError(f"{date} is older than the last applied day {state['date']}")
+
+    done = _applied(state, date, results)
+    if closed is None:
+        closed = len(results) >= RACES_PER_DAY
+    if len(results) <= done:
+        state['day_closed'] = state.get('day_closed', False) or closed
+        return []
+
+    new = _day_events(date, results, done)
+    before = state['kernel'][ST_BANKROLL]
+    res = run_kernel(new, state=state['kernel'], **state['params'])
+
+    state['kernel'] = res['state'].tolist()
+    state['date'] = date
+    state['day_results'] = results
+    state['day_closed'] = closed
+    month = date[:7]
+    state['monthly_pnl'][month] = state['monthly_pnl'].get(month, 0.0) + float(res['final_bankroll'] - before)
+
+    cooldown_resets = state['params']['cooldown_resets']
+    applied = []
+    for i in range(len(new['winner'])):
+        applied.append({
+            'race': int(new['race'][i]),
+            'winner': int(new['winner'][i]),
+            'bankroll': float(res['bankroll'][i]),
+            'notes': render_note(res['code'][i], res['step'][i], res['resets'][i], new['winner'][i], cooldown_resets)
+                     if res['code'][i] else '',
+        })
+    return applied
+
+
+def instructions(state, results_so_far=None, date=None):
+    """
+    What to do on the next race, given today's winners so far
+    (defaults to the state's current day, complete once it is closed; pass
+    [] before race 1 of a new day).
+
+    Races not applied through step() yet are simulated on a copy of the
+    state first, so the answer accounts for them (the state is unchanged).
+    They continue the state's day when `date` is that day, or, without a
+    date, when that day is not closed and they start with its results;
+    otherwise they are a new day.
+    """
+    applied = state['day_results']
+    # States saved before 'day_closed' existed: only a full day is closed
+    closed = state.get('day_closed', len(applied) >= RACES_PER_DAY)
+    current = results_so_far is None
+    results_so_far = [int(r) for r in (applied if current else results_so_far)][:RACES_PER_DAY]
+    p = state['params']
+    k = state['kernel']
+
+    if date is not None:
+        done = _applied(state, str(np.datetime64(date, 'D')), results_so_far)
+    else:
+        done = len(applied) if current or (not closed and results_so_far[:len(applied)] == applied) else 0
+    if len(results_so_far) > done:
+        day = date or state['date'] or '1970-01-01'
+        k = run_kernel(_day_events(day, results_so_far, done), state=k, **p)['state']
+    race = len(results_so_far) + 1
+    out = {'race': race, 'bet': False, 'targets': [], 'stake_per_target': 0.0, 'cost': 0.0}
+
+    if race > RACES_PER_DAY or (current and closed):
+        out['status'] = 'DAY COMPLETE'
+    elif race == 1:
+        out['status'] = 'WAIT (R1 is never a bet)'
+    elif k[ST_COOLING]:
+        out['status'] = f"COOLING DOWN (Resets: {int(k[ST_RESETS])}/{p['cooldown_resets']})"
+    elif k[ST_IN_SESSION] or k[ST_GAP] >= p['entry_gap']:
+        if k[ST_IN_SESSION]:
+            stake = k[ST_STAKE]
+            out['status'] = f"IN SESSION Step {int(k[ST_STEP])}/{p['max_steps']}"
+        else:
+            stake = p['min_stake']
+            if p['compound_ratio'] > 0:
+                stake = round(max(k[ST_BANKROLL] / p['compound_ratio'], p['min_stake']), 2)
+            out['status'] = f"ENTRY (Gap {int(k[ST_GAP])})"
+        # Same tickets the simulators charge (pricing target mode)
+        mode = p.get('targets', TARGET_MODE)
+        targets = bet_targets(results_so_far, mode)
+        out.update({'bet': True, 'targets': targets, 'stake_per_target': stake,
+                    'cost': stake * (1 if mode == 'unit' else len(targets))})
+    else:
+        out['status'] = f"WAIT (Gap {int(k[ST_GAP])}/{p['entry_gap']})"
+    return out
+
+
+def nightly_update(csv_path=INPUT_CSV, path=STATE_FILE):
+    """Applies every CSV day newer than the saved state (bootstraps the first time)."""
+    if not os.path.exists(path):
+        state = bootstrap(csv_path)
+    else:
+        state = load_state(path)
+        ev = load_events(csv_path)
+        first = 0 if state['date'] is None else int(np.searchsorted(ev['dates'], np.datetime64(state['date'])))
+        for d_i in range(first, len(ev['dates'])):
+            # A CSV day is complete, even with fewer than RACES_PER_DAY races
+            step(state, ev['dates'][d_i], ev['day_digits'][d_i, :ev['day_counts'][d_i]].tolist(), closed=True)
+    save_state(state, path)
+    return state
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'bet':
+        # Intraday: python live_state.py bet 3 7  -> instructions for race 3 given R1=3, R2=7
+        st = load_state()
+        print(json.dumps(instructions(st, sys.argv[2:]), indent=2))
+    else:
+        st = nightly_update()
+        print(f"State as of {st['date']}: Bankroll ${st['kernel'][ST_BANKROLL]:,.2f}")
+        print(json.dumps(instructions(st, []), indent=2))
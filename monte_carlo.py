@@ -0,0 +1,203 @@
+import pandas as pd
+import numpy as np
+import time
+
+from horse_events import load_days, DIGIT_BITS
+from sim_kernel import DEFAULT_PARAMS
+from pricing import target_counts, payout_by_race
+
+INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
+
+N_PATHS = 10000
+YEARS = 5
+BLOCK_DAYS = 10 # Resample blocks of consecutive days to keep streak clustering (1 = plain day bootstrap)
+SEED = 42
+
+
+def day_tables(dates, digits, counts, targets=DEFAULT_PARAMS['targets']):
+    """
+    Per-day slot tables the path simulator indexes into: valid, is_repeat
+    and n_targets (tickets per bet, pricing target mode), all (days x 4).
+    """
+    slots = digits.shape[1]
+    valid = np.arange(slots) < counts[:, None]
+    bits = np.where(valid, DIGIT_BITS[digits], 0).astype(np.uint16)
+    seen = np.bitwise_or.accumulate(bits, axis=1)
+    prev = np.zeros_like(seen)
+    prev[:, 1:] = seen[:, :-1]
+    is_repeat = valid & ((prev & bits) != 0)
+    n_targets = np.where(valid, target_counts(prev, np.arange(slots), targets), 0.0)
+    return valid, is_repeat, n_targets
+
+
+def trading_days_per_year(dates):
+    span = (dates[-1] - dates[0]).astype(int) + 1
+    return len(dates) / span * 365.25
+
+
+def bootstrap_days(n_days, n_paths, horizon_days, block_days=BLOCK_DAYS, seed=SEED):
+    """(n_paths x horizon_days) matrix of historical day indices, built from random blocks."""
+    rng = np.random.default_rng(seed)
+    block_days = max(1, min(block_days, n_days))
+    n_blocks = -(-horizon_days // block_days)
+    starts = rng.integers(0, n_days - block_days + 1, size=(n_paths, n_blocks))
+    idx = starts[:, :, None] + np.arange(block_days)
+    return idx.reshape(n_paths, -1)[:, :horizon_days]
+
+
+def simulate_paths(valid, is_repeat, n_targets, day_index, ruin_level=0.0, **params):
+    """
+    Runs the Final strategy (same rules as sim_kernel) over every path at once.
+    day_index is (paths x days); each step of the loop is one race slot for
+    all paths. A path that drops to `ruin_level` stops betting.
+
+    Returns a DataFrame with one row per path.
+    """
+    p = dict(DEFAULT_PARAMS)
+    p.update(params)
+    entry_gap, max_steps = p['entry_gap'], p['max_steps']
+    multiplier, payout = p['multiplier'], payout_by_race(p['payout_odds'])
+    cooldown_resets, compound_ratio, min_stake = p['cooldown_resets'], p['compound_ratio'], p['min_stake']
+
+    n_paths, horizon = day_index.shape
+    bankroll = np.full(n_paths, float(p['starting_bankroll']))
+    peak = bankroll.copy()
+    max_dd = np.zeros(n_paths)
+    max_dd_pct = np.zeros(n_paths)
+
+    gap = np.zeros(n_paths, dtype=np.int64)
+    in_session = np.zeros(n_paths, dtype=bool)
+    step = np.zeros(n_paths, dtype=np.int64)
+    stake = np.full(n_paths, float(min_stake))
+    cooling = np.zeros(n_paths, dtype=bool)
+    resets = np.zeros(n_paths, dtype=np.int64)
+
+    wins = np.zeros(n_paths, dtype=np.int64)
+    stops = np.zeros(n_paths, dtype=np.int64)
+    ruined = np.zeros(n_paths, dtype=bool)
+    ruin_day = np.full(n_paths, -1, dtype=np.int64)
+
+    for d in range(horizon):
+        day = day_index[:, d]
+        day_valid = valid[day]
+        day_rep = is_repeat[day]
+        day_targets = n_targets[day]
+
+        for slot in range(valid.shape[1]):
+            ok = day_valid[:, slot]
+            rep = day_rep[:, slot]
+
+            # 1. Cool Down
+            cd = cooling & ok
+            broke = cd & rep
+            resets += broke
+            gap[broke] = 0
+            gap[cd & ~rep] += 1
+            done = broke & (resets >= cooldown_resets)
+            cooling &= ~done
+            resets[done] = 0
+
+            # 2. Betting (not while cooling, never on R1)
+            bet = ok & ~cd & ~ruined & (in_session | (gap >= entry_gap)) if slot > 0 else np.zeros(n_paths, dtype=bool)
+            start = bet & ~in_session
+            if start.any():
+                if compound_ratio > 0:
+                    new_stake = np.round(np.maximum(bankroll / compound_ratio, min_stake), 2)
+                else:
+                    new_stake = np.full(n_paths, float(min_stake))
+                stake = np.where(start, new_stake, stake)
+                step[start] = 1
+                in_session |= start
+
+            bankroll -= np.where(bet, stake * day_targets[:, slot], 0.0)
+
+            won = bet & rep
+            bankroll += np.where(won, stake * payout[slot], 0.0)
+            wins += won
+            in_session &= ~won
+            step[won] = 0
+
+            lost = bet & ~rep
+            stop = lost & (step >= max_steps)
+            stops += stop
+            cooling |= stop & (cooldown_resets > 0)
+            resets[stop] = 0
+            in_session &= ~stop
+            step[stop] = 0
+            cont = lost & ~stop
+            step += cont
+            stake = np.where(cont, stake * multiplier, stake)
+
+            # 3. Gap Update
+            upd = ok & ~cooling & ~in_session
+            gap = np.where(upd, np.where(rep, 0, gap + 1), gap)
+
+            # 4. Peak / drawdown / ruin after every race, like the kernel's
+            # min_bankroll: a ladder played across R2..R4 dips within the day
+            np.maximum(peak, bankroll, out=peak)
+            dd = peak - bankroll
+            np.maximum(max_dd, dd, out=max_dd)
+            np.maximum(max_dd_pct, dd / peak, out=max_dd_pct)
+
+            newly_ruined = ~ruined & (bankroll <= ruin_level)
+            ruin_day[newly_ruined] = d
+            ruined |= newly_ruined
+            in_session &= ~ruined
+
+    return pd.DataFrame({
+        'final_bankroll': bankroll,
+        'max_drawdown': max_dd,
+        'max_drawdown_pct': max_dd_pct * 100,
+        'ruin_day': np.where(ruined, ruin_day, np.nan),
+        'wins': wins,
+        'stops': stops,
+    })
+
+
+def run_monte_carlo(csv_path=INPUT_CSV, n_paths=N_PATHS, years=YEARS, block_days=BLOCK_DAYS,
+                    seed=SEED, ruin_level=0.0, **params):
+    dates, digits, counts = load_days(csv_path)
+    keep = counts > 0
+    dates, digits, counts = dates[keep], digits[keep], counts[keep]
+    valid, is_repeat, n_targets = day_tables(dates, digits, counts, params.get('targets', DEFAULT_PARAMS['targets']))
+
+    horizon = int(round(years * trading_days_per_year(dates)))
+    day_index = bootstrap_days(len(dates), n_paths, horizon, block_days=block_days, seed=seed)
+    return simulate_paths(valid, is_repeat, n_targets, day_index, ruin_level=ruin_level, **params)
+
+
+def summarize(results, percentiles=(1, 5, 25, 50, 75, 95, 99)):
+    """Percentile table of the per-path outcome columns plus ruin probability."""
+    cols = ['final_bankroll', 'max_drawdown', 'max_drawdown_pct', 'stops']
+    table = results[cols].quantile([q / 100 for q in percentiles])
+    table.index = [f"P{q}" for q in percentiles]
+    ruined = results['ruin_day'].notna()
+    summary = {
+        'ruin_probability_pct': ruined.mean() * 100,
+        'median_ruin_day': results.loc[ruined, 'ruin_day'].median() if ruined.any() else np.nan,
+    }
+    return table, summary
+
+
+def bankroll_per_dollar_stake(csv_path=INPUT_CSV, pct=99, **kwargs):
+    """
+    Bankroll needed per $1 of base stake so that `pct`% of paths never draw
+    down further than it (fixed $1 stake, no compounding). This is the
+    number generate_ladder.py uses as SAFE_BANKROLL_PER_DOLLAR_STAKE.
+    """
+    kwargs.setdefault('starting_bankroll', 1e9)
+    res = run_monte_carlo(csv_path, compound_ratio=0.0, min_stake=1.0, **kwargs)
+    return float(np.percentile(res['max_drawdown'], pct))
+
+
+if __name__ == '__main__':
+    t0 = time.perf_counter()
+    res = run_monte_carlo()
+    elapsed = time.perf_counter() - t0
+    table, summary = summarize(res)
+
+    print(f"# Monte Carlo Risk ({N_PATHS} paths x {YEARS} years, {BLOCK_DAYS}-day blocks) in {elapsed:.1f}s")
+    print(table.to_string(float_format=lambda x: f"{x:,.2f}"))
+    print(f"\nRisk of Ruin: {summary['ruin_probability_pct']:.2f}% | Median Ruin Day: {summary['median_ruin_day']}")
+    for pct in (95, 99):
+        print(f"SAFE_BANKROLL_PER_DOLLAR_STAKE (P{pct} drawdown): ${bankroll_per_dollar_stake(pct=pct):,.2f}")
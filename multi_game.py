@@ -0,0 +1,138 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+
+from horse_events import load_game_events, RACE_COLS
+from sim_kernel import run_batch
+from streak_ev import streak_table
+import profiling
+
+INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\horses_all_draws.csv"
+OUTPUT_REPORT = r"c:\Users\Admin\Desktop\SniperStrategyProject\sim_report_games.md"
+
+
+def race_stats(ev):
+    """Repeat (win) rate by race for every game: one row per (game, race)."""
+    n_games, n_races = len(ev['names']), len(RACE_COLS)
+    key = ev['series'].astype(np.int64) * n_races + (ev['race'] - 1)
+    opps = np.bincount(key[ev['is_opp']], minlength=n_games * n_races).reshape(n_games, n_races)
+    reps = np.bincount(key[ev['is_repeat']], minlength=n_games * n_races).reshape(n_games, n_races)
+
+    g, r = np.nonzero(opps)
+    return pd.DataFrame({
+        'game': np.array(ev['names'], dtype=object)[g],
+        'race': r + 1,
+        'opportunities': opps[g, r],
+        'repeats': reps[g, r],
+        'win_rate_pct': reps[g, r] / opps[g, r] * 100,
+    })
+
+
+def gap_stats(ev):
+    """Distribution of closed gap (streak) lengths per game, plus the open one."""
+    rows = []
+    starts = ev['starts']
+    for g, name in enumerate(ev['names']):
+        a, b = starts[g], starts[g + 1]
+        if a == b:
+            continue
+        _, _, lengths, censored = streak_table(ev['is_repeat'][a:b])
+        closed = lengths[~censored]
+        rows.append({
+            'game': name,
+            'streaks': len(closed),
+            'mean_gap': closed.mean() if len(closed) else np.nan,
+            'median_gap': np.median(closed) if len(closed) else np.nan,
+            'p90_gap': np.percentile(closed, 90) if len(closed) else np.nan,
+            'max_gap': closed.max() if len(closed) else np.nan,
+            'current_gap': int(lengths[-1]) if censored.any() else 0,
+        })
+    return pd.DataFrame(rows)
+
+
+def pnl_stats(ev, res):
+    """Final-strategy P&L per game from one run_batch result."""
+    start = res['params']['starting_bankroll']
+    starts = ev['starts']
+    day_counts = np.bincount(ev['day_series'], minlength=len(ev['names']))
+    rows = []
+    for g, name in enumerate(ev['names']):
+        a, b = starts[g], starts[g + 1]
+        if a == b:
+            continue
+        bank = res['bankroll'][a:b]
+        peak = np.maximum.accumulate(np.concatenate(([start], bank)))[1:]
+        rows.append({
+            'game': name,
+            'days': int(day_counts[g]),
+            'events': int(b - a),
+            'final_bankroll': res['final_bankroll'][g],
+            'net_profit': res['final_bankroll'][g] - start,
+            'roi_pct': (res['final_bankroll'][g] - start) / start * 100,
+            'wins': int(res['wins'][g]),
+            'stops': int(res['stops'][g]),
+            'max_drawdown': float((peak - bank).max()),
+        })
+    return pd.DataFrame(rows)
+
+
+def run_games(csv_path=INPUT_CSV, prof=profiling.NULL, **params):
+    """Loads every game, runs the Final strategy on all of them in one batch and builds the tables."""
+    prof.stage('load')
+    ev = load_game_events(csv_path)
+    prof.count('events', len(ev['winner']))
+    prof.count('games', len(ev['names']))
+    prof.stage('kernel')
+    res = run_batch(ev, ev['starts'], **params)
+    prof.stage('tables')
+    return ev, res, {
+        'pnl': pnl_stats(ev, res),
+        'races': race_stats(ev),
+        'gaps': gap_stats(ev),
+    }
+
+
+def _md_table(df, floatfmt="{:,.2f}"):
+    cols = list(df.columns)
+    lines = ["| " + " | ".join(cols) + " |", "|" + "---|" * len(cols)]
+    for row in df.itertuples(index=False):
+        cells = [floatfmt.format(v) if isinstance(v, (float, np.floating)) else str(v) for v in row]
+        lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+
+def run_simulation():
+    if not os.path.exists(INPUT_CSV):
+        print("Data file not found.")
+        return
+
+    prof = profiling.start(OUTPUT_REPORT, script='multi_game')
+    t0 = time.perf_counter()
+    ev, res, tables = run_games(INPUT_CSV, prof=prof)
+    elapsed = time.perf_counter() - t0
+    prof.stage('report')
+    p = res['params']
+
+    report = f"""# Multi-Game Simulation Report ({len(ev['names'])} games)
+**Configuration:** Gap {p['entry_gap']} | Stop {p['max_steps']} | {p['cooldown_resets']}-Resets | Bankroll ${p['starting_bankroll']:,.2f} per game | Compounding: Bank / {p['compound_ratio']:g}
+**Events:** {len(ev['winner']):,} in {elapsed:.2f}s
+
+## P&L by Game
+{_md_table(tables['pnl'].sort_values('roi_pct', ascending=False))}
+
+## Win Rate by Race
+{_md_table(tables['races'])}
+
+## Gap Distribution
+{_md_table(tables['gaps'])}
+"""
+    with open(OUTPUT_REPORT, 'w', encoding='utf-8') as f:
+        f.write(report)
+
+    print(report)
+    prof.finish()
+
+
+if __name__ == '__main__':
+    run_simulation()
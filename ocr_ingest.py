@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError: # Optional: only needed for the 'tesseract' backend
+    pytesseract = None
+
+PS_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch_ocr.ps1")
+CACHE_DIRNAME = "ocr_cache"
+INDEX_FILE = "index.json"
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
+CHUNK_SIZE = 25 # Images per OCR task (one PowerShell start per chunk)
+
+
+# --- OCR backends -----------------------------------------------------------
+# A backend takes a list of image paths and returns {path: lines}, where lines
+# is a list of {'Text', 'Top', 'Left', 'Height'} (one per text line, position
+# of its first word), the same shape batch_ocr.ps1 writes.
+
+def _as_list(value):
+    # ConvertTo-Json collapses 1-element arrays into a bare object
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def ocr_winrt(paths):
+    """Windows.Media.Ocr through batch_ocr.ps1 (one PowerShell process per call)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        list_file = os.path.join(tmp, "files.txt")
+        out_file = os.path.join(tmp, "ocr.json")
+        with open(list_file, 'w', encoding='utf-8') as f:
+            f.write("\n".join(paths))
+        subprocess.run(["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-File", PS_SCRIPT,
+                        "-ListFile", list_file, "-OutFile", out_file], check=True, capture_output=True)
+        with open(out_file, 'r', encoding='utf-8-sig') as f:
+            entries = _as_list(json.load(f))
+
+    by_name = {os.path.basename(p): p for p in paths}
+    return {by_name[e['FileName']]: _as_list(e.get('Data')) for e in entries if e.get('FileName') in by_name}
+
+
+def ocr_tesseract(paths):
+    """Local Tesseract (pytesseract + Pillow), usable on Linux."""
+    if pytesseract is None:
+        raise RuntimeError("The 'tesseract' backend needs pytesseract and Pillow installed.")
+    out = {}
+    for path in paths:
+        with Image.open(path) as img:
+            data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
+        lines = {}
+        for i, word in enumerate(data['text']):
+            if not word.strip():
+                continue
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            if key not in lines:
+                lines[key] = {'Text': word, 'Top': data['top'][i], 'Left': data['left'][i], 'Height': data['height'][i]}
+            else:
+                lines[key]['Text'] += ' ' + word
+        out[path] = list(lines.values())
+    return out
+
+
+BACKENDS = {
+    'winrt': ocr_winrt,
+    'tesseract': ocr_tesseract,
+}
+
+
+def register_backend(name, func):
+    """Adds an OCR backend: func(paths) -> {path: lines}. Must be importable for the worker pool."""
+    BACKENDS[name] = func
+
+
+def _run_backend(backend, paths):
+    return BACKENDS[backend](paths)
+
+
+def _ocr_chunk(backend, paths):
+    """(result, None), or ({}, error text) when the backend fails on the chunk."""
+    try:
+        return _run_backend(backend, paths), None
+    except Exception as e:
+        detail = getattr(e, 'stderr', None) # powershell's own message, for batch_ocr.ps1 failures
+        if isinstance(detail, bytes):
+            detail = detail.decode('utf-8', 'replace')
+        return {}, f"{type(e).__name__}: {e}" + (f" {detail.strip()}" if detail else '')
+
+
+# --- Per-image cache ----------------------------------------------------------
+# <images_dir>/ocr_cache/<sha1>.json holds the OCR lines of one image, keyed by
+# its content, so renamed or copied screenshots are never OCR'd twice.
+# index.json maps file name -> size, mtime, hash and the parsed row, so
+# unchanged files are neither re-hashed nor re-parsed.
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class OcrCache:
+    def __init__(self, images_dir):
+        self.dir = os.path.join(images_dir, CACHE_DIRNAME)
+        os.makedirs(self.dir, exist_ok=True)
+        self.index_path = os.path.join(self.dir, INDEX_FILE)
+        self.index = _read_json(self.index_path, {})
+
+    def _path(self, digest):
+        return os.path.join(self.dir, digest + '.json')
+
+    def has(self, digest):
+        return os.path.exists(self._path(digest))
+
+    def get(self, digest):
+        return _read_json(self._path(digest), None)
+
+    def put(self, digest, file_name, lines):
+        _write_json(self._path(digest), {'FileName': file_name, 'Data': lines})
+
+    def save_index(self):
+        _write_json(self.index_path, self.index)
+
+
+def import_legacy_json(images_dir, json_path=None):
+    """Seeds the cache from a monolithic ocr_results.json so old OCR work is reused."""
+    json_path = json_path or os.path.join(images_dir, "ocr_results.json")
+    cache = OcrCache(images_dir)
+    n = 0
+    for entry in _as_list(_read_json(json_path, [])):
+        path = os.path.join(images_dir, entry.get('FileName') or '')
+        if not os.path.isfile(path):
+            continue
+        digest = file_hash(path)
+        if not cache.has(digest):
+            cache.put(digest, entry['FileName'], _as_list(entry.get('Data')))
+            n += 1
+    return n
+
+
+# --- Pipeline -------------------------------------------------------------------
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _parse_entry(args):
+    parse, entry = args
+    return parse(entry)
+
+
+def ingest(images_dir, parse, backend='winrt', workers=None, parser_version=1, log=print):
+    """
+    Brings the cache up to date with `images_dir` and returns parse()'s result
+    for every image (None if it has no OCR result), in file name order.
+
+    Only new or changed images are hashed and OCR'd, and only images whose
+    cached row is missing or from another parser_version are re-parsed.
+    OCR and parsing run on a process pool (workers=1 runs inline). A chunk
+    the backend fails on is logged and retried on the next run.
+    parse(entry) gets {'FileName', 'Data'} and must be a module-level function.
+    """
+    cache = OcrCache(images_dir)
+    names = sorted(n for n in os.listdir(images_dir) if n.lower().endswith(IMAGE_EXTS))
+
+    # 1. Hash only files whose size/mtime changed
+    stats = {n: os.stat(os.path.join(images_dir, n)) for n in names}
+    stale = [n for n in names
+             if n not in cache.index
+             or cache.index[n]['size'] != stats[n].st_size
+             or cache.index[n]['mtime'] != stats[n].st_mtime_ns]
+    with ThreadPoolExecutor(max_workers=min(8, len(stale)) or 1) as pool:
+        digests = dict(zip(stale, pool.map(lambda n: file_hash(os.path.join(images_dir, n)), stale)))
+    for n in stale:
+        cache.index[n] = {'size': stats[n].st_size, 'mtime': stats[n].st_mtime_ns, 'hash': digests[n]}
+    for n in set(cache.index) - set(names):
+        del cache.index[n]
+
+    # 2. OCR images whose content is not cached yet
+    to_ocr = {}
+    for n in names:
+        digest = cache.index[n]['hash']
+        if digest not in to_ocr and not cache.has(digest):
+            to_ocr[digest] = os.path.join(images_dir, n)
+    paths = list(to_ocr.values())
+    path_digest = {p: d for d, p in to_ocr.items()}
+    log(f"{len(names)} images, {len(stale)} new/changed, {len(paths)} to OCR ({backend})")
+
+    tasks = _chunks(paths, CHUNK_SIZE)
+    if workers == 1 or len(tasks) <= 1:
+        done = ((t, _ocr_chunk(backend, t)) for t in tasks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        futures = {pool.submit(_ocr_chunk, backend, t): t for t in tasks}
+        done = ((futures[f], f.result()) for f in as_completed(futures))
+    failed = []
+    try:
+        for task, (result, error) in done:
+            # A failed chunk is logged and skipped, its images stay uncached for the next run
+            if error is not None:
+                failed.append(task)
+                log(f"OCR failed on {len(task)} images ({os.path.basename(task[0])}...): {error}")
+            # Cache each chunk as it lands, so an interrupted run keeps its progress
+            for path, lines in result.items():
+                cache.put(path_digest[path], os.path.basename(path), lines)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if failed:
+        log(f"Warning: {len(failed)} of {len(tasks)} OCR chunks failed.")
+
+    # 3. Parse images without a current row
+    to_parse = [n for n in names
+                if cache.index[n].get('parser') != parser_version or 'row' not in cache.index[n]]
+    to_parse = [n for n in to_parse if cache.has(cache.index[n]['hash'])]
+    entries = []
+    for n in to_parse:
+        entry = cache.get(cache.index[n]['hash'])
+        entry['FileName'] = n
+        entries.append((parse, entry))
+    if workers == 1 or len(entries) < 2 * CHUNK_SIZE:
+        parsed = [_parse_entry(e) for e in entries]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(_parse_entry, entries, chunksize=CHUNK_SIZE))
+    for n, row in zip(to_parse, parsed):
+        cache.index[n]['row'] = row
+        cache.index[n]['parser'] = parser_version
+    cache.save_index()
+
+    missing = [n for n in names if 'row' not in cache.index[n]]
+    if missing:
+        log(f"Warning: {len(missing)} images have no OCR result (backend failed on them).")
+    return [cache.index[n].get('row') for n in names]
+
+
+if __name__ == '__main__':
+    # python ocr_ingest.py <images_dir> [legacy ocr_results.json]
+    print(f"Imported {import_legacy_json(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)} cached images.")
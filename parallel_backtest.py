@@ -0,0 +1,164 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from horse_events import load_events
+from sim_kernel import run_kernel, DEFAULT_PARAMS
+
+INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
+
+# Filled once per worker process by _attach(), read-only views into shared memory
+_WORKER_EVENTS = {}
+_WORKER_BLOCKS = [] # Keeps the mappings open for the life of the worker
+
+
+def share_events(datasets):
+    """
+    Copies each dataset's event arrays into shared memory blocks.
+
+    `datasets` is {name: events dict from horse_events}. Returns (spec, blocks):
+    spec is the small picklable description workers use to attach, blocks
+    must be kept alive by the parent and passed to release_events() at the end.
+    """
+    spec = {}
+    blocks = []
+    for name, events in datasets.items():
+        spec[name] = {}
+        for key, arr in events.items():
+            if not isinstance(arr, np.ndarray):
+                continue
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+            spec[name][key] = (shm.name, arr.shape, arr.dtype.str)
+            blocks.append(shm)
+    return spec, blocks
+
+
+def release_events(blocks):
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+
+
+def _attach(spec):
+    """Worker initializer: maps every shared array without copying it."""
+    for name, arrays in spec.items():
+        events = {}
+        for key, (shm_name, shape, dtype) in arrays.items():
+            shm = shared_memory.SharedMemory(name=shm_name)
+            arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+            arr.flags.writeable = False
+            events[key] = arr
+            _WORKER_BLOCKS.append(shm)
+        _WORKER_EVENTS[name] = events
+
+
+def slice_events(events, start_day=None, end_day=None, loops=1):
+    """Events for days [start_day, end_day), optionally replayed `loops` times back to back."""
+    date_idx = events['date_idx']
+    lo = 0 if start_day is None else int(np.searchsorted(date_idx, start_day, side='left'))
+    hi = len(date_idx) if end_day is None else int(np.searchsorted(date_idx, end_day, side='left'))
+    out = {}
+    for key in ('n_targets', 'prev_mask', 'race', 'is_repeat', 'is_opp', 'winner', 'date_idx'):
+        part = events[key][lo:hi]
+        out[key] = np.tile(part, loops) if loops > 1 else part
+    out['dates'] = events['dates']
+    return out
+
+
+def run_task(task):
+    """
+    One independent backtest. `task` is a plain dict:
+    {'dataset': name, 'params': {...kernel params}, 'start_day': int|None,
+     'end_day': int|None, 'loops': int}
+    """
+    events = _WORKER_EVENTS[task['dataset']]
+    ev = slice_events(events, task.get('start_day'), task.get('end_day'), task.get('loops', 1))
+    res = run_kernel(ev, **task.get('params', {}))
+    return {
+        'final_bankroll': res['final_bankroll'],
+        'peak_bankroll': res['peak_bankroll'],
+        'min_bankroll': res['min_bankroll'],
+        'wins': res['wins'],
+        'stops': res['stops'],
+        'n_events': len(ev['winner']),
+    }
+
+
+def _run_chunk(tasks):
+    return [run_task(t) for t in tasks]
+
+
+def run_backtests(datasets, tasks, workers=None, chunksize=None):
+    """
+    Fans `tasks` out over a process pool. Event arrays are shared once through
+    shared memory; only the small task dicts are pickled. Results come back
+    in task order, so the merged table is the same whatever the scheduling.
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(tasks) // (workers * 4))
+
+    spec, blocks = share_events(datasets)
+    try:
+        if workers == 1:
+            _attach(spec)
+            rows = _run_chunk(tasks)
+        else:
+            chunks = [tasks[i:i + chunksize] for i in range(0, len(tasks), chunksize)]
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(spec,)) as pool:
+                rows = [row for chunk in pool.map(_run_chunk, chunks) for row in chunk]
+    finally:
+        # Inline runs attached in this process; drop the views before unmapping
+        _WORKER_EVENTS.clear()
+        while _WORKER_BLOCKS:
+            _WORKER_BLOCKS.pop().close()
+        release_events(blocks)
+
+    table = pd.DataFrame(_task_columns(tasks))
+    return pd.concat([table, pd.DataFrame(rows)], axis=1)
+
+
+def _task_columns(tasks):
+    cols = []
+    for i, t in enumerate(tasks):
+        row = {'task': i, 'dataset': t['dataset'], 'start_day': t.get('start_day'),
+               'end_day': t.get('end_day'), 'loops': t.get('loops', 1)}
+        row.update(t.get('params', {}))
+        cols.append(row)
+    return cols
+
+
+def param_tasks(dataset, grid, **common):
+    """One task per parameter dict in `grid` (e.g. a list of dicts or DataFrame records)."""
+    if isinstance(grid, pd.DataFrame):
+        grid = grid.to_dict('records')
+    return [dict(common, dataset=dataset, params=dict(p)) for p in grid]
+
+
+def walk_forward_tasks(dataset, n_days, window_days, step_days, params=None):
+    """One task per rolling window of `window_days`, moved forward by `step_days`."""
+    tasks = []
+    for start in range(0, max(n_days - window_days, 0) + 1, step_days):
+        tasks.append({'dataset': dataset, 'params': dict(params or {}),
+                      'start_day': start, 'end_day': start + window_days})
+    return tasks
+
+
+if __name__ == '__main__':
+    ev = load_events(INPUT_CSV)
+    datasets = {'ny': ev}
+
+    # Same 4x replay sim_horses_long_term uses, plus a small parameter grid
+    grid = [dict(DEFAULT_PARAMS, entry_gap=g, max_steps=m, multiplier=x)
+            for g in range(2, 9) for m in range(4, 9) for x in (1.5, 1.7, 2.0, 2.2)]
+    tasks = param_tasks('ny', grid, loops=4)
+    tasks += walk_forward_tasks('ny', len(ev['dates']), window_days=90, step_days=30)
+
+    t0 = time.perf_counter()
+    table = run_backtests(datasets, tasks)
+    print(f"{len(tasks)} backtests in {time.perf_counter() - t0:.2f}s on {os.cpu_count()} cores")
+    print(table.sort_values('final_bankroll', ascending=False).head(15).to_string(index=False))
@@ -0,0 +1,148 @@
+import pandas as pd
+import numpy as np
+import itertools
+import time
+
+from horse_events import load_events
+from pricing import price, TARGET_MODE
+import result_cache
+
+INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
+PAYOUT_ODDS = 9.0
+RECOVERY_CAP = 10.0 # Max factor applied to the base stake after consecutive stops
+
+GRID_COLUMNS = ['step_mult', 'recovery_mult', 'entry_gap', 'max_steps', 'base_stake']
+
+
+def load_opportunities(csv_path=INPUT_CSV, targets=TARGET_MODE, payout_odds=PAYOUT_ODDS):
+    """
+    Repeat flags, tickets per bet and payout for R2..R4 only (R1 never
+    counts in the optimization model), priced by pricing.price.
+    """
+    ev = load_events(csv_path, dedupe=False)
+    priced = price(ev, targets, payout_odds)
+    opp = ev['is_opp']
+    return ev['is_repeat'][opp], priced['targets'][opp], priced['payout'][opp]
+
+
+def make_grid(step_mults, recovery_mults, entry_gaps, max_steps, base_stakes):
+    """Full Cartesian product as a DataFrame, one row per configuration."""
+    combos = list(itertools.product(step_mults, recovery_mults, entry_gaps, max_steps, base_stakes))
+    grid = pd.DataFrame(combos, columns=GRID_COLUMNS)
+    return grid.astype({'step_mult': float, 'recovery_mult': float, 'entry_gap': int,
+                        'max_steps': int, 'base_stake': float})
+
+
+def simulate_grid(is_repeat, grid, payout_odds=PAYOUT_ODDS, n_targets=None):
+    """
+    Runs the analyze_optimization model (cost = stake * tickets, payout =
+    stake * odds, recovery factor on the base stake after stops) for every
+    row of `grid` at once. One pass over the events, each step is a vector
+    op over configs. `n_targets` and `payout_odds` may be per-event arrays
+    from load_opportunities; without n_targets every bet is one ticket.
+
+    Returns a copy of `grid` with net_profit, min_equity, wins and stops.
+    """
+    step_mult = grid['step_mult'].to_numpy(dtype=np.float64)
+    recovery_mult = grid['recovery_mult'].to_numpy(dtype=np.float64)
+    entry_gap = grid['entry_gap'].to_numpy(dtype=np.int64)
+    max_steps = grid['max_steps'].to_numpy(dtype=np.int64)
+    base_stake = grid['base_stake'].to_numpy(dtype=np.float64)
+    use_recovery = recovery_mult > 1.0
+
+    n = len(grid)
+    in_session = np.zeros(n, dtype=bool)
+    step = np.zeros(n, dtype=np.int64)
+    cycle_losses = np.zeros(n, dtype=np.int64)
+    session_stake = base_stake.copy()
+    equity = np.zeros(n)
+    min_equity = np.zeros(n)
+    wins = np.zeros(n, dtype=np.int64)
+    stops = np.zeros(n, dtype=np.int64)
+
+    # The gap only depends on the data, not on the config
+    is_repeat = np.asarray(is_repeat, dtype=bool)
+    gaps = _gap_before(is_repeat)
+    if n_targets is None:
+        n_targets = np.ones(len(is_repeat))
+    payouts = np.broadcast_to(np.asarray(payout_odds, dtype=np.float64), is_repeat.shape)
+
+    for gap, rep, tickets, odds in zip(gaps.tolist(), is_repeat.tolist(), n_targets.tolist(), payouts.tolist()):
+        bet = in_session | (gap >= entry_gap)
+        if not bet.any():
+            continue
+
+        start = bet & ~in_session
+        if start.any():
+            recovering = start & use_recovery & (cycle_losses > 0)
+            factor = np.where(recovering, np.minimum(recovery_mult ** cycle_losses, RECOVERY_CAP), 1.0)
+            session_stake = np.where(start, base_stake * factor, session_stake)
+            step[start] = 1
+            in_session |= start
+
+        equity -= np.where(bet, session_stake * tickets, 0.0)
+
+        if rep:
+            equity += np.where(bet, session_stake * odds, 0.0)
+            wins += bet
+            in_session &= ~bet
+            cycle_losses[bet] = 0
+        else:
+            stop = bet & (step >= max_steps)
+            stops += stop
+            cycle_losses += stop
+            in_session &= ~stop
+            cont = bet & ~stop
+            step += cont
+            session_stake = np.where(cont, session_stake * step_mult, session_stake)
+
+        np.minimum(min_equity, equity, out=min_equity)
+
+    out = grid.copy()
+    out['net_profit'] = equity
+    out['min_equity'] = min_equity
+    out['wins'] = wins
+    out['stops'] = stops
+    return out
+
+
+def _gap_before(is_repeat):
+    """Gap (races since last repeat) seen before each event."""
+    idx = np.arange(len(is_repeat))
+    last_rep = np.maximum.accumulate(np.where(is_repeat, idx, -1))
+    # Last repeat strictly before each event (-1 if none yet)
+    prev_rep = np.concatenate(([-1], last_rep[:-1]))
+    return idx - prev_rep - 1
+
+
+def sweep(step_mults, recovery_mults, entry_gaps, max_steps, base_stakes,
+          csv_path=INPUT_CSV, is_repeat=None, payout_odds=PAYOUT_ODDS, n_targets=None):
+    """
+    Loads the data once (unless given) and evaluates the whole grid. Sweeps
+    straight from the CSV are cached on disk (result_cache).
+    """
+    if is_repeat is None:
+        return result_cache.on_dataset(csv_path, _sweep_csv, step_mults, recovery_mults, entry_gaps,
+                                       max_steps, base_stakes, payout_odds)
+    grid = make_grid(step_mults, recovery_mults, entry_gaps, max_steps, base_stakes)
+    return simulate_grid(is_repeat, grid, payout_odds=payout_odds, n_targets=n_targets)
+
+
+def _sweep_csv(csv_path, step_mults, recovery_mults, entry_gaps, max_steps, base_stakes, payout_odds):
+    is_repeat, n_targets, payout_odds = load_opportunities(csv_path, payout_odds=payout_odds)
+    return sweep(step_mults, recovery_mults, entry_gaps, max_steps, base_stakes,
+                 is_repeat=is_repeat, payout_odds=payout_odds, n_targets=n_targets)
+
+
+if __name__ == '__main__':
+    is_rep, n_targets, payout = load_opportunities()
+    t0 = time.perf_counter()
+    table = sweep(step_mults=np.round(np.arange(1.5, 2.55, 0.1), 2),
+                  recovery_mults=[1.0, 1.25, 1.5, 1.75, 2.0, 2.5, 3.0],
+                  entry_gaps=range(0, 11),
+                  max_steps=range(3, 11),
+                  base_stakes=[1.0, 2.0, 5.0],
+                  is_repeat=is_rep, payout_odds=payout, n_targets=n_targets)
+    elapsed = time.perf_counter() - t0
+    print(f"Evaluated {len(table)} configurations in {elapsed:.2f}s")
+    print(table.sort_values('net_profit', ascending=False).head(20).to_string(index=False))
@@ -0,0 +1,224 @@
+import pandas as pd
+import numpy as np
+import heapq
+import os
+
+from horse_events import load_game_events
+from sim_kernel import DEFAULT_PARAMS
+from pricing import price
+
+INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\horses_all_draws.csv"
+OUTPUT_EQUITY = r"c:\Users\Admin\Desktop\SniperStrategyProject\portfolio_equity.csv"
+
+# Global exposure limits (None = unlimited)
+MAX_SESSIONS = None # Open martingale sessions across all games
+MAX_COMMITTED = None # Worst-case dollars still to be laid on all open ladders (stake x max tickets)
+
+DRAW_ORDER = {'Midday': 0, 'Evening': 1} # Time of day; unknown draws go first
+
+
+def event_times(ev):
+    """
+    Sortable int64 timestamp per event: date, then draw time, then race.
+    Games with the same timestamp are ordered by game code in the merge.
+    """
+    draw_rank = np.array([DRAW_ORDER.get(name.partition('/')[2], 0) for name in ev['names']] or [0], dtype=np.int64)
+    day = ev['dates'].astype(np.int64)[ev['date_idx']]
+    return (day * len(DRAW_ORDER) + draw_rank[ev['series']]) * 8 + ev['race']
+
+
+def merge_streams(ev, times=None):
+    """
+    k-way heap merge of the per-game event streams (each already in time
+    order) into one timeline. Yields (time, game, event index).
+    """
+    if times is None:
+        times = event_times(ev)
+    starts = ev['starts']
+
+    def stream(g):
+        for i in range(starts[g], starts[g + 1]):
+            yield int(times[i]), g, i
+
+    return heapq.merge(*(stream(g) for g in range(len(starts) - 1)))
+
+
+def _ladder(stake, steps_left, multiplier):
+    """Per-target stake of the remaining steps of a session (this one included)."""
+    if multiplier == 1:
+        return stake * steps_left
+    return stake * (multiplier ** steps_left - 1) / (multiplier - 1)
+
+
+def simulate_portfolio(ev, max_sessions=MAX_SESSIONS, max_committed=MAX_COMMITTED, **params):
+    """
+    Runs the Final strategy on every game at once with ONE shared bankroll,
+    in a single pass over the merged timeline. Each game keeps its own gap,
+    session, ladder and cool-down (same rules as sim_kernel); entry stakes
+    compound on the shared bankroll. A new session is only opened if it
+    fits the exposure limits, otherwise the entry is skipped (the gap keeps
+    growing and the game can enter on a later race). Committed exposure is
+    in dollars: every remaining step of a ladder is booked at the most
+    tickets a bet can take, and released as it is laid.
+
+    Returns a dict with the per-event timeline (in merged order), the daily
+    combined equity curve, per-game summary and the correlation of the
+    per-game drawdowns.
+    """
+    p = dict(DEFAULT_PARAMS)
+    p.update(params)
+    entry_gap, max_steps = p['entry_gap'], p['max_steps']
+    multiplier = p['multiplier']
+    cooldown_resets, compound_ratio, min_stake = p['cooldown_resets'], p['compound_ratio'], p['min_stake']
+
+    n_games = len(ev['names'])
+    gap = [0] * n_games
+    in_session = [False] * n_games
+    step = [0] * n_games
+    stake = [float(min_stake)] * n_games
+    cooling = [False] * n_games
+    resets = [0] * n_games
+    wins = [0] * n_games
+    stops = [0] * n_games
+    blocked = [0] * n_games
+
+    bankroll = float(p['starting_bankroll'])
+    open_sessions = 0
+    committed = 0.0
+
+    n = len(ev['winner'])
+    order = np.empty(n, dtype=np.int64)
+    out_bankroll = np.empty(n)
+    out_open = np.empty(n, dtype=np.int16)
+    out_committed = np.empty(n)
+    game_pnl = np.zeros(n) # P&L of the event, booked to its game
+
+    priced = price(ev, p['targets'], p['payout_odds'])
+    targets, payout, is_repeat, is_opp = priced['targets'], priced['payout'], ev['is_repeat'], ev['is_opp']
+    # Tickets per bet are only known once the day's earlier races are in
+    max_tickets = float(targets[is_opp].max()) if is_opp.any() else 1.0
+    for k, (_, g, i) in enumerate(merge_streams(ev)):
+        opp = is_opp[i]
+        rep = opp and is_repeat[i]
+        pnl = 0.0
+
+        if cooling[g]:
+            if rep:
+                resets[g] += 1
+                gap[g] = 0
+                if resets[g] >= cooldown_resets:
+                    cooling[g] = False
+                    resets[g] = 0
+            else:
+                gap[g] += 1
+
+        elif opp and (in_session[g] or gap[g] >= entry_gap):
+            if not in_session[g]:
+                if compound_ratio > 0:
+                    new_stake = round(max(bankroll / compound_ratio, min_stake), 2)
+                else:
+                    new_stake = min_stake
+                ladder = _ladder(new_stake, max_steps, multiplier) * max_tickets
+                if ((max_sessions is not None and open_sessions >= max_sessions)
+                        or (max_committed is not None and committed + ladder > max_committed)):
+                    blocked[g] += 1
+                else:
+                    in_session[g] = True
+                    step[g] = 1
+                    stake[g] = new_stake
+                    open_sessions += 1
+                    committed += ladder
+
+            if in_session[g]:
+                s = stake[g]
+                cost = s * targets[i]
+                bankroll -= cost
+                pnl = -cost
+                committed -= s * max_tickets
+                if rep:
+                    bankroll += s * payout[i]
+                    pnl += s * payout[i]
+                    wins[g] += 1
+                    committed -= _ladder(s * multiplier, max_steps - step[g], multiplier) * max_tickets
+                    in_session[g] = False
+                    step[g] = 0
+                    open_sessions -= 1
+                elif step[g] >= max_steps:
+                    stops[g] += 1
+                    cooling[g] = cooldown_resets > 0
+                    resets[g] = 0
+                    in_session[g] = False
+                    step[g] = 0
+                    open_sessions -= 1
+                else:
+                    step[g] += 1
+                    stake[g] = s * multiplier
+
+        if not cooling[g] and not in_session[g]:
+            gap[g] = 0 if rep else gap[g] + 1
+
+        if open_sessions == 0:
+            committed = 0.0 # Drop float residue
+        order[k] = i
+        out_bankroll[k] = bankroll
+        out_open[k] = open_sessions
+        out_committed[k] = committed
+        game_pnl[k] = pnl
+
+    timeline = pd.DataFrame({
+        'date': ev['dates'][ev['date_idx'][order]],
+        'game': np.array(ev['names'], dtype=object)[ev['series'][order]] if n else [],
+        'race': ev['race'][order],
+        'bankroll': out_bankroll,
+        'pnl': game_pnl,
+        'open_sessions': out_open,
+        'committed': out_committed,
+    })
+
+    # Drawdowns per event, so a ladder's dip within the day counts
+    timeline['drawdown'] = timeline['bankroll'].cummax().clip(lower=p['starting_bankroll']) - timeline['bankroll']
+    game_cum = timeline.groupby('game')['pnl'].cumsum()
+    event_game_dd = game_cum.groupby(timeline['game']).cummax().clip(lower=0.0) - game_cum
+
+    # Daily curves: combined equity (end of day, worst drawdown of the day) and cumulative P&L per game
+    equity = timeline.groupby('date').agg(bankroll=('bankroll', 'last'),
+                                          drawdown=('drawdown', 'max'),
+                                          max_open_sessions=('open_sessions', 'max'),
+                                          max_committed=('committed', 'max'))
+    per_game = timeline.pivot_table(index='date', columns='game', values='pnl', aggfunc='sum', fill_value=0.0).cumsum()
+    game_dd = per_game.cummax().clip(lower=0.0) - per_game
+
+    games = pd.DataFrame({
+        'game': ev['names'],
+        'wins': wins,
+        'stops': stops,
+        'blocked_entries': blocked,
+    }).set_index('game')
+    games['net_profit'] = per_game.iloc[-1] if len(per_game) else 0.0
+    games['max_drawdown'] = event_game_dd.groupby(timeline['game']).max().reindex(ev['names'], fill_value=0.0).to_numpy()
+
+    return {
+        'timeline': timeline,
+        'equity': equity,
+        'games': games.reset_index(),
+        'drawdown_corr': game_dd.corr(),
+        'final_bankroll': bankroll,
+        'max_drawdown': float(timeline['drawdown'].max()) if n else 0.0,
+        'params': p,
+    }
+
+
+def run_portfolio(csv_path=INPUT_CSV, **kwargs):
+    return simulate_portfolio(load_game_events(csv_path), **kwargs)
+
+
+if __name__ == '__main__':
+    if not os.path.exists(INPUT_CSV):
+        print("Data file not found.")
+    else:
+        res = run_portfolio()
+        res['equity'].to_csv(OUTPUT_EQUITY)
+        print(f"Final Bankroll: ${res['final_bankroll']:,.2f} | Max Drawdown: ${res['max_drawdown']:,.2f}")
+        print(res['games'].to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+        print("\nDrawdown correlation:")
+        print(res['drawdown_corr'].to_string(float_format=lambda x: f"{x:.2f}"))
@@ -0,0 +1,83 @@
+import numpy as np
+
+from results_store import RACE_COLS
+
+# How many tickets a bet buys (cost = stake x targets):
+# - 'distinct': one per distinct previous winner of the day (a repeated digit is bought once)
+# - 'tickets':  one per previous winner, duplicates included (the scripts' old len(prevs))
+# - 'unit':     one ticket per bet (analyze_optimization's abstract cost = stake model)
+TARGET_MODE = 'distinct'
+TARGET_MODES = ('distinct', 'tickets', 'unit')
+
+# Return per unit staked on the winning target, by race position (R1..R4)
+PAYOUT_TABLES = {
+    'straight': (9.0,) * len(RACE_COLS),
+}
+DEFAULT_PAYOUT = 'straight'
+
+# Set bits of every 10-digit mask (horse_events.DIGIT_BITS)
+POPCOUNT = np.array([bin(m).count('1') for m in range(1 << 10)], dtype=np.uint8)
+
+
+def register_payout(name, odds):
+    """Adds a payout table: one odds value for every race, or one per race."""
+    PAYOUT_TABLES[name] = _odds_by_race(odds)
+
+
+def _odds_by_race(odds):
+    odds = np.broadcast_to(np.asarray(odds, dtype=np.float64), (len(RACE_COLS),))
+    return tuple(odds.tolist())
+
+
+def payout_by_race(payout=DEFAULT_PAYOUT):
+    """Payout table name, plain odds (9.0) or per-race odds -> float64 array (races,)."""
+    if isinstance(payout, str):
+        if payout not in PAYOUT_TABLES:
+            raise ValueError(f"Unknown payout table {payout!r}, known: {sorted(PAYOUT_TABLES)}")
+        return np.array(PAYOUT_TABLES[payout])
+    return np.array(_odds_by_race(payout))
+
+
+def target_counts(prev_mask, slot, targets=TARGET_MODE):
+    """
+    Tickets per bet from the winners-so-far bitmask and the 0-based race
+    slot (any matching shapes). Slot 0 (R1) has nothing to bet on.
+    """
+    if targets == 'distinct':
+        return POPCOUNT[prev_mask].astype(np.float64)
+    if targets == 'tickets':
+        return np.asarray(slot, dtype=np.float64)
+    if targets == 'unit':
+        return (np.asarray(slot) > 0).astype(np.float64)
+    raise ValueError(f"Unknown target mode {targets!r}, expected one of {TARGET_MODES}")
+
+
+def price(events, targets=TARGET_MODE, payout=DEFAULT_PAYOUT):
+    """
+    Per-event pricing for the horse_events stream: 'targets' (tickets per
+    unit stake, so cost = stake x targets) and 'payout' (return per unit
+    stake if the event is a win), both float64.
+
+    Built once per (targets, payout) and cached on the events dict, so every
+    engine and every config of a sweep reads the same arrays.
+    """
+    key = (targets, payout if isinstance(payout, str) else _odds_by_race(payout))
+    cache = events.setdefault('pricing', {})
+    if key not in cache:
+        slot = events['race'].astype(np.int64) - 1
+        cache[key] = {
+            'targets': target_counts(events['prev_mask'], slot, targets),
+            'payout': payout_by_race(payout)[slot],
+        }
+    return cache[key]
+
+
+def bet_targets(results_so_far, targets=TARGET_MODE):
+    """
+    The digits to buy on the next race, given today's winners so far (in
+    race order). The abstract 'unit' model has no real ticket set, it is
+    shown with the distinct digits.
+    """
+    if targets == 'tickets':
+        return list(results_so_far)
+    return list(dict.fromkeys(results_so_far))
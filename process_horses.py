@@ -1,156 +1,171 @@
-import subprocess
-import json
 import re
 import csv
 import os
-import sys
+from bisect import bisect_right
+
+from ocr_ingest import ingest, import_legacy_json, OcrCache
+import results_store
 
 # Paths
 IMAGES_DIR = r"C:\Users\Admin\Desktop\DataHorses\Datahorse-20260130T145754Z-3-001\Datahorse"
-PS_SCRIPT = r"c:\Users\Admin\Desktop\SniperStrategyProject\batch_ocr.ps1"
 OUTPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
+OUTPUT_ALL_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\horses_all_draws.csv"
+CSV_FIELDS = ['Date', 'R1', 'R2', 'R3', 'R4', 'Raw']
+ALL_CSV_FIELDS = ['Lottery', 'Draw'] + CSV_FIELDS
+
+OCR_BACKEND = 'winrt' # 'tesseract' on Linux, or any name added with ocr_ingest.register_backend
+WORKERS = None # Pool size for OCR and parsing (None = CPU count, 1 = inline)
+PARSER_VERSION = 2 # Bump when extract_rows changes so cached rows are re-parsed
+
+# Precompiled matchers (one pass per image classifies every line)
+DATE_RE = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{2,4})') # MM/DD/YY, spaces removed first
+FILE_DATE_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})') # PHOTO-2025-01-29...
+DRAW_RE = re.compile(r'midday|evening', re.IGNORECASE)
+DIGIT_RE = re.compile(r'\d')
+NON_NUMBER_RE = re.compile(r'[^\d-]')
+
+LABEL_COLUMN = 150 # Lines left of this are labels/logos, never numbers
+BAND_MARGIN = 20 # Numbers sit strictly between labels, this far from them
+BAND_HEIGHT = 200 # Search depth below a label when nothing bounds it
+
+DEFAULT_LOTTERY = 'NY'
+DEFAULT_DRAW = 'Midday'
+
+
+class LineIndex:
+    """
+    One image's OCR lines sorted by Y (a new list, the input is left alone)
+    and classified in a single pass: date, draw labels (Midday/Evening),
+    state labels and number candidates. first_number() is a bisect band
+    query on the candidates, O(log n) per label.
+    """
+
+    def __init__(self, lines, filename=''):
+        rows = []
+        for l in lines:
+            # Sanitize coordinate types (fix lists)
+            top, left = l['Top'], l['Left']
+            if isinstance(top, list): top = top[0]
+            if isinstance(left, list): left = left[0]
+            rows.append((top, left, l['Text']))
+        rows.sort(key=lambda r: r[0])
+
+        self.date = None
+        self.draws = [] # (top, 'Midday'|'Evening')
+        self.states = [] # (top, label text)
+        self.num_tops = [] # Number candidates (sorted by top)
+        self.num_texts = []
+        for top, left, txt in rows:
+            if self.date is None:
+                m = DATE_RE.search(txt.replace(" ", ""))
+                if m:
+                    month, day, year = m.groups()
+                    if len(year) == 2:
+                        year = "20" + year
+                    self.date = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+            txt_lower = txt.lower()
+            m = DRAW_RE.search(txt)
+            if m:
+                self.draws.append((top, m.group(0).capitalize()))
+            if "state" in txt_lower and "ny" not in txt_lower: # Avoid 'state' matching other things if any
+                self.states.append((top, txt))
+            if left >= LABEL_COLUMN and DIGIT_RE.search(txt):
+                self.num_tops.append(top)
+                self.num_texts.append(txt)
 
-def load_ocr_results():
-    json_path = os.path.join(IMAGES_DIR, "ocr_results.json")
-    if not os.path.exists(json_path):
-        print(f"JSON file {json_path} not found.")
+        if self.date is None:
+            # Try to grab from filename if OCR failed
+            m = FILE_DATE_RE.search(filename or '')
+            if m:
+                self.date = f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
+
+    def first_number(self, lo, hi):
+        """Text of the highest number line with lo < Top < hi, or None."""
+        i = bisect_right(self.num_tops, lo)
+        if i < len(self.num_tops) and self.num_tops[i] < hi:
+            return self.num_texts[i]
+        return None
+
+
+def lottery_id(label):
+    """'NJ State' -> 'NJ_STATE'."""
+    return re.sub(r'\W+', '_', label.strip()).strip('_').upper() or 'STATE'
+
+
+def parse_races(raw_text):
+    # "573 - 4" -> 5, 7, 3, 4
+    # OR "123" -> 1, 2, 3
+    # CLEANING: Replace 'o' or 'O' with '0' (commonly confused chars)
+    raw_text = raw_text.replace('o', '0').replace('O', '0')
+    # Remove anything that is not digit or dash; the dash only separates the tail race
+    races = list(NON_NUMBER_RE.sub('', raw_text).replace('-', ''))
+    return races, raw_text
+
+
+def extract_rows(file_entry):
+    """
+    Parses one OCR'd screenshot into one row per draw it shows.
+
+    Every draw label (Midday, Evening) opens a section that ends at the next
+    draw label. NY's numbers are the first number line below the label,
+    above the section's first state label (or within BAND_HEIGHT if there is
+    none). Each state label in turn owns the first number line below it.
+    """
+    lines = file_entry.get('Data')
+    if not lines:
         return []
-        
-    try:
-        with open(json_path, 'r', encoding='utf-8-sig') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"JSON Parse Error: {e}")
+    idx = LineIndex(lines, file_entry.get('FileName'))
+    if not idx.date:
         return []
 
-def extract_data(ocr_data):
+    inf = float('inf')
+    found = []
+    for d, (draw_top, draw) in enumerate(idx.draws):
+        next_draw = idx.draws[d + 1][0] if d + 1 < len(idx.draws) else inf
+        states = [s for s in idx.states if draw_top < s[0] < next_draw]
+        bounds = [s[0] for s in states] + [next_draw]
+
+        hi = bounds[0] if states else min(draw_top + BAND_HEIGHT + BAND_MARGIN, next_draw)
+        found.append((DEFAULT_LOTTERY, draw, idx.first_number(draw_top + BAND_MARGIN, hi - BAND_MARGIN)))
+        for k, (state_top, label) in enumerate(states):
+            hi = min(bounds[k + 1], state_top + BAND_HEIGHT + BAND_MARGIN)
+            found.append((lottery_id(label), draw, idx.first_number(state_top + BAND_MARGIN, hi - BAND_MARGIN)))
+
     rows = []
-    
-    for file_entry in ocr_data:
-        filename = file_entry.get('FileName')
-        lines = file_entry.get('Data')
-        
-        if not lines:
+    for lottery, draw, text in found:
+        if text is None:
             continue
+        races, raw_text = parse_races(text)
+        rows.append({
+            'Lottery': lottery,
+            'Draw': draw,
+            'Date': idx.date,
+            'R1': races[0] if len(races) > 0 else '',
+            'R2': races[1] if len(races) > 1 else '',
+            'R3': races[2] if len(races) > 2 else '',
+            'R4': races[3] if len(races) > 3 else '',
+            'Raw': raw_text
+        })
+    return rows
 
-        # Sanitize coordinate types (fix lists)
-        for l in lines:
-            if isinstance(l['Top'], list): l['Top'] = l['Top'][0]
-            if isinstance(l['Left'], list): l['Left'] = l['Left'][0]
-
-        # Sort lines by Top (Y)
-        lines.sort(key=lambda x: x['Top'])
-
-        
-        # 1. Extract Date
-        date_str = None
-        for line in lines:
-            # Look for MM/DD/YY patterns
-            # Spacing might be weird: "01 / 28 / 25"
-            txt = line['Text']
-            # Remove spaces for regex
-            clean_txt = txt.replace(" ", "")
-            m = re.search(r'(\d{1,2})/(\d{1,2})/(\d{2,4})', clean_txt)
-            if m:
-                month, day, year = m.groups()
-                if len(year) == 2:
-                    year = "20" + year
-                date_str = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-                break
-        
-        if not date_str:
-            # Try to grab from filename if OCR failed? 
-            # PHOTO-2025-01-29...
-            m = re.search(r'(\d{4})-(\d{2})-(\d{2})', filename)
-            if m:
-                date_str = f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
-
-        # 2. Find Midday and State Labels Y-coords
-        midday_y = None
-        state_y = None
-        
-        for line in lines:
-            txt_lower = line['Text'].lower()
-            if "midday" in txt_lower:
-                midday_y = line['Top']
-            if "state" in txt_lower and "ny" not in txt_lower: # Avoid 'state' matching other things if any
-                state_y = line['Top']
-        
-        # 3. Find target line for NY
-        # It is strictly below Midday. If State exists, strictly above State.
-        # If State not found, just take the one below Midday.
-        
-        target_line = None
-        
-        if midday_y:
-            candidates = []
-            for line in lines:
-                # Filter noise labels on left
-                if line['Left'] < 150:
-                    continue 
-                
-                # Check Y
-                if state_y:
-                    if line['Top'] > midday_y + 20 and line['Top'] < state_y - 20:
-                        candidates.append(line)
-                else:
-                    # Heuristic: 20px to 150px below Midday
-                    if line['Top'] > midday_y + 20 and line['Top'] < midday_y + 200:
-                        candidates.append(line)
-            
-            # Select best candidate (likely the one containing digits)
-            for cand in candidates:
-                if re.search(r'\d', cand['Text']):
-                    target_line = cand
-                    break
-        
-        if target_line and date_str:
-            # Parse numbers
-            # "573 - 4" -> 5, 7, 3, 4
-            # OR "123" -> 1, 2, 3
-            raw_text = target_line['Text']
-            
-            # CLEANING: Replace 'o' or 'O' with '0' if it looks like a number context
-            # Simple approach: Replace commonly confused chars globally in the raw string
-            raw_text = raw_text.replace('o', '0').replace('O', '0')
-            
-            # Extract digits and dashes only
-            # Careful with whitespace
-            # Normal format: "123" or "123 - 4" or "123-4"
-            
-            # Remove anything that is not digit or dash
-            clean_val = re.sub(r'[^\d-]', '', raw_text)
-            
-            races = []
-            
-            if '-' in clean_val:
-                parts = clean_val.split('-')
-                
-                main_chunk = parts[0]
-                tail_chunk = "".join(parts[1:]) 
-                
-                for digit in main_chunk:
-                    races.append(digit)
-                for digit in tail_chunk:
-                    races.append(digit)
-            else:
-                for digit in clean_val:
-                    races.append(digit)
-            
-            rows.append({
-                'Date': date_str,
-                'R1': races[0] if len(races) > 0 else '',
-                'R2': races[1] if len(races) > 1 else '',
-                'R3': races[2] if len(races) > 2 else '',
-                'R4': races[3] if len(races) > 3 else '',
-                'Raw': raw_text
-            })
-            
+
+def extract_entry(file_entry, lottery=DEFAULT_LOTTERY, draw=DEFAULT_DRAW):
+    """The row of one game/draw from a screenshot (None if it is not there)."""
+    for r in extract_rows(file_entry):
+        if r['Lottery'] == lottery and r['Draw'] == draw:
+            return r
+    return None
+
+def extract_data(ocr_data):
+    return dedupe_rows([r for r in map(extract_entry, ocr_data) if r])
+
+def dedupe_rows(rows):
+    """Keeps one row per game, draw and date (first seen, unless a later one has more races)."""
     # Deduplicate by Date - Keep the one with most data if conflict?
     # Simple deduplication: dict by date
     deduped_rows = {}
     for r in rows:
-        d = r['Date']
+        d = (r.get('Lottery'), r.get('Draw'), r['Date'])
         # If exists, overwrite? Or keep first?
         # Let's keep the one that has more races populated
         if d in deduped_rows:
@@ -165,26 +180,57 @@ def extract_data(ocr_data):
             
     return list(deduped_rows.values())
 
-def main():
-    data = load_ocr_results()
-    if not data:
-        print("No output from OCR.")
-        return
-
-    print(f"Processed {len(data)} image records.")
-    
-    extracted = extract_data(data)
-    extracted.sort(key=lambda x: x['Date'])
-    
+def update_csv(rows, csv_path=OUTPUT_CSV, fields=CSV_FIELDS):
+    """
+    Writes the date-sorted rows. When the file already holds a prefix of
+    them (the usual case: new screenshots are newer days) only the new rows
+    are appended; otherwise it is rewritten atomically.
+    Returns (rows written, whether it was an append).
+    """
+    existing = []
+    if os.path.exists(csv_path):
+        with open(csv_path, 'r', newline='', encoding='utf-8-sig') as f:
+            existing = list(csv.DictReader(f))
+
+    rows = [{k: r[k] for k in fields} for r in rows]
+    if existing and existing == rows[:len(existing)]:
+        with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+            csv.DictWriter(f, fieldnames=fields).writerows(rows[len(existing):])
+        return len(rows) - len(existing), True
+
     # Save CSV - Excel Friendly format (comma separated is standard CSV)
-    with open(OUTPUT_CSV, 'w', newline='', encoding='utf-8') as f:
+    tmp = csv_path + '.tmp'
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
         # Excel typically likes BOM for UTF-8 to display correctly if user opens double click
-        f.write('\ufeff') 
-        writer = csv.DictWriter(f, fieldnames=['Date', 'R1', 'R2', 'R3', 'R4', 'Raw'])
+        f.write('\ufeff')
+        writer = csv.DictWriter(f, fieldnames=fields)
         writer.writeheader()
-        writer.writerows(extracted)
-        
-    print(f"Saved {len(extracted)} unique rows to {OUTPUT_CSV}")
+        writer.writerows(rows)
+    os.replace(tmp, csv_path)
+    return len(rows), False
+
+def main():
+    # First run after the switch: reuse the old monolithic OCR output
+    if not OcrCache(IMAGES_DIR).index and os.path.exists(os.path.join(IMAGES_DIR, "ocr_results.json")):
+        print(f"Imported {import_legacy_json(IMAGES_DIR)} images from ocr_results.json into the cache.")
+
+    parsed = ingest(IMAGES_DIR, extract_rows, backend=OCR_BACKEND, workers=WORKERS, parser_version=PARSER_VERSION)
+    print(f"Processed {len(parsed)} image records.")
+
+    # One image yields every draw it shows; files are in name order, so dedupe is stable
+    all_rows = dedupe_rows([r for rows in parsed if rows for r in rows])
+    all_rows.sort(key=lambda x: (x['Date'], x['Lottery'], x['Draw']))
+    extracted = [r for r in all_rows if r['Lottery'] == DEFAULT_LOTTERY and r['Draw'] == DEFAULT_DRAW]
+    before = results_store.source_stat(OUTPUT_CSV)
+    written, appended = update_csv(extracted, OUTPUT_CSV)
+    # Typed column store the analysis scripts load (the CSV stays for Excel)
+    results_store.update(OUTPUT_CSV, extracted[len(extracted) - written:], appended, before)
+    before = results_store.source_stat(OUTPUT_ALL_CSV)
+    written_all, appended = update_csv(all_rows, OUTPUT_ALL_CSV, ALL_CSV_FIELDS)
+    results_store.update(OUTPUT_ALL_CSV, all_rows[len(all_rows) - written_all:], appended, before)
+
+    print(f"Saved {len(extracted)} unique rows to {OUTPUT_CSV} ({written} written)")
+    print(f"Saved {len(all_rows)} rows for all games/draws to {OUTPUT_ALL_CSV}")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,180 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# Opt-in from the environment, no code edits needed:
+#   SIM_PROFILE=1                -> per-stage wall/CPU timers + counters
+#   SIM_PROFILE=alloc,cprofile   -> timers plus the listed extras
+#   SIM_PROFILE=all              -> timers, alloc, cprofile and sample
+PROFILE_ENV = 'SIM_PROFILE'
+MODES = ('timers', 'alloc', 'cprofile', 'sample')
+SAMPLE_INTERVAL = 0.005 # Seconds between stack samples
+TOP_FUNCTIONS = 25
+
+
+def profile_path(report_path):
+    """sim_report_final.md -> sim_report_final.profile.json (a .json path is used as is)."""
+    if report_path.endswith('.json'):
+        return report_path
+    return os.path.splitext(report_path)[0] + '.profile.json'
+
+
+def parse_modes(modes):
+    modes = {m.strip().lower() for m in (modes or '').split(',')} - {'', '0', 'off', 'false'}
+    if not modes:
+        return set()
+    if 'all' in modes:
+        return set(MODES)
+    unknown = modes - set(MODES) - {'1', 'on', 'true'}
+    if unknown:
+        raise ValueError(f"Unknown {PROFILE_ENV} mode(s) {sorted(unknown)}, expected {MODES} or 'all'")
+    return (modes & set(MODES)) | {'timers'}
+
+
+class NullProfiler:
+    """What start() returns when profiling is off: every call is a no-op."""
+    enabled = False
+
+    def stage(self, name):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def finish(self):
+        return None
+
+
+NULL = NullProfiler()
+
+
+def start(report_path, modes=None, **meta):
+    """
+    Profiler for one run whose report is `report_path`, or NULL when
+    profiling is off (`modes` defaults to the SIM_PROFILE variable).
+    `meta` (parameters, script name, ...) is copied into the JSON.
+    """
+    modes = parse_modes(os.environ.get(PROFILE_ENV, '') if modes is None else modes)
+    if not modes:
+        return NULL
+    return Profiler(profile_path(report_path), modes, meta)
+
+
+class Profiler:
+    """
+    Lap-style stage timer: stage('x') closes the running stage and opens x,
+    so a script marks its phases without re-indenting them. finish() closes
+    the last stage, stops the optional tools and writes the JSON.
+    """
+    enabled = True
+
+    def __init__(self, path, modes, meta=None):
+        self.path = path
+        self.modes = modes
+        self.meta = meta or {}
+        self.stages = []
+        self.counters = Counter()
+        self._current = None
+        self._samples = Counter()
+        self._stage_samples = Counter()
+
+        if 'alloc' in modes:
+            self._own_tracemalloc = not tracemalloc.is_tracing()
+            if self._own_tracemalloc:
+                tracemalloc.start()
+        self._cprofile = cProfile.Profile() if 'cprofile' in modes else None
+        self._sampler = None
+        if 'sample' in modes:
+            self._stop = threading.Event()
+            self._target = threading.get_ident()
+            self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+            self._sampler.start()
+        self._t0 = (time.perf_counter(), time.process_time())
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+    def _sample_loop(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            code = frame.f_code
+            self._samples[f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"] += 1
+            cur = self._current # Read once: the profiled thread may close the stage in between
+            self._stage_samples[cur['name'] if cur else '-'] += 1
+
+    def stage(self, name):
+        self._close()
+        if 'alloc' in self.modes:
+            tracemalloc.reset_peak()
+        self._current = {'name': name, 'wall': time.perf_counter(), 'cpu': time.process_time(),
+                         'mem': tracemalloc.get_traced_memory()[0] if 'alloc' in self.modes else 0}
+
+    def _close(self):
+        cur = self._current
+        if cur is None:
+            return
+        row = {'stage': cur['name'],
+               'wall_s': time.perf_counter() - cur['wall'],
+               'cpu_s': time.process_time() - cur['cpu']}
+        if 'alloc' in self.modes:
+            now, peak = tracemalloc.get_traced_memory()
+            row['alloc_net_mb'] = (now - cur['mem']) / 2**20
+            row['alloc_peak_mb'] = (peak - cur['mem']) / 2**20
+        self.stages.append(row)
+        self._current = None
+
+    def count(self, name, n=1):
+        self.counters[name] += int(n)
+
+    def finish(self):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        self._close()
+        wall, cpu = time.perf_counter() - self._t0[0], time.process_time() - self._t0[1]
+        out = {
+            'meta': self.meta,
+            'modes': sorted(self.modes),
+            'total': {'wall_s': wall, 'cpu_s': cpu},
+            'stages': self.stages,
+            'counters': dict(self.counters),
+        }
+        if 'events' in self.counters and wall > 0:
+            out['events_per_sec'] = self.counters['events'] / wall
+        if 'alloc' in self.modes:
+            out['alloc_peak_mb'] = max((s['alloc_peak_mb'] for s in self.stages), default=0.0)
+            if self._own_tracemalloc:
+                tracemalloc.stop()
+        if self._cprofile is not None:
+            out['cprofile'] = self._cprofile_summary()
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            out['samples'] = {
+                'interval_s': SAMPLE_INTERVAL,
+                'by_stage': dict(self._stage_samples),
+                'top': [{'where': k, 'samples': v} for k, v in self._samples.most_common(TOP_FUNCTIONS)],
+            }
+
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(out, f, indent=2, default=str)
+        return out
+
+    def _cprofile_summary(self):
+        # Full dump next to the JSON (snakeviz / pstats), top functions inline
+        dump = os.path.splitext(self.path)[0] + '.prof'
+        self._cprofile.dump_stats(dump)
+        stats = pstats.Stats(self._cprofile).stats
+        rows = sorted(stats.items(), key=lambda kv: kv[1][3], reverse=True)[:TOP_FUNCTIONS]
+        return {
+            'dump': dump,
+            'top_cumulative': [{'function': f"{os.path.basename(file)}:{line}({func})", 'calls': nc,
+                                'tottime_s': tt, 'cumtime_s': ct}
+                               for (file, line, func), (cc, nc, tt, ct, _) in rows],
+        }
@@ -0,0 +1,300 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import results_store
+
+# Opt-out from the environment:
+#   SIM_CACHE=off         -> compute everything, read / write nothing
+#   SIM_CACHE=<directory> -> one cache for every dataset, in that directory
+# Unset, each dataset gets <csv name>.cache/ next to it (like its .store/).
+CACHE_ENV = 'SIM_CACHE'
+MAX_BYTES = 512 * 2**20 # Least recently used entries are evicted past this
+ENTRY_EXT = '.pkl'
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+_dataset_hashes = {} # (csv, series, source stat) -> content hash
+_file_hashes = {}    # (path, size, mtime) -> source hash
+_caches = {}
+_uncacheable = set() # Functions already warned about
+
+
+def cache_path(csv_path):
+    """ny_horses_data.csv -> ny_horses_data.cache/ (or the SIM_CACHE directory)."""
+    setting = os.environ.get(CACHE_ENV, '')
+    if setting and setting.lower() not in ('0', 'off', 'false', '1', 'on', 'true'):
+        return setting
+    return os.path.splitext(csv_path)[0] + '.cache'
+
+
+def enabled():
+    return os.environ.get(CACHE_ENV, '').lower() not in ('0', 'off', 'false')
+
+
+def dataset_hash(csv_path, series=None):
+    """
+    Content hash of the results behind `csv_path` (one game's rows only
+    when `series` is given), read from the column store, so an unchanged
+    file never hashes differently and an edited one always does.
+    """
+    key = (os.path.abspath(csv_path), series, str(results_store.source_stat(csv_path)))
+    if key not in _dataset_hashes:
+        store = results_store.load(csv_path)
+        rows = slice(None)
+        if series is not None:
+            code = store['names'].index(series) if series in store['names'] else -1
+            rows = np.asarray(store['series']) == code
+        h = hashlib.sha256()
+        h.update(json.dumps([store['names'], series]).encode())
+        for name in results_store.COLUMNS:
+            h.update(name.encode())
+            h.update(np.ascontiguousarray(np.asarray(store[name])[rows]))
+        _dataset_hashes[key] = h.hexdigest()
+    return _dataset_hashes[key]
+
+
+def _source_file(module):
+    file = getattr(module, '__file__', None)
+    if file and file.endswith('.py') and os.path.dirname(os.path.abspath(file)) == ROOT:
+        return os.path.abspath(file)
+    return None
+
+
+def _file_hash(path):
+    st = os.stat(path)
+    key = (path, st.st_size, st.st_mtime_ns)
+    if key not in _file_hashes:
+        with open(path, 'rb') as f:
+            _file_hashes[key] = hashlib.sha256(f.read()).hexdigest()
+    return _file_hashes[key]
+
+
+def code_version(func):
+    """
+    Hash of the source of every repo module `func`'s module reaches
+    (imported modules and the modules of imported names), so editing any
+    code a result may depend on changes its key.
+    """
+    files = set()
+    stack = [sys.modules.get(func.__module__)]
+    while stack:
+        module = stack.pop()
+        file = _source_file(module)
+        if file is None or file in files:
+            continue
+        files.add(file)
+        for value in vars(module).values():
+            if inspect.ismodule(value):
+                stack.append(value)
+            else:
+                stack.append(sys.modules.get(getattr(value, '__module__', None) or ''))
+    h = hashlib.sha256()
+    for file in sorted(files):
+        h.update(os.path.basename(file).encode())
+        h.update(_file_hash(file).encode())
+    return h.hexdigest()
+
+
+def _feed(h, value):
+    """Canonical, type-tagged hash of a parameter value."""
+    if value is None or isinstance(value, (bool, str)):
+        h.update(f"{type(value).__name__}:{value!r};".encode())
+    elif isinstance(value, (int, float, np.integer, np.floating, np.bool_)):
+        value = value.item() if isinstance(value, np.generic) else value
+        h.update(f"{type(value).__name__}:{value!r};".encode())
+    elif isinstance(value, np.ndarray):
+        h.update(f"nd:{value.dtype.str}:{value.shape};".encode())
+        h.update(np.ascontiguousarray(value))
+    elif isinstance(value, (list, tuple, range)):
+        h.update(f"seq:{len(value)}[".encode())
+        for v in value:
+            _feed(h, v)
+        h.update(b"]")
+    elif isinstance(value, dict):
+        h.update(f"map:{len(value)}{{".encode())
+        for k in sorted(value, key=repr):
+            _feed(h, k)
+            _feed(h, value[k])
+        h.update(b"}")
+    elif isinstance(value, (pd.DataFrame, pd.Series)):
+        h.update(f"pd:{type(value).__name__};".encode())
+        _feed(h, [str(c) for c in getattr(value, 'columns', [value.name])])
+        _feed(h, pd.util.hash_pandas_object(value).to_numpy())
+    else:
+        raise TypeError(f"Can't build a cache key from a {type(value).__name__} parameter")
+
+
+def cache_key(source, func, *args, **kwargs):
+    """
+    Key of func(<data>, *args, **kwargs) on the data `source` identifies.
+    Arguments are bound to the signature (defaults filled in) so the same
+    call spelled differently shares its entry.
+    """
+    bound = inspect.signature(func).bind_partial(None, *args, **kwargs)
+    bound.apply_defaults()
+    params = dict(list(bound.arguments.items())[1:])
+    module = os.path.splitext(os.path.basename(inspect.getfile(func)))[0]
+    h = hashlib.sha256()
+    h.update(f"{source};{module}.{func.__qualname__};{code_version(func)};".encode())
+    _feed(h, params)
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    Directory of pickled results, one file per key. A hit refreshes the
+    file's mtime, and put() evicts by oldest mtime once the directory
+    grows past max_bytes, so the files themselves are the LRU list.
+    """
+
+    def __init__(self, path, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ENTRY_EXT)
+
+    def get(self, key):
+        """(True, value) on a hit, (False, None) on a miss."""
+        file = self._file(key)
+        try:
+            with open(file, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(file)
+        except FileNotFoundError:
+            self.misses += 1
+            return False, None
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # Truncated or stale entry: drop it and recompute
+            self._remove(file)
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, value
+
+    def put(self, key, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            tmp = self._file(key) + f".{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self._file(key))
+            self.evict()
+        except OSError:
+            # Read-only location: results just aren't kept
+            pass
+
+    def entries(self):
+        """(mtime, size, path) of every entry, oldest first."""
+        if not os.path.isdir(self.path):
+            return []
+        out = [(e.stat().st_mtime_ns, e.stat().st_size, e.path)
+               for e in os.scandir(self.path) if e.name.endswith(ENTRY_EXT)]
+        return sorted(out)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes=None):
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, file in entries:
+            if total <= max_bytes:
+                break
+            self._remove(file)
+            total -= size
+
+    def clear(self):
+        self.evict(0)
+
+    @staticmethod
+    def _remove(file):
+        try:
+            os.remove(file)
+        except OSError:
+            pass
+
+
+def open_cache(csv_path):
+    """Shared ResultCache for `csv_path`'s cache directory, None when SIM_CACHE=off."""
+    if not enabled():
+        return None
+    path = os.path.abspath(cache_path(csv_path))
+    if path not in _caches:
+        _caches[path] = ResultCache(path)
+    return _caches[path]
+
+
+def _key(source, func, args, kwargs):
+    """cache_key(), or None (warned once per function) when a parameter can't be keyed."""
+    try:
+        return cache_key(source, func, *args, **kwargs)
+    except TypeError as e:
+        name = f"{func.__module__}.{func.__qualname__}"
+        if name not in _uncacheable:
+            _uncacheable.add(name)
+            warnings.warn(f"{name} is not cached: {e}", RuntimeWarning, stacklevel=4)
+        return None
+
+
+def _call(cache, source, func, data, args, kwargs):
+    """(value, key): the cached or freshly computed result and its key (None when not cached)."""
+    key = None if cache is None or source is None else _key(source, func, args, kwargs)
+    if key is None:
+        return func(data, *args, **kwargs), None
+    hit, value = cache.get(key)
+    if not hit:
+        value = func(data, *args, **kwargs)
+        cache.put(key, value)
+    return value, key
+
+
+def dataset_source(csv_path, func, *args, series=None, **kwargs):
+    """
+    {'csv', 'key'} identifying func(csv_path, *args, **kwargs) by the
+    dataset's content, without storing the result (for loaders whose
+    output is cheaper to rebuild than to unpickle), None when SIM_CACHE=off.
+    """
+    if not enabled():
+        return None
+    if series is not None:
+        kwargs['series'] = series
+    key = _key(dataset_hash(csv_path, series), func, args, kwargs)
+    return None if key is None else {'csv': os.path.abspath(csv_path), 'key': key}
+
+
+def on_dataset(csv_path, func, *args, series=None, **kwargs):
+    """
+    func(csv_path, *args, **kwargs), cached on the content of the dataset
+    (or of one game in it).
+    """
+    cache = open_cache(csv_path)
+    data_hash = dataset_hash(csv_path, series) if cache is not None else None
+    if series is not None:
+        kwargs['series'] = series
+    return _call(cache, data_hash, func, csv_path, args, kwargs)[0]
+
+
+def on_events(events, func, *args, **kwargs):
+    """
+    func(events, *args, **kwargs), cached on the events' 'source' (set by
+    horse_events.load_events). Events without one (synthetic, sliced,
+    built by hand) are always computed.
+    """
+    source = events.get('source')
+    cache = open_cache(source['csv']) if source is not None else None
+    return _call(cache, source and source['key'], func, events, args, kwargs)[0]
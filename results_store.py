@@ -0,0 +1,192 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+RACE_COLS = ['R1', 'R2', 'R3', 'R4']
+META_FILE = "meta.json"
+DEFAULT_SERIES = 'NY/Midday' # CSVs without Lottery/Draw columns hold this game only
+
+# Column files: raw little-endian arrays, one record per CSV row, appended in place.
+COLUMNS = {
+    'day': (np.dtype('<i4'), ()), # Days since 1970-01-01
+    'digits': (np.dtype('u1'), (len(RACE_COLS),)), # Winner per race position (0 where invalid)
+    'valid': (np.dtype('?'), (len(RACE_COLS),)), # Position holds a real digit
+    'series': (np.dtype('<u2'), ()), # Index into meta['series'] ("LOTTERY/Draw")
+}
+
+
+def store_path(csv_path):
+    """ny_horses_data.csv -> ny_horses_data.store/ (next to the CSV)."""
+    return os.path.splitext(csv_path)[0] + '.store'
+
+
+def source_stat(csv_path):
+    """(size, mtime_ns) of the CSV the store mirrors, None if it does not exist."""
+    if not os.path.exists(csv_path):
+        return None
+    st = os.stat(csv_path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _read_meta(path):
+    meta_path = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_meta(path, rows, source, series):
+    tmp = os.path.join(path, META_FILE + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'rows': int(rows), 'source': source, 'series': list(series)}, f)
+    os.replace(tmp, os.path.join(path, META_FILE))
+
+
+def series_key(lottery, draw):
+    return f"{lottery}/{draw}"
+
+
+def clean_cells(dates, cells, keys=None):
+    """
+    Date strings + (rows x 4) race cells (+ optional "LOTTERY/Draw" key per
+    row) -> column dict: day int32, digits uint8, valid bool, series uint16
+    codes and the `names` they index.
+    Same cleaning the scripts did per cell ('8.0' -> '8', blanks/'nan' dropped).
+    """
+    cells = pd.DataFrame(cells, columns=RACE_COLS, dtype=object).fillna('').astype(str)
+    cells = cells.apply(lambda col: col.str.strip().str.replace(r'\.0$', '', regex=True))
+    valid = cells.apply(lambda col: col.str.fullmatch(r'\d')).to_numpy(dtype=bool)
+    digits = np.where(valid, cells.to_numpy(), '0').astype(np.uint8)
+    day = pd.to_datetime(pd.Series(dates)).to_numpy().astype('datetime64[D]').astype(np.int32)
+    if keys is None:
+        keys = [DEFAULT_SERIES] * len(day)
+    codes, names = pd.factorize(pd.Series(keys, dtype=object), sort=True)
+    return {'day': day, 'digits': digits, 'valid': valid,
+            'series': codes.astype(np.uint16), 'names': list(names)}
+
+
+def rows_to_arrays(rows):
+    """process_horses row dicts -> column dict."""
+    keys = [series_key(r.get('Lottery', 'NY'), r.get('Draw', 'Midday')) for r in rows]
+    return clean_cells([r['Date'] for r in rows], [[r[c] for c in RACE_COLS] for r in rows], keys)
+
+
+def read_csv_arrays(csv_path):
+    df = pd.read_csv(csv_path, dtype=str)
+    keys = None
+    if 'Lottery' in df.columns and 'Draw' in df.columns:
+        keys = (df['Lottery'].fillna('') + '/' + df['Draw'].fillna('')).tolist()
+    return clean_cells(df['Date'], df[RACE_COLS].to_numpy(), keys)
+
+
+def write(path, data, source=None):
+    """Replaces the whole store with a column dict from clean_cells."""
+    os.makedirs(path, exist_ok=True)
+    _write_meta(path, 0, None, []) # Readers see an empty store while columns are rewritten
+    for name, (dtype, _) in COLUMNS.items():
+        tmp = os.path.join(path, name + '.bin.tmp')
+        np.ascontiguousarray(data[name], dtype=dtype).tofile(tmp)
+        os.replace(tmp, os.path.join(path, name + '.bin'))
+    _write_meta(path, len(data['day']), source, data['names'])
+
+
+def append(path, data, source=None):
+    """
+    Appends records. Series codes are remapped onto the stored names (new
+    games get new codes, old codes never change). Columns are written before
+    the row count in meta.json, so a crash mid-append leaves the store
+    readable at its old length.
+    """
+    meta = _read_meta(path)
+    if meta is None or 'series' not in meta:
+        return write(path, data, source)
+    names = list(meta['series'])
+    for name in data['names']:
+        if name not in names:
+            names.append(name)
+    remap = np.array([names.index(name) for name in data['names']], dtype=np.uint16)
+    data = dict(data, series=remap[data['series']] if len(remap) else data['series'])
+
+    for name, (dtype, shape) in COLUMNS.items():
+        file = os.path.join(path, name + '.bin')
+        with open(file, 'r+b' if os.path.exists(file) else 'wb') as f:
+            # Drop any tail left by an interrupted append
+            f.truncate(meta['rows'] * dtype.itemsize * int(np.prod(shape, dtype=np.int64)))
+            f.seek(0, os.SEEK_END)
+            np.ascontiguousarray(data[name], dtype=dtype).tofile(f)
+    _write_meta(path, meta['rows'] + len(data['day']), source, names)
+
+
+def open_store(path):
+    """Memory-maps the columns (read-only, zero-copy). None if there is no store."""
+    meta = _read_meta(path)
+    if meta is None or 'series' not in meta:
+        return None
+    n = meta['rows']
+    out = {'source': meta.get('source'), 'names': meta['series']}
+    for name, (dtype, shape) in COLUMNS.items():
+        if n == 0:
+            out[name] = np.zeros((0,) + shape, dtype=dtype)
+        else:
+            out[name] = np.memmap(os.path.join(path, name + '.bin'), dtype=dtype, mode='r', shape=(n,) + shape)
+    return out
+
+
+def sync(csv_path):
+    """Rebuilds the store from the CSV (full parse). Returns the opened store."""
+    path = store_path(csv_path)
+    source = source_stat(csv_path)
+    write(path, read_csv_arrays(csv_path), source=source)
+    return open_store(path)
+
+
+def update(csv_path, rows, appended, before):
+    """
+    Mirrors a CSV write into the store without re-reading the CSV:
+    appends `rows` if the CSV was appended to and the store matched it
+    (`before` = source_stat taken before the write), rewrites it otherwise.
+    """
+    path = store_path(csv_path)
+    meta = _read_meta(path)
+    if appended and meta is not None and meta.get('source') == before:
+        append(path, rows_to_arrays(rows), source=source_stat(csv_path))
+    elif not appended:
+        write(path, rows_to_arrays(rows), source=source_stat(csv_path))
+    else:
+        sync(csv_path)
+
+
+def load(csv_path):
+    """
+    The store for `csv_path`, rebuilt from the CSV only when it is missing
+    or the CSV changed behind its back (edited by hand, restored, ...).
+    """
+    store = open_store(store_path(csv_path))
+    if store is not None and store['source'] == source_stat(csv_path):
+        return store
+    try:
+        return sync(csv_path)
+    except OSError:
+        # Read-only location: parse the CSV every time
+        return dict(read_csv_arrays(csv_path), source=None)
+
+
+def to_long(store):
+    """
+    The generalized results table: one row per drawn digit with
+    lottery, draw, date, position (1-based race) and digit.
+    """
+    r, pos = np.nonzero(np.asarray(store['valid']))
+    code = np.asarray(store['series'])[r]
+    lotteries = np.array([n.partition('/')[0] for n in store['names']] or [''], dtype=object)
+    draws = np.array([n.partition('/')[2] for n in store['names']] or [''], dtype=object)
+    return pd.DataFrame({
+        'lottery': lotteries[code],
+        'draw': draws[code],
+        'date': np.asarray(store['day'])[r].astype('datetime64[D]'),
+        'position': (pos + 1).astype(np.uint8),
+        'digit': np.asarray(store['digits'])[r, pos],
+    })
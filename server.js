@@ -21,6 +21,7 @@ const scraperService = require('./services/scraperService');
 const ledgerService = require('./services/ledgerService'); // NEW
 const casinoService = require('./services/casinoService'); // NEW - Roulette Logic
 const riskService = require('./services/riskService'); // NEW - Risk Management
+const analyticsService = require('./services/analyticsService'); // NEW - Python Analytics (analytics_service.py)
 const aiService = require('./services/aiService'); // NEW - AI Features
 const aiContext = require('./services/aiContext');
 const GeminiLiveService = require('./services/geminiLiveService'); // NEW - Roulette Logic
@@ -1412,6 +1413,33 @@ app.post('/api/risk/validate', async (req, res) => {
     }
 });
 
+// --- PYTHON ANALYTICS (warm analytics_service.py process) ---
+// GET  /api/analytics/health | streaks?stream= | next-bet?results=3,7
+// POST /api/analytics/backtest | sweep (JSON body passed through, admin only: they occupy the worker pool)
+app.all('/api/analytics/:query', async (req, res) => {
+    const name = req.params.query;
+    const method = analyticsService.QUERIES[name];
+    if (!method) return res.status(404).json({ error: `Unknown analytics query "${name}"` });
+    if (req.method !== method) return res.status(405).json({ error: `Use ${method} for ${name}` });
+    if (method === 'POST') {
+        const authHeader = req.headers['authorization'] || req.headers['x-user-role'];
+        if (authHeader !== 'admin') {
+            return res.status(403).json({ error: 'Forbidden: Requires Admin privileges' });
+        }
+    }
+
+    try {
+        const { status, body } = await analyticsService.query(name, {
+            params: req.query,
+            body: method === 'POST' ? req.body : null
+        });
+        res.status(status).json(body);
+    } catch (e) {
+        console.error("Analytics Service Error:", e);
+        res.status(502).json({ error: 'Analytics service unavailable', detail: e.message });
+    }
+});
+
 
 app.get('/api/admin/ledger', async (req, res) => {
     try {
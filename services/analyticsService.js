@@ -0,0 +1,60 @@
+const http = require('http');
+
+// Client for the warm Python analytics process (analytics_service.py).
+// ANALYTICS_SOCKET (Unix socket path) wins over ANALYTICS_URL when both are set.
+const ANALYTICS_URL = new URL(process.env.ANALYTICS_URL || 'http://127.0.0.1:8765');
+const ANALYTICS_SOCKET = process.env.ANALYTICS_SOCKET || null;
+const TIMEOUT_MS = parseInt(process.env.ANALYTICS_TIMEOUT_MS) || 30000; // Sweeps on a cold cache can take a while
+
+// Kept-alive connections: no TCP handshake per query
+const agent = new http.Agent({ keepAlive: true, maxSockets: 16 });
+
+const QUERIES = {
+    health: 'GET',
+    streaks: 'GET',
+    'next-bet': 'GET',
+    backtest: 'POST',
+    sweep: 'POST'
+};
+
+// Resolves { status, body } with the service's own status code (400 on a bad query, etc.)
+const query = (name, { params = {}, body = null } = {}) => new Promise((resolve, reject) => {
+    const method = QUERIES[name];
+    if (!method) return reject(new Error(`Unknown analytics query "${name}"`));
+
+    const search = new URLSearchParams(params).toString();
+    const data = body ? JSON.stringify(body) : '';
+    const options = {
+        agent,
+        method,
+        path: `/${name}${search ? `?${search}` : ''}`,
+        headers: { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(data) },
+        timeout: TIMEOUT_MS
+    };
+    if (ANALYTICS_SOCKET) {
+        options.socketPath = ANALYTICS_SOCKET;
+    } else {
+        options.hostname = ANALYTICS_URL.hostname;
+        options.port = ANALYTICS_URL.port;
+    }
+
+    const req = http.request(options, (res) => {
+        const chunks = [];
+        res.on('data', (chunk) => chunks.push(chunk));
+        res.on('end', () => {
+            try {
+                resolve({ status: res.statusCode, body: JSON.parse(Buffer.concat(chunks).toString('utf8')) });
+            } catch (e) {
+                reject(new Error(`Invalid analytics response: ${e.message}`));
+            }
+        });
+    });
+    req.on('timeout', () => req.destroy(new Error(`Analytics query "${name}" timed out after ${TIMEOUT_MS}ms`)));
+    req.on('error', reject);
+    req.end(data);
+});
+
+module.exports = {
+    QUERIES,
+    query
+};
@@ -1,265 +1,115 @@
 import pandas as pd
 import numpy as np
-import math
 import os
 
+from horse_events import load_events, day_races
+from strategy_engine import make_spec, run_strategy, longest_stop_run, EVT_LOSS, EVT_WIN, EVT_STOP
+from trade_sink import TradeSink
+import profiling
+
 INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
 OUTPUT_LOG = r"c:\Users\Admin\Desktop\SniperStrategyProject\sim_trade_log.csv"
 OUTPUT_REPORT = r"c:\Users\Admin\Desktop\SniperStrategyProject\sim_report.md"
+LOG_DETAIL = 'bet' # Trade log: 'off' / 'cycle' / 'bet' (a .parquet OUTPUT_LOG needs pyarrow)
 
 WINDOW_DAYS = 60
+GAP_QUANTILE = 0.90 # Entry threshold percentile (0.80 / 0.90 / 0.95)
+QUANTILE_WINDOW_DAYS = None # None = All History, or days for a sliding window
 MULTIPLIER = 1.7
 BASE_STAKE = 1.0
 PAYOUT_ODDS = 9.0  # 9x
 
 MAX_STEPS = 10
 
-def calculate_p90(gap_history):
-    if not gap_history:
-        return 0
-    sorted_gaps = sorted(gap_history)
-    n = len(sorted_gaps)
-    if n == 0: return 0
-    rank = math.ceil(0.90 * n)
-    return sorted_gaps[rank - 1]
+# P90 entry after the warm-up window, gap over R2+ only and never frozen, flat stake
+STRATEGY = make_spec(name='sim_horses', entry='quantile', quantile=GAP_QUANTILE,
+                     quantile_window_days=QUANTILE_WINDOW_DAYS, warmup_days=WINDOW_DAYS,
+                     gap_events='opps', gap_mode='always', multiplier=MULTIPLIER, max_steps=MAX_STEPS,
+                     base_stake=BASE_STAKE, payout_odds=PAYOUT_ODDS)
+
+def render_note(code, step, entry, winner):
+    if entry:
+        return f"WIN Entry on {winner}" if code == EVT_WIN else "LOSS Entry"
+    if code == EVT_WIN:
+        return f"WIN on {winner} (Stp {step})"
+    notes = f"LOSS (Stp {step})"
+    if code == EVT_STOP:
+        notes += " [STOP LOSS]"
+    return notes
 
 def run_simulation():
     if not os.path.exists(INPUT_CSV):
         print("Data file not found.")
         return
 
-    df = pd.read_csv(INPUT_CSV)
-    df['Date'] = pd.to_datetime(df['Date'])
-    df = df.drop_duplicates(subset=['Date'])
-    df = df.sort_values('Date')
-    
-    events = []
-    
-    for idx, row in df.iterrows():
-        races = []
-        for r_col in ['R1', 'R2', 'R3', 'R4']:
-            val = str(row[r_col]).strip()
-            # Clean floating points if pandas read them weird
-            if val.endswith('.0'): val = val[:-2]
-            
-            if val and val.isdigit():
-                 races.append(val)
-            elif val and val != 'nan':
-                 pass
-        
-        if not races: continue
-        
-        events.append({
-            'Date': row['Date'],
-            'RaceIdx': 1,
-            'Winner': races[0],
-            'PreviousWinners': [],
-            'IsOpp': False
-        })
-        
-        day_winners = [races[0]]
-        
-        for i, winner in enumerate(races[1:], start=2):
-            events.append({
-                'Date': row['Date'],
-                'RaceIdx': i,
-                'Winner': winner,
-                'PreviousWinners': day_winners.copy(),
-                'IsOpp': True
-            })
-            day_winners.append(winner)
-
-    # Simulation State
-    current_gap = 0
-    completed_gaps = [] # (GapSize, DateEnded, Races)
+    prof = profiling.start(OUTPUT_REPORT, script='sim_horses')
+    prof.stage('load')
+    ev = load_events(INPUT_CSV)
+    dates = pd.to_datetime(ev['dates'])
     
-    in_session = False
-    current_step = 0
-    session_stake = BASE_STAKE 
+    prof.stage('engine')
+    prof.count('events', len(ev['winner']))
+    res = run_strategy(ev, STRATEGY)
+    code = res['code']
+    equity = res['final_bankroll']
+    max_equity = res['peak_bankroll']
+    min_equity = res['min_bankroll']
     
-    trades = []
-    equity = 0.0
-    max_equity = 0.0
-    min_equity = 0.0
+    unique_dates = dates.unique()
+    # Min window
+    start_date = unique_dates[min(len(unique_dates)-1, WINDOW_DAYS)]
     
     # Stats Tracking
-    entries_count = 0
-    winning_cycles = 0
-    loss_cycles = 0 # Max steps hit
-    steps_to_win = []
-    races_performance = {2: {'wins':0, 'total':0}, 3: {'wins':0, 'total':0}, 4: {'wins':0, 'total':0}}
-    consecutive_stops = 0
-    max_consecutive_stops = 0
+    won = code == EVT_WIN
+    winning_cycles = res['wins']
+    loss_cycles = res['stops'] # Max steps hit
+    entries_count = winning_cycles + loss_cycles # Finished cycles
+    steps_to_win = res['step'][won]
+    max_consecutive_stops = longest_stop_run(code)
+    races_performance = {r: {'wins': int((won & (ev['race'] == r)).sum()),
+                             'total': int(((res['cost'] > 0) & (ev['race'] == r)).sum())} for r in (2, 3, 4)}
     
-    unique_dates = df['Date'].unique()
-    # Min window
-    start_date = unique_dates[min(len(unique_dates)-1, WINDOW_DAYS)]
+    # Generate Reports (streamed, stats on the fly)
+    prof.stage('trades_df')
+    bet = np.nonzero(res['cost'] > 0)[0]
+    pnl = res['revenue'] - res['cost']
     
-    for evt in events:
-        date = evt['Date']
-        winner = evt['Winner']
-        prevs = evt['PreviousWinners']
-        is_opp = evt['IsOpp']
-        race_idx = evt['RaceIdx']
-        
-        is_repeat = (winner in prevs)
-        
-        # P90 from just gap sizes
-        gap_sizes = [g[0] for g in completed_gaps]
-        limit_p90 = calculate_p90(gap_sizes) if len(completed_gaps) > 10 else 999 
-        
-        status = 'WAIT'
-        if date >= start_date:
-            if current_gap >= limit_p90:
-                status = 'READY'
-        
-        bet_amount = 0
-        payout = 0
-        won = False
-        notes = ""
-        cycle_result = None # 'WIN' or 'STOP'
-        
-        if is_opp:
-            if in_session:
-                # Continue Session
-                targets = prevs
-                num_bets = len(targets)
-                if num_bets > 0:
-                    cost = num_bets * session_stake
-                    bet_amount = cost
-                    equity -= cost
-                    
-                    if is_repeat:
-                        # WIN
-                        revenue = PAYOUT_ODDS * session_stake
-                        payout = revenue
-                        equity += revenue
-                        won = True
-                        notes = f"WIN on {winner} (Stp {current_step})"
-                        
-                        # Stats
-                        entries_count += 1 # Count finished cycle
-                        winning_cycles += 1
-                        steps_to_win.append(current_step)
-                        races_performance[race_idx]['wins'] += 1
-                        consecutive_stops = 0
-                        cycle_result = 'WIN'
-                        
-                        # Reset
-                        in_session = False
-                        current_step = 0
-                        session_stake = BASE_STAKE
-                    else:
-                        # LOSS
-                        won = False
-                        notes = f"LOSS (Stp {current_step})"
-                        
-                        # Check Max Steps (Stop Loss)
-                        if current_step >= MAX_STEPS:
-                            notes += " [STOP LOSS]"
-                            loss_cycles += 1
-                            consecutive_stops += 1
-                            max_consecutive_stops = max(max_consecutive_stops, consecutive_stops)
-                            cycle_result = 'STOP'
-                            entries_count += 1
-                            
-                            # RESET due to Stop Loss
-                            in_session = False
-                            current_step = 0
-                            session_stake = BASE_STAKE
-                        else:
-                            # Martingale
-                            session_stake = session_stake * MULTIPLIER
-                            current_step += 1
-                
-                if race_idx in races_performance:
-                    races_performance[race_idx]['total'] += 1
-            
-            else:
-                # Check Entry
-                if status == 'READY':
-                    in_session = True
-                    current_step = 1
-                    session_stake = BASE_STAKE
-                    
-                    targets = prevs
-                    num_bets = len(targets)
-                    cost = num_bets * session_stake
-                    bet_amount = cost
-                    equity -= cost
-                    
-                    if race_idx in races_performance:
-                        races_performance[race_idx]['total'] += 1
-                    
-                    if is_repeat:
-                        revenue = PAYOUT_ODDS * session_stake
-                        payout = revenue
-                        equity += revenue
-                        won = True
-                        notes = f"WIN Entry on {winner}"
-                        
-                        winning_cycles += 1
-                        steps_to_win.append(1)
-                        races_performance[race_idx]['wins'] += 1
-                        consecutive_stops = 0
-                        cycle_result = 'WIN'
-                        entries_count += 1
-                        
-                        in_session = False
-                        current_step = 0
-                        session_stake = BASE_STAKE
-                    else:
-                        won = False
-                        notes = f"LOSS Entry"
-                        session_stake = session_stake * MULTIPLIER
-                        current_step += 1
-        
-        # Update Gaps
-        if is_opp:
-            if is_repeat:
-                completed_gaps.append((current_gap, date, races))
-                current_gap = 0
-            else:
-                current_gap += 1
-        
-        max_equity = max(max_equity, equity)
-        min_equity = min(min_equity, equity)
-        
-        if bet_amount > 0:
-            trades.append({
-                'Date': date,
-                'Race': race_idx,
-                'Gap': current_gap,
-                'Step': current_step if in_session else (1 if cycle_result=='WIN' else 0), # approx
-                'Stake': session_stake,
-                'Cost': bet_amount,
-                'Payout': payout,
-                'PnL': payout - bet_amount,
-                'Equity': equity,
-                'Notes': notes
-            })
-
-    # Generate Reports
-    trades_df = pd.DataFrame(trades)
-    trades_df.to_csv(OUTPUT_LOG, index=False)
+    def build(idx):
+        c = code[idx]
+        # Step / Stake after the bet: a win or stop resets the session
+        return pd.DataFrame({
+            'Date': dates[ev['date_idx'][idx]],
+            'Race': ev['race'][idx],
+            'Gap': res['gap'][idx],
+            'Step': np.where(c == EVT_WIN, 1, np.where(c == EVT_STOP, 0, res['step'][idx] + 1)),
+            'Stake': np.where(c == EVT_LOSS, res['stake'][idx] * MULTIPLIER, BASE_STAKE),
+            'Cost': res['cost'][idx],
+            'Payout': res['revenue'][idx],
+            'PnL': pnl[idx],
+            'Equity': res['bankroll'][idx],
+            'Notes': [render_note(k, step, entry, winner) for k, step, entry, winner in
+                      zip(c.tolist(), res['step'][idx].tolist(), res['entry'][idx].tolist(), ev['winner'][idx].tolist())],
+        })
+    
+    with TradeSink(OUTPUT_LOG, LOG_DETAIL) as log:
+        log.emit(bet, build, pnl=pnl, cycle_end=won | (code == EVT_STOP))
+    prof.count('trades', log.trades)
     
     # Financials
-    gross_profit = trades_df[trades_df['PnL'] > 0]['PnL'].sum()
-    gross_loss = abs(trades_df[trades_df['PnL'] < 0]['PnL'].sum())
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else 999.0
+    profit_factor = log.profit_factor
     
-    # Top 10 Gaps
-    # Sort completed_gaps by size desc
-    completed_gaps.sort(key=lambda x: x[0], reverse=True)
-    top_10 = completed_gaps[:10]
+    # Top 10 Gaps (gap closed by each repeat, largest first, ties in date order)
+    closes = np.nonzero(ev['is_opp'] & ev['is_repeat'])[0]
+    top_10 = closes[np.argsort(-res['gap_in'][closes], kind='stable')[:10]]
     
     top_10_md = "| Date | Gap Size | Races |\n|---|---|---|\n"
-    for g in top_10:
-        top_10_md += f"| {g[1].strftime('%Y-%m-%d')} | {g[0]} | {'-'.join(g[2])} |\n"
+    for i in top_10:
+        d_i = ev['date_idx'][i]
+        top_10_md += f"| {dates[d_i].strftime('%Y-%m-%d')} | {res['gap_in'][i]} | {'-'.join(day_races(ev, d_i))} |\n"
         
     # Step Dist
     step_dist = {}
-    for s in steps_to_win:
+    for s in steps_to_win.tolist():
         step_dist[s] = step_dist.get(s, 0) + 1
     
     step_md = "| Step | Wins | % |\n|---|---|---|\n"
@@ -269,12 +119,13 @@ def run_simulation():
         
     # Recovery Time - skipped for brevity, complex estimation
     
+    prof.stage('report')
     report = f"""# Simulation Report - NY Horses (STOP LOSS {MAX_STEPS})
 
 **Parameters:**
 - Stake: ${BASE_STAKE} (Multiplier {MULTIPLIER}x)
 - Stop Loss: {MAX_STEPS} Steps
-- P90 Window: All History
+- P{GAP_QUANTILE*100:.0f} Window: {f'{QUANTILE_WINDOW_DAYS} Days' if QUANTILE_WINDOW_DAYS else 'All History'}
 - Start Date: {start_date}
 
 **Financial Results:**
@@ -288,7 +139,7 @@ def run_simulation():
 - Winning Cycles: {winning_cycles}
 - **Stop Losses Hit**: {loss_cycles}
 - Max Consecutive Stops: {max_consecutive_stops}
-- Avg Steps to Win: {np.mean(steps_to_win) if steps_to_win else 0:.1f}
+- Avg Steps to Win: {np.mean(steps_to_win) if len(steps_to_win) else 0:.1f}
 
 **Top 10 Longest Gaps (Riskiest Periods):**
 {top_10_md}
@@ -301,7 +152,7 @@ def run_simulation():
 - Race 3 Win Rate: {(races_performance[3]['wins']/races_performance[3]['total']*100) if races_performance[3]['total'] else 0:.1f}%
 - Race 4 Win Rate: {(races_performance[4]['wins']/races_performance[4]['total']*100) if races_performance[4]['total'] else 0:.1f}%
 
-Generated from {len(df)} days of data.
+Generated from {len(dates)} days of data.
 """
     
     with open(OUTPUT_REPORT, 'w') as f:
@@ -309,6 +160,7 @@ Generated from {len(df)} days of data.
     
     print("Simulation Complete.")
     print(report)
+    prof.finish()
 
 if __name__ == '__main__':
     run_simulation()
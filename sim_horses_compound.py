@@ -2,6 +2,10 @@ import pandas as pd
 import numpy as np
 import os
 
+from horse_events import load_events
+from strategy_engine import make_spec, run_strategy
+import profiling
+
 INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
 OUTPUT_REPORT = r"c:\Users\Admin\Desktop\SniperStrategyProject\sim_report_compound.md"
 
@@ -18,105 +22,50 @@ RISK_PER_SESSION_PCT = 0.05 # Risk 5% of bankroll per session (Aggressive but vi
                             
 TARGET_MONTHLY_INCOME = 4000.0
 
+# Master rules on R2+ only, each session risking RISK_PER_SESSION_PCT of the bankroll:
+# Worst case (loss): Stakes S, 2S, 4S, 8S, 16S, 32S = 63S x Targets (1 to 3, avg ~2.5) = ~160S.
+# We want 160S <= Bank * RISK_PER_SESSION_PCT, so S = (Bank * Risk) / 160 (floor $2, all in at most).
+STRATEGY = make_spec(name='sim_horses_compound', entry_gap=ENTRY_GAP, gap_events='opps', gap_mode='always',
+                     multiplier=MULTIPLIER, max_steps=MAX_STEPS, payout_odds=PAYOUT_ODDS,
+                     sizing='risk', risk_pct=RISK_PER_SESSION_PCT, risk_units=160.0, min_stake=2.0,
+                     cap_to_bankroll=True, starting_bankroll=2000.0)
+
 def run_simulation():
     if not os.path.exists(INPUT_CSV):
         print("Data file not found.")
         return
 
-    df = pd.read_csv(INPUT_CSV)
-    df['Date'] = pd.to_datetime(df['Date'])
-    df = df.drop_duplicates(subset=['Date'])
-    df = df.sort_values('Date')
+    prof = profiling.start(OUTPUT_REPORT, script='sim_horses_compound')
+    prof.stage('load')
+    ev = load_events(INPUT_CSV)
+    dates = pd.to_datetime(ev['dates'])
     
+    prof.stage('engine')
+    prof.count('events', len(ev['winner']))
     # 1. First Pass: Fixed $2 Stake to determine Safety Baseline
     # logic matches sim_horses_master (R1 Ignored)
-    events = []
-    for idx, row in df.iterrows():
-        races = []
-        for r_col in ['R1', 'R2', 'R3', 'R4']:
-            val = str(row[r_col]).strip()
-            if val.endswith('.0'): val = val[:-2]
-            if val and val.isdigit(): races.append(val)
-        if not races: continue
-
-        # R1 is ignored in "Master - Pure Patience"
-        day_winners = [races[0]]
-        for i, winner in enumerate(races[1:], start=2):
-            events.append({'Date':row['Date'], 'Race':i, 'Winner':winner, 'Prevs':day_winners.copy(), 'IsOpp':True})
-            day_winners.append(winner)
-
-    # --- SIMULATION 1: FIXED STAKE (Safety Check) ---
-    max_drawdown_fixed = 0
-    current_dd_fixed = 0
-    peak_equity_fixed = 0
-    equity_fixed = 0
+    # R1 is ignored in "Master - Pure Patience"
     stake_fixed = 2.0
     
     cycle_cost_units = sum([MULTIPLIER**i for i in range(MAX_STEPS)]) # 1+2+4+8+16+32 = 63 units
     unit_cost_fixed = stake_fixed * cycle_cost_units # $126 for $2 stake
     
-    # Run lightweight sim for stats
-    # We need to accurately track DD to recommend Bankroll
-    
-    gap = 0
-    in_sess = False
-    step = 0
-    curr_stake = 0
+    # --- SIMULATION 1: FIXED STAKE (Safety Check) ---
+    # Cost = Stake * Targets. Payout = Stake * 9.
+    fixed = run_strategy(ev, STRATEGY, name='fixed', sizing='fixed', base_stake=stake_fixed, cap_to_bankroll=False)
     
-    profits_per_month = {} # Month -> Profit
+    # Month -> Profit, summed in event order like the old running +=
+    opp = ev['is_opp']
+    months = dates.strftime('%Y-%m').to_numpy()[ev['date_idx'][opp]]
+    month_keys, month_idx = np.unique(months, return_inverse=True)
+    month_totals = np.zeros(len(month_keys))
+    np.add.at(month_totals, month_idx, (fixed['revenue'] - fixed['cost'])[opp])
+    profits_per_month = dict(zip(month_keys.tolist(), month_totals.tolist()))
     
-    for evt in events:
-        date_key = evt['Date'].strftime('%Y-%m')
-        profits_per_month.setdefault(date_key, 0)
-        
-        is_repeat = (evt['Winner'] in evt['Prevs'])
-        should_bet = in_sess or (gap >= ENTRY_GAP)
-        
-        pnl = 0
-        if should_bet:
-            if not in_sess:
-                in_sess = True
-                step = 1
-                curr_stake = stake_fixed
-            
-            # Bet
-            cost = curr_stake * len(evt['Prevs']) # Usually 1, 2, or 3. Approximating cost as 'curr_stake' for comparative consistency with previous reports?
-            # User wants "Real Stats".
-            # PREV REPORT used abstract cost? "Cost: bet_amount". 
-            # In sim_horses_master: "cost = num_bets * session_stake".
-            # Let's be accurate. Average targets is ~2. 
-            # But the Payout is 9x. 
-            # Let's stick to strict logic: Cost = Stake * Targets. Payout = Stake * 9.
-            
-            targets_count = len(evt['Prevs'])
-            real_cost = curr_stake * targets_count
-            equity_fixed -= real_cost
-            pnl -= real_cost
-            
-            if is_repeat:
-                revenue = curr_stake * PAYOUT_ODDS
-                equity_fixed += revenue
-                pnl += revenue
-                
-                in_sess = False
-                step = 0
-            else:
-                if step >= MAX_STEPS:
-                    in_sess = False
-                    step = 0
-                else:
-                    curr_stake *= MULTIPLIER
-                    step += 1
-        
-        # Gap
-        if is_repeat: gap=0
-        else: gap+=1
-        
-        profits_per_month[date_key] += pnl
-        
-        peak_equity_fixed = max(peak_equity_fixed, equity_fixed)
-        drawdown = equity_fixed - peak_equity_fixed
-        max_drawdown_fixed = min(max_drawdown_fixed, drawdown)
+    # We need to accurately track DD to recommend Bankroll
+    equity_fixed = fixed['bankroll']
+    peak_equity_fixed = np.maximum.accumulate(np.maximum(equity_fixed, 0.0))
+    max_drawdown_fixed = min(0.0, (equity_fixed - peak_equity_fixed).min(initial=0.0))
     
     # Safe Bankroll Recommendation
     # Rule of Thumb: 2x Max Drawdown OR 20x Session Cost.
@@ -130,70 +79,11 @@ def run_simulation():
     
     # --- SIMULATION 2: COMPOUNDING ---
     # Start with Recommended Bankroll
-    bankroll_comp = recommended_bankroll_fixed
-    start_bank_comp = bankroll_comp
-    equity_comp_curve = []
-    
-    gap = 0
-    in_sess = False
-    step = 0
-    base_stake_comp = 0
-    curr_stake_comp = 0
+    start_bank_comp = recommended_bankroll_fixed
     
-    for evt in events:
-        is_repeat = (evt['Winner'] in evt['Prevs'])
-        should_bet = in_sess or (gap >= ENTRY_GAP)
-        
-        if should_bet:
-            if not in_sess:
-                # RECALCULATE STAKE BASED ON BANKROLL
-                # Rule: Risk 5% of Bankroll for this Session.
-                # Total Unit Risk = 63 units * AvgTargets(~2) = ~126 units?
-                # No, let's keep it defined. Max Cycle Cost is known.
-                # Worst case (loss): We lose Sum(Stakes * Targets).
-                # Max Steps 6. Multiplier 2.
-                # Stakes: S, 2S, 4S, 8S, 16S, 32S. Total 63S.
-                # Targets: Varies (1 to 3). Avg 2.2.
-                # Worst case cost approx 63S * 2.5 = ~160S.
-                # We want 160S <= Bank * RISK_PER_SESSION_PCT.
-                # S = (Bank * Risk) / 160.
-                
-                risk_amt = bankroll_comp * RISK_PER_SESSION_PCT
-                base_stake_comp = risk_amt / 160.0
-                if base_stake_comp < 2.0: base_stake_comp = 2.0 # Floor
-                
-                in_sess = True
-                step = 1
-                curr_stake_comp = base_stake_comp
-
-            targets_count = len(evt['Prevs'])
-            real_cost = curr_stake_comp * targets_count
-            
-            # Check for bust (theoretical, though risk mgmt should prevent)
-            if real_cost > bankroll_comp:
-                real_cost = bankroll_comp # All in (shouldn't happen with 5% risk)
-            
-            bankroll_comp -= real_cost
-            
-            if is_repeat:
-                revenue = curr_stake_comp * PAYOUT_ODDS
-                bankroll_comp += revenue
-                in_sess = False
-                step = 0
-            else:
-                if step >= MAX_STEPS:
-                    in_sess = False
-                    step = 0
-                else:
-                    curr_stake_comp *= MULTIPLIER
-                    step += 1
-        
-        if is_repeat: gap=0
-        else: gap+=1
-        
-        equity_comp_curve.append(bankroll_comp)
-
-    final_bankroll = bankroll_comp
+    prof.stage('engine_compound')
+    comp = run_strategy(ev, STRATEGY, starting_bankroll=start_bank_comp)
+    final_bankroll = comp['final_bankroll']
     total_gain_comp = final_bankroll - start_bank_comp
     roi_comp = (total_gain_comp / start_bank_comp) * 100
     
@@ -205,6 +95,7 @@ def run_simulation():
     required_stake_for_target = 2.0 * scale_factor
     required_bankroll_for_target = recommended_bankroll_fixed * scale_factor
 
+    prof.stage('report')
     report = f"""# Financial Projections & Compounding Analysis
 
 **1. Baseline Performance ($2 Stake)**
@@ -231,6 +122,7 @@ If you started with **${start_bank_comp:.0f}** and reinvested profits (Increasin
         f.write(report)
         
     print(report)
+    prof.finish()
 
 if __name__ == '__main__':
     run_simulation()
@@ -1,10 +1,16 @@
-import pandas as pd
 import numpy as np
 import os
 
+from horse_events import load_events
+from sim_kernel import trade_log, logged_events, monthly_profit as kernel_monthly_profit, EVT_WIN, EVT_STOP
+from strategy_engine import make_spec, run_strategy, kernel_result
+from trade_sink import TradeSink
+import profiling
+
 INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
 OUTPUT_REPORT = r"c:\Users\Admin\Desktop\SniperStrategyProject\sim_report_final.md"
-OUTPUT_LOG = r"c:\Users\Admin\Desktop\SniperStrategyProject\sim_trade_log_final.csv"
+OUTPUT_LOG = r"c:\Users\Admin\Desktop\SniperStrategyProject\sim_trade_log_final_3resets.csv" # sim_trade_log_final.csv is the $2,400 / 1200 / 1-reset run
+LOG_DETAIL = 'bet' # Trade log: 'off' / 'cycle' / 'bet' (a .parquet OUTPUT_LOG needs pyarrow)
 
 # Params
 MULTIPLIER = 2.0
@@ -13,184 +19,44 @@ MAX_STEPS = 6
 ENTRY_GAP = 4
 
 STARTING_BANKROLL = 3750.0
+COMPOUND_RATIO = 750.0 # Stake = Bank / 750
+MIN_STAKE = 2.0
+COOLDOWN_RESETS = 3
+
+# Gap/Stop state machine + Cool Down (wait 3 resets) + Compounding (1/750)
+STRATEGY = make_spec(name='sim_horses_final', entry_gap=ENTRY_GAP, multiplier=MULTIPLIER, max_steps=MAX_STEPS,
+                     payout_odds=PAYOUT_ODDS, cooldown_resets=COOLDOWN_RESETS, sizing='compound',
+                     compound_ratio=COMPOUND_RATIO, min_stake=MIN_STAKE, starting_bankroll=STARTING_BANKROLL)
 
 def run_simulation():
     if not os.path.exists(INPUT_CSV):
         print("Data file not found.")
         return
 
-    df = pd.read_csv(INPUT_CSV)
-    df['Date'] = pd.to_datetime(df['Date'])
-    df = df.drop_duplicates(subset=['Date'])
-    df = df.sort_values('Date')
-    
-    start_date = df['Date'].min()
-    end_date = df['Date'].max()
-    days_count = len(df)
+    prof = profiling.start(OUTPUT_REPORT, script='sim_horses_final')
+    prof.stage('load')
+    ev = load_events(INPUT_CSV)
+    prof.count('events', len(ev['winner']))
     
-    events = []
+    prof.stage('engine')
+    res = kernel_result(run_strategy(ev, STRATEGY))
     
-    for idx, row in df.iterrows():
-        races = []
-        for r_col in ['R1', 'R2', 'R3', 'R4']:
-            val = str(row[r_col]).strip()
-            if val.endswith('.0'): val = val[:-2]
-            if val and val.isdigit(): races.append(val)
-        if not races: continue
-
-        # R1 counts for Gap
-        events.append({
-            'Date': row['Date'],
-            'Race': 1,
-            'Winner': races[0],
-            'Prevs': [],
-            'IsOpp': False,
-            'IsGapEvent': True # Counts as non-repeat
-        })
-        
-        day_winners = [races[0]]
-        for i, winner in enumerate(races[1:], start=2):
-            events.append({
-                'Date': row['Date'],
-                'Race': i,
-                'Winner': winner,
-                'Prevs': day_winners.copy(),
-                'IsOpp': True,
-                'IsGapEvent': True
-            })
-            day_winners.append(winner)
-
-    # Simulation State
-    bankroll = STARTING_BANKROLL
-    peak_bankroll = bankroll
-    min_bankroll = bankroll
-    
-    gap = 0
-    in_session = False
-    step = 0
-    session_stake = 5.0 
-    cooling_down = False
-    resets_seen = 0 # Track how many resets we've seen during cool down
-    
-    trades = []
-    
-    wins = 0
-    stops = 0
-    safety_saves = 0
+    bankroll = res['final_bankroll']
+    min_bankroll = res['min_bankroll']
+    stops = res['stops']
     
     # Analyze Monthly Income
-    monthly_profit = {}
+    prof.stage('monthly')
+    monthly_profit = kernel_monthly_profit(ev, res)
     
-    for evt in events:
-        date_key = evt['Date'].strftime('%Y-%m')
-        monthly_profit.setdefault(date_key, 0)
-        
-        winner = evt['Winner']
-        prevs = evt['Prevs']
-        is_opp = evt['IsOpp']
-        is_gap_event = evt.get('IsGapEvent', False)
-        
-        # Check Repeat
-        is_repeat = False
-        if is_opp:
-            if winner in prevs: is_repeat = True
-        
-        # Logic
-        bet_amount = 0
-        payout = 0
-        notes = ""
-        
-        # 1. Cool Down Logic
-        if cooling_down:
-            notes = f"COOLING DOWN (Resets: {resets_seen}/3)"
-            if is_opp and is_repeat:
-                # Streak Broken naturally!
-                resets_seen += 1
-                gap = 0 # Reset gap tracking
-                
-                if resets_seen >= 3:
-                    cooling_down = False
-                    resets_seen = 0
-                    notes += " -> END (3rd Streak Broken). SAFE TO RESUME."
-                else:
-                    notes += f" -> Streak Broken ({resets_seen}/3). Waiting."
-            else:
-                 # Streak continues...
-                 if is_gap_event: gap += 1
-        
-        elif is_opp:
-            # 2. Betting Logic
-            should_bet = in_session or (gap >= ENTRY_GAP)
-            
-            if should_bet:
-                if not in_session:
-                    in_session = True
-                    step = 1
-                    # Compounding Stake: Ratio 1/750
-                    calc_stake = bankroll / 750.0
-                    if calc_stake < 2.0: calc_stake = 2.0
-                    session_stake = round(calc_stake, 2)
-                    
-                # Place Bet
-                targets = len(prevs)
-                cost = session_stake * targets
-                
-                # Deduct
-                bankroll -= cost
-                bet_amount = cost
-                mn_pnl = -cost
-                
-                if is_repeat:
-                    # Win
-                    revenue = session_stake * PAYOUT_ODDS
-                    bankroll += revenue
-                    payout = revenue
-                    mn_pnl += revenue
-                    
-                    wins += 1
-                    notes = f"WIN ({winner})"
-                    
-                    # Reset
-                    in_session = False
-                    step = 0
-                else:
-                    # Loss
-                    mn_pnl = 0 
-                    notes = f"LOSS Step {step}"
-                    
-                    if step >= MAX_STEPS:
-                        stops += 1
-                        notes += " [STOP HIT] -> ACTIVATING COOL DOWN (Wait 3 Resets)"
-                        cooling_down = True
-                        resets_seen = 0
-                        in_session = False
-                        step = 0
-                    else:
-                        step += 1
-                        session_stake = session_stake * MULTIPLIER
-                
-                monthly_profit[date_key] += mn_pnl
-
-        # 3. Gap Update
-        if not cooling_down and is_gap_event and not in_session:
-             if is_repeat: 
-                 gap = 0
-             else:
-                 gap += 1
-        
-        # Record Trade
-        peak_bankroll = max(peak_bankroll, bankroll)
-        min_bankroll = min(min_bankroll, bankroll)
-        
-        if bet_amount > 0 or "COOLING" in notes:
-             trades.append({
-                 'Date': evt['Date'],
-                 'Bankroll': bankroll,
-                 'Stake': session_stake if in_session else 0,
-                 'Notes': notes
-             })
+    prof.stage('trades_df')
+    with TradeSink(OUTPUT_LOG, LOG_DETAIL) as log:
+        log.emit(logged_events(res), lambda idx: trade_log(ev, res, idx),
+                 cycle_end=(res['code'] == EVT_WIN) | (res['code'] == EVT_STOP))
+    prof.count('trades', log.rows)
 
     # Report
+    prof.stage('report')
     final_roi = ((bankroll - STARTING_BANKROLL) / STARTING_BANKROLL) * 100
     avg_monthly = np.mean(list(monthly_profit.values()))
     
@@ -226,6 +92,7 @@ With the Safety Valve, we accepted {stops} fixed losses but avoided the "Deep Bl
         f.write(report)
     
     print(report)
+    prof.finish()
 
 if __name__ == '__main__':
     run_simulation()
@@ -0,0 +1,359 @@
+import numpy as np
+import pandas as pd
+import os
+import time
+
+from horse_events import load_events
+from pricing import price, TARGET_MODE
+
+INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
+OUTPUT_LOG = r"c:\Users\Admin\Desktop\SniperStrategyProject\sim_trade_log_final_3resets.csv"
+
+# numba is optional: with it the kernel is compiled, without it the same
+# code runs as plain Python (still no dicts / strings per event).
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+# Per-event codes written by the kernel (notes are only rendered on export)
+EVT_NONE = 0
+EVT_LOSS = 1
+EVT_WIN = 2
+EVT_STOP = 3
+EVT_COOL = 4        # Cooling down, streak continues
+EVT_COOL_BREAK = 5  # Cooling down, streak broken but more resets needed
+EVT_COOL_END = 6    # Cooling down finished on this event
+
+# Layout of the state vector the kernel reads at start and writes back at the end,
+# so a run can be resumed (live_state.py advances it one day at a time)
+ST_BANKROLL, ST_PEAK, ST_MIN, ST_GAP, ST_IN_SESSION, ST_STEP, ST_STAKE, \
+    ST_COOLING, ST_RESETS, ST_WINS, ST_STOPS = range(11)
+STATE_SIZE = 11
+
+# Final strategy defaults (sim_horses_final.py)
+DEFAULT_PARAMS = {
+    'entry_gap': 4,
+    'max_steps': 6,
+    'multiplier': 2.0,
+    'payout_odds': 9.0,  # Odds, per-race odds or a pricing.PAYOUT_TABLES name
+    'targets': TARGET_MODE,  # Tickets per bet, see pricing.TARGET_MODES
+    'cooldown_resets': 3,
+    'starting_bankroll': 3750.0,
+    'compound_ratio': 750.0,  # Stake = Bankroll / ratio (0 = no compounding)
+    'min_stake': 2.0,
+}
+
+
+@njit(cache=True)
+def _final_kernel(targets, payout, is_repeat, is_opp,
+                  entry_gap, max_steps, multiplier,
+                  cooldown_resets, compound_ratio, min_stake, state,
+                  out_bankroll, out_stake, out_code, out_step, out_resets, out_month_pnl):
+    bankroll = state[ST_BANKROLL]
+    peak_bankroll = state[ST_PEAK]
+    min_bankroll = state[ST_MIN]
+
+    gap = int(state[ST_GAP])
+    in_session = state[ST_IN_SESSION] != 0
+    step = int(state[ST_STEP])
+    session_stake = state[ST_STAKE]
+    cooling_down = state[ST_COOLING] != 0
+    resets_seen = int(state[ST_RESETS])
+
+    wins = int(state[ST_WINS])
+    stops = int(state[ST_STOPS])
+
+    for i in range(len(targets)):
+        opp = is_opp[i]
+        rep = opp and is_repeat[i]
+        code = EVT_NONE
+        month_pnl = 0.0
+        out_resets[i] = resets_seen
+
+        if cooling_down:
+            code = EVT_COOL
+            if rep:
+                resets_seen += 1
+                gap = 0
+                if resets_seen >= cooldown_resets:
+                    cooling_down = False
+                    resets_seen = 0
+                    code = EVT_COOL_END
+                else:
+                    code = EVT_COOL_BREAK
+            else:
+                gap += 1
+
+        elif opp:
+            if in_session or gap >= entry_gap:
+                if not in_session:
+                    in_session = True
+                    step = 1
+                    if compound_ratio > 0:
+                        calc_stake = bankroll / compound_ratio
+                        if calc_stake < min_stake:
+                            calc_stake = min_stake
+                        session_stake = round(calc_stake, 2)
+                    else:
+                        session_stake = min_stake
+
+                cost = session_stake * targets[i]
+                bankroll -= cost
+                out_step[i] = step
+
+                if rep:
+                    revenue = session_stake * payout[i]
+                    bankroll += revenue
+                    month_pnl = revenue - cost
+                    wins += 1
+                    code = EVT_WIN
+                    in_session = False
+                    step = 0
+                else:
+                    # Same bookkeeping as the script: losing steps don't hit monthly P&L
+                    code = EVT_LOSS
+                    if step >= max_steps:
+                        stops += 1
+                        code = EVT_STOP
+                        cooling_down = cooldown_resets > 0
+                        resets_seen = 0
+                        in_session = False
+                        step = 0
+                    else:
+                        step += 1
+                        session_stake = session_stake * multiplier
+
+        if not cooling_down and not in_session:
+            if rep:
+                gap = 0
+            else:
+                gap += 1
+
+        if bankroll > peak_bankroll:
+            peak_bankroll = bankroll
+        if bankroll < min_bankroll:
+            min_bankroll = bankroll
+
+        out_bankroll[i] = bankroll
+        out_stake[i] = session_stake if in_session else 0.0
+        out_code[i] = code
+        out_month_pnl[i] = month_pnl
+
+    state[ST_BANKROLL] = bankroll
+    state[ST_PEAK] = peak_bankroll
+    state[ST_MIN] = min_bankroll
+    state[ST_GAP] = gap
+    state[ST_IN_SESSION] = 1.0 if in_session else 0.0
+    state[ST_STEP] = step
+    state[ST_STAKE] = session_stake
+    state[ST_COOLING] = 1.0 if cooling_down else 0.0
+    state[ST_RESETS] = resets_seen
+    state[ST_WINS] = wins
+    state[ST_STOPS] = stops
+
+
+def initial_state(starting_bankroll, min_stake):
+    state = np.zeros(STATE_SIZE, dtype=np.float64)
+    state[ST_BANKROLL] = starting_bankroll
+    state[ST_PEAK] = starting_bankroll
+    state[ST_MIN] = starting_bankroll
+    state[ST_STAKE] = min_stake
+    return state
+
+
+def run_kernel(events, state=None, **params):
+    """
+    Runs the Final (Gap/Stop + Cool Down + Compounding) state machine over the
+    event arrays from horse_events, priced by pricing.price (params
+    'targets' and 'payout_odds'). Returns a dict of per-event output arrays
+    plus the summary numbers.
+
+    `state` resumes from a previous run's result['state'] (it is not modified).
+    """
+    p = dict(DEFAULT_PARAMS)
+    p.update(params)
+    if state is None:
+        state = initial_state(float(p['starting_bankroll']), float(p['min_stake']))
+    else:
+        state = np.array(state, dtype=np.float64)
+
+    n = len(events['winner'])
+    out = {
+        'bankroll': np.empty(n, dtype=np.float64),
+        'stake': np.empty(n, dtype=np.float64),
+        'code': np.empty(n, dtype=np.int8),
+        'step': np.zeros(n, dtype=np.int16),
+        'resets': np.empty(n, dtype=np.int16),
+        'month_pnl': np.empty(n, dtype=np.float64),
+    }
+    priced = price(events, p['targets'], p['payout_odds'])
+    _final_kernel(
+        priced['targets'], priced['payout'], events['is_repeat'], events['is_opp'],
+        int(p['entry_gap']), int(p['max_steps']), float(p['multiplier']),
+        int(p['cooldown_resets']), float(p['compound_ratio']), float(p['min_stake']), state,
+        out['bankroll'], out['stake'], out['code'], out['step'], out['resets'], out['month_pnl'])
+
+    out.update({
+        'final_bankroll': state[ST_BANKROLL],
+        'peak_bankroll': state[ST_PEAK],
+        'min_bankroll': state[ST_MIN],
+        'wins': int(state[ST_WINS]),
+        'stops': int(state[ST_STOPS]),
+        'state': state,
+        'params': p,
+    })
+    return out
+
+
+@njit(cache=True)
+def _batch_kernel(starts, targets, payout, is_repeat, is_opp,
+                  entry_gap, max_steps, multiplier,
+                  cooldown_resets, compound_ratio, min_stake, states,
+                  out_bankroll, out_stake, out_code, out_step, out_resets, out_month_pnl):
+    # One independent run per series: events starts[g]:starts[g+1], state row g
+    for g in range(len(starts) - 1):
+        a, b = starts[g], starts[g + 1]
+        _final_kernel(targets[a:b], payout[a:b], is_repeat[a:b], is_opp[a:b],
+                      entry_gap, max_steps, multiplier,
+                      cooldown_resets, compound_ratio, min_stake, states[g],
+                      out_bankroll[a:b], out_stake[a:b], out_code[a:b], out_step[a:b],
+                      out_resets[a:b], out_month_pnl[a:b])
+
+
+def run_batch(events, starts, states=None, **params):
+    """
+    run_kernel over several games at once. Events are grouped by game and
+    `starts` holds the first event index of each game plus the total
+    (horse_events.load_game_events gives both). Every game gets its own
+    bankroll and state.
+
+    Returns the per-event arrays (concatenated like the events), the
+    (games x STATE_SIZE) `states` and per-game final_bankroll, peak_bankroll,
+    min_bankroll, wins and stops arrays.
+    """
+    p = dict(DEFAULT_PARAMS)
+    p.update(params)
+    starts = np.asarray(starts, dtype=np.int64)
+    n_games = len(starts) - 1
+    if states is None:
+        states = np.tile(initial_state(float(p['starting_bankroll']), float(p['min_stake'])), (n_games, 1))
+    else:
+        states = np.array(states, dtype=np.float64)
+
+    n = len(events['winner'])
+    out = {
+        'bankroll': np.empty(n, dtype=np.float64),
+        'stake': np.empty(n, dtype=np.float64),
+        'code': np.empty(n, dtype=np.int8),
+        'step': np.zeros(n, dtype=np.int16),
+        'resets': np.empty(n, dtype=np.int16),
+        'month_pnl': np.empty(n, dtype=np.float64),
+    }
+    priced = price(events, p['targets'], p['payout_odds'])
+    _batch_kernel(
+        starts, priced['targets'], priced['payout'], events['is_repeat'], events['is_opp'],
+        int(p['entry_gap']), int(p['max_steps']), float(p['multiplier']),
+        int(p['cooldown_resets']), float(p['compound_ratio']), float(p['min_stake']), states,
+        out['bankroll'], out['stake'], out['code'], out['step'], out['resets'], out['month_pnl'])
+
+    out.update({
+        'final_bankroll': states[:, ST_BANKROLL].copy(),
+        'peak_bankroll': states[:, ST_PEAK].copy(),
+        'min_bankroll': states[:, ST_MIN].copy(),
+        'wins': states[:, ST_WINS].astype(np.int64),
+        'stops': states[:, ST_STOPS].astype(np.int64),
+        'states': states,
+        'params': p,
+    })
+    return out
+
+
+def _ordinal(n):
+    if 10 <= n % 100 <= 20:
+        return f"{n}th"
+    return f"{n}{ {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th') }"
+
+
+def render_note(code, step, resets, winner, cooldown_resets):
+    """Builds the Notes text for one logged event, same wording as sim_horses_final."""
+    if code == EVT_WIN:
+        return f"WIN ({winner})"
+    if code == EVT_LOSS:
+        return f"LOSS Step {step}"
+    if code == EVT_STOP:
+        if cooldown_resets == 1:
+            return f"LOSS Step {step} [STOP HIT] -> ACTIVATING COOL DOWN"
+        return f"LOSS Step {step} [STOP HIT] -> ACTIVATING COOL DOWN (Wait {cooldown_resets} Resets)"
+
+    # Single-reset cool down is the original Final rule, logged without a counter
+    if cooldown_resets == 1:
+        if code == EVT_COOL_END:
+            return "COOLING DOWN -> END (Streak Broken)"
+        return "COOLING DOWN"
+    notes = f"COOLING DOWN (Resets: {resets}/{cooldown_resets})"
+    if code == EVT_COOL_END:
+        notes += f" -> END ({_ordinal(cooldown_resets)} Streak Broken). SAFE TO RESUME."
+    elif code == EVT_COOL_BREAK:
+        notes += f" -> Streak Broken ({resets + 1}/{cooldown_resets}). Waiting."
+    return notes
+
+
+def logged_events(result):
+    """Indices of the events trade_log writes: bets and cool-down events."""
+    return np.nonzero(result['code'] != EVT_NONE)[0]
+
+
+def trade_log(events, result, logged=None):
+    """
+    Trade log DataFrame (Date, Bankroll, Stake, Notes) for bets and cool-down
+    events, or for the event indices `logged` only (one chunk of a stream).
+    """
+    code = result['code']
+    if logged is None:
+        logged = logged_events(result)
+    dates = pd.to_datetime(events['dates'])
+    cooldown_resets = result['params']['cooldown_resets']
+    winners = events['winner']
+
+    return pd.DataFrame({
+        'Date': dates[events['date_idx'][logged]],
+        'Bankroll': result['bankroll'][logged],
+        'Stake': result['stake'][logged],
+        'Notes': [render_note(code[i], result['step'][i], result['resets'][i], winners[i], cooldown_resets)
+                  for i in logged.tolist()],
+    })
+
+
+def monthly_profit(events, result):
+    """Month ('YYYY-MM') -> P&L, same bookkeeping as the script's monthly_profit dict."""
+    months = pd.to_datetime(events['dates']).strftime('%Y-%m').to_numpy()
+    keys, month_idx = np.unique(months[events['date_idx']], return_inverse=True)
+    totals = np.zeros(len(keys))
+    # add.at sums in event order, so floats match the script's running +=
+    np.add.at(totals, month_idx, result['month_pnl'])
+    return dict(zip(keys.tolist(), totals.tolist()))
+
+
+def benchmark(events, repeats=20, **params):
+    """Events/sec for the kernel (after warm-up / compilation)."""
+    run_kernel(events, **params)
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        run_kernel(events, **params)
+    elapsed = time.perf_counter() - t0
+    return len(events['winner']) * repeats / elapsed
+
+
+if __name__ == '__main__':
+    if not os.path.exists(INPUT_CSV):
+        print("Data file not found.")
+    else:
+        ev = load_events(INPUT_CSV)
+        res = run_kernel(ev)
+        trade_log(ev, res).to_csv(OUTPUT_LOG, index=False)
+        print(f"Final Bankroll: ${res['final_bankroll']:,.2f} | Wins: {res['wins']} | Stops: {res['stops']}")
+        print(f"Kernel throughput: {benchmark(ev):,.0f} events/sec")
@@ -0,0 +1,453 @@
+import numpy as np
+import pandas as pd
+import importlib
+import math
+import os
+import time
+
+from horse_events import load_events
+import result_cache
+from pricing import price, TARGET_MODE
+from sim_kernel import njit, EVT_NONE, EVT_LOSS, EVT_WIN, EVT_STOP, EVT_COOL, EVT_COOL_BREAK, EVT_COOL_END
+
+INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
+
+# Extra per-event codes (the sim_kernel ones cover bets and cool down)
+EVT_SKIP = 7        # In session, repeat on a race below min_race: session dropped, no bet
+EVT_SKIP_ENTRY = 8  # Ready to enter, but the gap closed on a race below min_race
+
+# Threshold while the quantile entry has too few gaps (the scripts' 999)
+QUANTILE_UNSET = 999
+
+# Every simulator is one of these specs (see STRATEGY in each sim_horses*.py)
+SPEC_DEFAULTS = {
+    'name': 'final',
+    # Entry rule
+    'entry': 'gap',                  # 'gap' (gap >= entry_gap) or 'quantile' (gap >= running percentile of closed gaps)
+    'entry_gap': 4,
+    'quantile': 0.90,
+    'quantile_min_gaps': 10,         # Quantile only used with more closed gaps than this
+    'quantile_window_days': None,    # None = all history, or a sliding window in days
+    'warmup_days': 0,                # No entries before this many days of history
+    # Gap sequence
+    'gap_events': 'all',             # 'all' (R1 counts as a miss) or 'opps' (R2+ only)
+    'gap_mode': 'idle',              # 'idle' (frozen while betting / cooling) or 'always' (runs on every event)
+    # Eligible races
+    'min_race': 2,                   # Bets only from this race on; a repeat before it drops the session
+    # Progression and stop rule
+    'multiplier': 2.0,
+    'max_steps': 6,
+    # Cool-down policy
+    'cooldown_resets': 0,            # Repeats to wait out after a stop (0 = none)
+    # Sizing policy
+    'sizing': 'fixed',               # 'fixed' (base_stake), 'compound' (bank / ratio) or 'risk' (bank x pct / units)
+    'base_stake': 2.0,
+    'compound_ratio': 750.0,
+    'min_stake': 2.0,
+    'risk_pct': 0.05,
+    'risk_units': 160.0,
+    'cap_to_bankroll': False,        # Bet at most the bankroll (all in)
+    'starting_bankroll': 0.0,
+    # Pricing (pricing.price)
+    'targets': TARGET_MODE,
+    'payout_odds': 9.0,
+}
+
+CHOICES = {
+    'entry': ('gap', 'quantile'),
+    'gap_events': ('all', 'opps'),
+    'gap_mode': ('idle', 'always'),
+    'sizing': ('fixed', 'compound', 'risk'),
+}
+
+# Compiled spec layout: one int row and one float row per strategy
+I_ENTRY, I_ENTRY_GAP, I_MIN_GAPS, I_WINDOW, I_WARMUP, I_GAP_ALL, I_GAP_IDLE, \
+    I_MIN_RACE, I_MAX_STEPS, I_COOLDOWN, I_SIZING, I_CAP, I_PRICE = range(13)
+F_QUANTILE, F_MULTIPLIER, F_BASE, F_RATIO, F_MIN_STAKE, F_RISK_PCT, F_RISK_UNITS, F_START = range(8)
+SIZING_FIXED, SIZING_COMPOUND, SIZING_RISK = range(3)
+
+# Summary columns written by the kernel
+S_FINAL, S_PEAK, S_MIN, S_WINS, S_STOPS, S_SKIPS, S_ENTRIES = range(7)
+
+
+def make_spec(spec=None, **fields):
+    """Full spec dict from SPEC_DEFAULTS, an optional base spec and overrides."""
+    out = dict(SPEC_DEFAULTS)
+    out.update(spec or {})
+    out.update(fields)
+    unknown = set(out) - set(SPEC_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown strategy field(s) {sorted(unknown)}")
+    for key, allowed in CHOICES.items():
+        if out[key] not in allowed:
+            raise ValueError(f"Strategy {out['name']!r}: {key}={out[key]!r}, expected one of {allowed}")
+    return out
+
+
+def compile_specs(specs, events):
+    """
+    Specs -> (int params, float params, pricing list). Strategies that price
+    the same way share one pricing entry (row I_PRICE indexes it).
+    """
+    n_days = len(events['dates'])
+    priced = []
+    iparams = np.zeros((len(specs), 13), dtype=np.int64)
+    fparams = np.zeros((len(specs), 8), dtype=np.float64)
+    for s, p in enumerate(specs):
+        # price() caches per (targets, payout), so equal pricing is the same dict
+        entry = price(events, p['targets'], p['payout_odds'])
+        if not any(entry is e for e in priced):
+            priced.append(entry)
+        window = p['quantile_window_days']
+        iparams[s] = (
+            1 if p['entry'] == 'quantile' else 0, p['entry_gap'], p['quantile_min_gaps'],
+            -1 if window is None else window, min(n_days - 1, p['warmup_days']),
+            1 if p['gap_events'] == 'all' else 0, 1 if p['gap_mode'] == 'idle' else 0,
+            p['min_race'], p['max_steps'], p['cooldown_resets'],
+            CHOICES['sizing'].index(p['sizing']), 1 if p['cap_to_bankroll'] else 0,
+            next(k for k, e in enumerate(priced) if e is entry))
+        fparams[s] = (p['quantile'], p['multiplier'], p['base_stake'], p['compound_ratio'],
+                      p['min_stake'], p['risk_pct'], p['risk_units'], p['starting_bankroll'])
+    return iparams, fparams, priced
+
+
+@njit(cache=True)
+def _quantile_value(hist, s, n_gaps, q):
+    # Running percentile of closed gaps over a count histogram, the P90 rank
+    # rule of the old calculate_p90: sorted(gaps)[ceil(q * n) - 1]
+    rank = math.ceil(q * n_gaps)
+    total = 0
+    for g in range(hist.shape[1]):
+        total += hist[s, g]
+        if total >= rank:
+            return g
+    return hist.shape[1]
+
+
+@njit(cache=True)
+def _close_gap(hist, win_day, win_gap, n_gaps, tail, s, gap, day, windowed):
+    # Closed gap into the quantile histogram (and the sliding window queue)
+    hist[s, gap] += 1
+    n_gaps[s] += 1
+    if windowed:
+        win_day[s, tail[s]] = day
+        win_gap[s, tail[s]] = gap
+        tail[s] += 1
+
+
+@njit(cache=True)
+def _strategy_kernel(targets, payout, is_repeat, is_opp, race, date_idx, day,
+                     iparams, fparams, hist, win_day, win_gap, summary,
+                     out_bankroll, out_stake, out_cost, out_revenue, out_code,
+                     out_step, out_gap_in, out_gap, out_resets, out_entry):
+    n_strat = iparams.shape[0]
+    record = out_bankroll.shape[1] > 0
+
+    bankroll = fparams[:, F_START].copy()
+    peak = bankroll.copy()
+    low = bankroll.copy()
+    gap = np.zeros(n_strat, dtype=np.int64)
+    in_session = np.zeros(n_strat, dtype=np.bool_)
+    step = np.zeros(n_strat, dtype=np.int64)
+    stake = np.zeros(n_strat, dtype=np.float64)
+    cooling = np.zeros(n_strat, dtype=np.bool_)
+    resets = np.zeros(n_strat, dtype=np.int64)
+    n_gaps = np.zeros(n_strat, dtype=np.int64)
+    head = np.zeros(n_strat, dtype=np.int64)
+    tail = np.zeros(n_strat, dtype=np.int64)
+    wins = np.zeros(n_strat, dtype=np.int64)
+    stops = np.zeros(n_strat, dtype=np.int64)
+    skips = np.zeros(n_strat, dtype=np.int64)
+    entries = np.zeros(n_strat, dtype=np.int64)
+
+    # Event-major: every strategy advances on event i before any sees i + 1
+    for i in range(len(is_repeat)):
+        opp = is_opp[i]
+        rep = opp and is_repeat[i]
+
+        for s in range(n_strat):
+            ip = iparams[s]
+            counted = opp or ip[I_GAP_ALL] == 1
+            idle = ip[I_GAP_IDLE] == 1
+            pi = ip[I_PRICE]
+            code = EVT_NONE
+            bet = False
+            entered = False
+            bet_stake = 0.0
+            bet_step = 0
+            cost = 0.0
+            revenue = 0.0
+            closed = False # Gap already closed on this event
+            gap_in = gap[s]
+            resets_in = resets[s]
+
+            if cooling[s]:
+                code = EVT_COOL
+                if rep:
+                    resets[s] += 1
+                    if idle:
+                        closed = True
+                        if ip[I_ENTRY] == 1:
+                            _close_gap(hist, win_day, win_gap, n_gaps, tail, s, gap[s], day[date_idx[i]], ip[I_WINDOW] >= 0)
+                        gap[s] = 0
+                    if resets[s] >= ip[I_COOLDOWN]:
+                        cooling[s] = False
+                        resets[s] = 0
+                        code = EVT_COOL_END
+                    else:
+                        code = EVT_COOL_BREAK
+                elif idle and counted:
+                    gap[s] += 1
+
+            elif opp:
+                can_bet = race[i] >= ip[I_MIN_RACE]
+                if in_session[s]:
+                    if can_bet:
+                        bet = True
+                    elif rep:
+                        in_session[s] = False
+                        step[s] = 0
+                        skips[s] += 1
+                        code = EVT_SKIP
+                else:
+                    ready = date_idx[i] >= ip[I_WARMUP]
+                    if ready:
+                        limit = ip[I_ENTRY_GAP]
+                        if ip[I_ENTRY] == 1:
+                            if ip[I_WINDOW] >= 0:
+                                cutoff = day[date_idx[i]] - ip[I_WINDOW]
+                                while head[s] < tail[s] and win_day[s, head[s]] < cutoff:
+                                    hist[s, win_gap[s, head[s]]] -= 1
+                                    n_gaps[s] -= 1
+                                    head[s] += 1
+                            if n_gaps[s] > ip[I_MIN_GAPS]:
+                                limit = _quantile_value(hist, s, n_gaps[s], fparams[s, F_QUANTILE])
+                            else:
+                                limit = QUANTILE_UNSET
+                        ready = gap[s] >= limit
+                    if ready:
+                        if can_bet:
+                            in_session[s] = True
+                            step[s] = 1
+                            entries[s] += 1
+                            entered = True
+                            bet = True
+                            sizing = ip[I_SIZING]
+                            if sizing == SIZING_FIXED:
+                                stake[s] = fparams[s, F_BASE]
+                            elif sizing == SIZING_COMPOUND:
+                                if fparams[s, F_RATIO] > 0:
+                                    calc_stake = bankroll[s] / fparams[s, F_RATIO]
+                                    if calc_stake < fparams[s, F_MIN_STAKE]:
+                                        calc_stake = fparams[s, F_MIN_STAKE]
+                                    stake[s] = round(calc_stake, 2)
+                                else:
+                                    stake[s] = fparams[s, F_MIN_STAKE]
+                            else:
+                                calc_stake = bankroll[s] * fparams[s, F_RISK_PCT] / fparams[s, F_RISK_UNITS]
+                                if calc_stake < fparams[s, F_MIN_STAKE]:
+                                    calc_stake = fparams[s, F_MIN_STAKE]
+                                stake[s] = calc_stake
+                        elif rep:
+                            skips[s] += 1
+                            code = EVT_SKIP_ENTRY
+
+                if bet:
+                    bet_stake = stake[s]
+                    bet_step = step[s]
+                    cost = bet_stake * targets[pi, i]
+                    if ip[I_CAP] == 1 and cost > bankroll[s]:
+                        cost = bankroll[s]
+                    bankroll[s] -= cost
+                    if rep:
+                        revenue = bet_stake * payout[pi, i]
+                        bankroll[s] += revenue
+                        wins[s] += 1
+                        code = EVT_WIN
+                        in_session[s] = False
+                        step[s] = 0
+                    else:
+                        code = EVT_LOSS
+                        if step[s] >= ip[I_MAX_STEPS]:
+                            stops[s] += 1
+                            code = EVT_STOP
+                            cooling[s] = ip[I_COOLDOWN] > 0
+                            resets[s] = 0
+                            in_session[s] = False
+                            step[s] = 0
+                        else:
+                            step[s] += 1
+                            stake[s] = stake[s] * fparams[s, F_MULTIPLIER]
+
+            # Gap update: 'always' on every counted event, 'idle' only outside sessions / cool down
+            if counted and (not idle or (not cooling[s] and not in_session[s])):
+                if rep:
+                    if not closed and ip[I_ENTRY] == 1:
+                        _close_gap(hist, win_day, win_gap, n_gaps, tail, s, gap[s], day[date_idx[i]], ip[I_WINDOW] >= 0)
+                    gap[s] = 0
+                else:
+                    gap[s] += 1
+
+            if bankroll[s] > peak[s]:
+                peak[s] = bankroll[s]
+            if bankroll[s] < low[s]:
+                low[s] = bankroll[s]
+
+            if record:
+                out_bankroll[s, i] = bankroll[s]
+                out_stake[s, i] = bet_stake
+                out_cost[s, i] = cost
+                out_revenue[s, i] = revenue
+                out_code[s, i] = code
+                out_step[s, i] = bet_step
+                out_gap_in[s, i] = gap_in
+                out_gap[s, i] = gap[s]
+                out_resets[s, i] = resets_in
+                out_entry[s, i] = entered
+
+    for s in range(n_strat):
+        summary[s, S_FINAL] = bankroll[s]
+        summary[s, S_PEAK] = peak[s]
+        summary[s, S_MIN] = low[s]
+        summary[s, S_WINS] = wins[s]
+        summary[s, S_STOPS] = stops[s]
+        summary[s, S_SKIPS] = skips[s]
+        summary[s, S_ENTRIES] = entries[s]
+
+
+def run_strategies(events, specs, record=True):
+    """
+    Evaluates every spec side by side in one pass over the horse_events
+    stream. Returns one result dict per spec: the summary numbers and, with
+    record=True, per-event arrays (bankroll, stake, cost, revenue, code,
+    step, gap_in / gap = gap before / after the event, resets, entry).
+    Cached on disk for events from horse_events.load_events (result_cache).
+    """
+    specs = [make_spec(p) for p in specs]
+    return result_cache.on_events(events, _run_strategies, specs, record)
+
+
+def _run_strategies(events, specs, record):
+    iparams, fparams, priced = compile_specs(specs, events)
+    n, n_strat = len(events['winner']), len(specs)
+    targets = np.stack([p['targets'] for p in priced])
+    payout = np.stack([p['payout'] for p in priced])
+    day = events['dates'].astype('datetime64[D]').astype(np.int64)
+
+    # Closed-gap histograms only for quantile entries; a gap never outgrows the longest miss run
+    quantile = iparams[:, I_ENTRY] == 1
+    runs = np.diff(np.concatenate(([-1], np.nonzero(events['is_repeat'])[0], [n])))
+    width = int(runs.max()) + 1 if quantile.any() else 1
+    hist = np.zeros((n_strat, width), dtype=np.int64)
+    windowed = quantile & (iparams[:, I_WINDOW] >= 0)
+    cap = int(events['is_repeat'].sum()) + 1 if windowed.any() else 1
+    win_day = np.zeros((n_strat, cap), dtype=np.int64)
+    win_gap = np.zeros((n_strat, cap), dtype=np.int64)
+
+    m = n if record else 0
+    out = {
+        'bankroll': np.empty((n_strat, m), dtype=np.float64),
+        'stake': np.empty((n_strat, m), dtype=np.float64),
+        'cost': np.empty((n_strat, m), dtype=np.float64),
+        'revenue': np.empty((n_strat, m), dtype=np.float64),
+        'code': np.empty((n_strat, m), dtype=np.int8),
+        'step': np.empty((n_strat, m), dtype=np.int16),
+        'gap_in': np.empty((n_strat, m), dtype=np.int32),
+        'gap': np.empty((n_strat, m), dtype=np.int32),
+        'resets': np.empty((n_strat, m), dtype=np.int16),
+        'entry': np.empty((n_strat, m), dtype=np.bool_),
+    }
+    summary = np.zeros((n_strat, 7), dtype=np.float64)
+    _strategy_kernel(targets, payout, events['is_repeat'], events['is_opp'], events['race'],
+                     events['date_idx'], day, iparams, fparams, hist, win_day, win_gap, summary,
+                     out['bankroll'], out['stake'], out['cost'], out['revenue'], out['code'],
+                     out['step'], out['gap_in'], out['gap'], out['resets'], out['entry'])
+
+    results = []
+    for s, p in enumerate(specs):
+        res = {key: arr[s] for key, arr in out.items()} if record else {}
+        res.update({
+            'final_bankroll': summary[s, S_FINAL],
+            'peak_bankroll': summary[s, S_PEAK],
+            'min_bankroll': summary[s, S_MIN],
+            'wins': int(summary[s, S_WINS]),
+            'stops': int(summary[s, S_STOPS]),
+            'skips': int(summary[s, S_SKIPS]),
+            'entries': int(summary[s, S_ENTRIES]),
+            'spec': p,
+        })
+        results.append(res)
+    return results
+
+
+def run_strategy(events, spec=None, **fields):
+    """run_strategies for a single spec (overrides as keywords)."""
+    return run_strategies(events, [make_spec(spec, **fields)])[0]
+
+
+def kernel_result(res):
+    """
+    A run_strategy result in sim_kernel.run_kernel's layout (stake held after
+    the event, month_pnl booked on wins), for sim_kernel.trade_log and
+    sim_kernel.monthly_profit.
+    """
+    code = res['code']
+    out = dict(res)
+    out['stake'] = np.where(code == EVT_LOSS, res['stake'] * res['spec']['multiplier'], 0.0)
+    out['month_pnl'] = np.where(code == EVT_WIN, res['revenue'] - res['cost'], 0.0)
+    out['params'] = res['spec']
+    return out
+
+
+def longest_stop_run(code):
+    """Longest run of stops not broken by a win, from a per-event code array."""
+    cycles = code[(code == EVT_WIN) | (code == EVT_STOP)]
+    best = run = 0
+    for stop in (cycles == EVT_STOP).tolist():
+        run = run + 1 if stop else 0
+        best = max(best, run)
+    return best
+
+
+def summary_table(results):
+    """One row per strategy: the side-by-side comparison."""
+    return pd.DataFrame([{
+        'strategy': r['spec']['name'],
+        'start': r['spec']['starting_bankroll'],
+        'final': r['final_bankroll'],
+        'net': r['final_bankroll'] - r['spec']['starting_bankroll'],
+        'peak': r['peak_bankroll'],
+        'low': r['min_bankroll'],
+        'entries': r['entries'],
+        'wins': r['wins'],
+        'stops': r['stops'],
+        'skips': r['skips'],
+    } for r in results])
+
+
+SIMULATORS = ('sim_horses', 'sim_horses_sniper', 'sim_horses_master',
+              'sim_horses_compound', 'sim_horses_long_term', 'sim_horses_final')
+
+
+def simulator_specs():
+    """The STRATEGY spec declared by each simulator script."""
+    return [importlib.import_module(name).STRATEGY for name in SIMULATORS]
+
+
+if __name__ == '__main__':
+    if not os.path.exists(INPUT_CSV):
+        print("Data file not found.")
+    else:
+        ev = load_events(INPUT_CSV)
+        specs = simulator_specs()
+        # Plus the Final rules under every Gap/Stop pair, all in the same pass
+        final = specs[-1]
+        specs += [make_spec(final, name=f"final g{g} s{m}", entry_gap=g, max_steps=m)
+                  for g in range(2, 9) for m in range(4, 9)]
+
+        run_strategies(ev, specs[:1], record=False) # Compile
+        t0 = time.perf_counter()
+        results = run_strategies(ev, specs, record=False)
+        elapsed = time.perf_counter() - t0
+        print(f"# {len(specs)} strategies x {len(ev['winner'])} events in {elapsed * 1000:.1f} ms")
+        print(summary_table(results).to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
@@ -0,0 +1,101 @@
+import pandas as pd
+import numpy as np
+
+from horse_events import load_events
+from pricing import price, TARGET_MODE
+from streaks import run_lengths, streaks
+
+INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
+BASE_STAKE = 1.0
+PAYOUT_ODDS = 9.0
+
+
+def streak_table(is_repeat):
+    """
+    Splits the outcome stream into streaks of non-repeats (streaks.run_lengths).
+
+    Returns (streak_id per event, offset per event, lengths, censored):
+    offset is the gap value when the event happens (0s seen so far in the streak).
+    """
+    rl = run_lengths(is_repeat)
+    return rl['streak_id'], rl['offset'], rl['length'], rl['censored']
+
+
+def cycle_ev_table(events, entry_gaps, max_steps_list, multipliers, n_cycles=4,
+                   base_stake=BASE_STAKE, payout_odds=PAYOUT_ODDS, targets=TARGET_MODE):
+    """
+    Exact per-cycle economics for the Gap/Stop martingale with real target counts.
+
+    Entry happens once the gap reaches entry_gap; only opportunities (R2..R4)
+    are bets, each costing stake * targets and paying stake * payout as
+    priced by pricing.price. Every max_steps losing bets end a cycle (stop),
+    and the next cycle restarts at the base stake. Open (censored) streaks
+    are left out since their outcome is unknown.
+
+    Returns one row per (entry_gap, max_steps, multiplier, cycle) with
+    entering/wins/stops counts, win probability, average cost, average
+    reward and EV per entered cycle.
+    """
+    is_repeat = events['is_repeat']
+    is_opp = events['is_opp']
+    priced = price(events, targets, payout_odds)
+    st = streaks(events)
+    streak_id, offset, censored = st['streak_id'], st['offset'], st['censored']
+    closed = np.zeros(len(is_repeat), dtype=bool)
+    closed_ids = np.nonzero(~censored)[0]
+    closed[np.isin(streak_id, closed_ids)] = True
+
+    multipliers = np.asarray(multipliers, dtype=np.float64)
+    rows = []
+    for entry_gap in entry_gaps:
+        bet = is_opp & closed & (offset >= entry_gap)
+        b_sid = streak_id[bet]
+        # Global bet number within the streak (1-based)
+        first = np.searchsorted(b_sid, b_sid, side='left')
+        g = np.arange(len(b_sid)) - first + 1
+        b_targets = priced['targets'][bet]
+        b_win = is_repeat[bet]
+        b_payout = priced['payout'][bet]
+        # Win step per streak that was entered (its repeat is always a bet)
+        win_steps = g[b_win]
+
+        for max_steps in max_steps_list:
+            cycle = (g - 1) // max_steps + 1
+            k = (g - 1) % max_steps # 0-based step inside the cycle
+            in_range = cycle <= n_cycles
+            c_idx = cycle[in_range] - 1
+            stake_units = multipliers[:, None] ** k[in_range][None, :] # (mults x bets)
+
+            cost = np.zeros((len(multipliers), n_cycles))
+            revenue = np.zeros((len(multipliers), n_cycles))
+            for m_i in range(len(multipliers)):
+                cost[m_i] = np.bincount(c_idx, weights=stake_units[m_i] * b_targets[in_range], minlength=n_cycles)
+                revenue[m_i] = np.bincount(c_idx, weights=stake_units[m_i] * b_win[in_range] * b_payout[in_range], minlength=n_cycles)
+            cost *= base_stake
+            revenue *= base_stake
+
+            for c in range(1, n_cycles + 1):
+                entering = int(np.sum(win_steps > (c - 1) * max_steps))
+                wins = int(np.sum((win_steps > (c - 1) * max_steps) & (win_steps <= c * max_steps)))
+                for m_i, mult in enumerate(multipliers):
+                    rows.append({
+                        'entry_gap': entry_gap,
+                        'max_steps': max_steps,
+                        'multiplier': float(mult),
+                        'cycle': c,
+                        'entering': entering,
+                        'wins': wins,
+                        'stops': entering - wins,
+                        'win_prob': wins / entering if entering else np.nan,
+                        'avg_cost': cost[m_i, c - 1] / entering if entering else np.nan,
+                        'avg_revenue': revenue[m_i, c - 1] / entering if entering else np.nan,
+                        'ev': (revenue[m_i, c - 1] - cost[m_i, c - 1]) / entering if entering else np.nan,
+                    })
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    ev = load_events(INPUT_CSV)
+    table = cycle_ev_table(ev, entry_gaps=range(0, 11), max_steps_list=range(3, 11),
+                           multipliers=[1.5, 1.7, 2.0, 2.2])
+    print(table[table['cycle'] == 1].sort_values('ev', ascending=False).head(20).to_string(index=False))
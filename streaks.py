@@ -0,0 +1,79 @@
+import numpy as np
+
+import result_cache
+
+# Which races make up the outcome stream:
+# - 'all':  every race, R1 included (it can't repeat, so it always extends the gap)
+# - 'opps': opportunities only (R2..R4), R1 left out
+STREAMS = ('all', 'opps')
+
+
+def run_lengths(is_repeat):
+    """
+    Run-length encoding of an outcome stream into streaks of non-repeats.
+    Each repeat closes the streak it ends; the trailing streak, if any,
+    is open (censored: its final length is unknown).
+
+    Returns a dict of arrays, positions relative to the stream:
+    - per position: 'streak_id', 'offset' (gap value when it happens)
+    - per streak:   'length', 'start' (first position), 'end' (closing
+      repeat, or last position for the open streak), 'censored'
+    """
+    is_repeat = np.asarray(is_repeat, dtype=bool)
+    ends = np.cumsum(is_repeat)
+    streak_id = ends - is_repeat
+    n_streaks = int(ends[-1]) + 1 if len(is_repeat) else 0
+    start = np.searchsorted(streak_id, np.arange(n_streaks), side='left')
+    offset = np.arange(len(is_repeat)) - start[streak_id]
+
+    sizes = np.bincount(streak_id, minlength=n_streaks)
+    censored = np.zeros(n_streaks, dtype=bool)
+    if n_streaks and not is_repeat[-1]:
+        censored[-1] = True
+    # Closed streaks include their repeat event, which is not part of the length
+    length = sizes - (~censored)
+    end = start + sizes - 1
+    if n_streaks and sizes[-1] == 0:
+        # Stream ends on a repeat: no open streak after it
+        length, censored, start, end = length[:-1], censored[:-1], start[:-1], end[:-1]
+    return {'streak_id': streak_id, 'offset': offset, 'length': length,
+            'start': start, 'end': end, 'censored': censored}
+
+
+def streaks(events, stream='all'):
+    """
+    run_lengths over the horse_events stream, built once per stream and
+    cached on the events dict (and on disk, see result_cache) so every
+    analyzer reads the same streaks.
+
+    Adds 'index' (event index of each stream position), 'start_event' /
+    'end_event' (event indices of each streak's bounds) and 'break_date'
+    (date of the closing repeat, NaT for the open streak).
+    """
+    if stream not in STREAMS:
+        raise ValueError(f"Unknown streak stream {stream!r}, expected one of {STREAMS}")
+    cache = events.setdefault('streaks', {})
+    if stream not in cache:
+        cache[stream] = result_cache.on_events(events, _stream_streaks, stream)
+    return cache[stream]
+
+
+def _stream_streaks(events, stream):
+    if stream == 'all':
+        index = np.arange(len(events['is_repeat']))
+    else:
+        index = np.nonzero(events['is_opp'])[0]
+    out = run_lengths(events['is_repeat'][index])
+    out['index'] = index
+    out['start_event'] = index[out['start']]
+    out['end_event'] = index[out['end']]
+    dates = np.asarray(events['dates'], dtype='datetime64[D]')
+    out['break_date'] = np.where(out['censored'], np.datetime64('NaT'),
+                                 dates[events['date_idx'][out['end_event']]])
+    return out
+
+
+def closed_lengths(events, stream='all'):
+    """Lengths of the streaks that ended (the open one left out)."""
+    st = streaks(events, stream)
+    return st['length'][~st['censored']]
@@ -0,0 +1,57 @@
+import asyncio
+import json
+import os
+import shutil
+
+import pytest
+
+import live_state
+from analytics_service import AnalyticsService, MAX_SWEEP_CONFIGS
+
+DATA_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ny_horses_data.csv')
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setenv('SIM_CACHE', 'off')
+    csv_path = str(tmp_path / 'data.csv')
+    shutil.copy(DATA_CSV, csv_path)
+    svc = AnalyticsService(csv_path, str(tmp_path / 'state.json'), workers=1)
+    yield svc
+    if svc.pool is not None:
+        svc.pool.shutdown()
+
+
+def _get(svc, target):
+    status, payload = asyncio.run(svc.dispatch('GET', target, b''))
+    return status, json.loads(json.dumps(payload, default=str))
+
+
+def test_next_bet_simulates_results(service):
+    status, before = _get(service, '/next-bet')
+    assert status == 200
+    state = service.state
+    # The same answer as live_state on the service's state, and it moves with the results passed
+    for results in ([], [3], [3, 7], [3, 3]):
+        status, out = _get(service, '/next-bet?results=' + ','.join(map(str, results)))
+        assert status == 200
+        expected = live_state.instructions(state, results)
+        assert {k: out[k] for k in expected} == json.loads(json.dumps(expected))
+        assert out['race'] == len(results) + 1
+    assert _get(service, '/next-bet?results=3,7')[1] != _get(service, '/next-bet?results=3,3')[1]
+
+
+def test_next_bet_rejects_bad_results(service):
+    status, out = _get(service, '/next-bet?results=3,x')
+    assert status == 400
+
+
+def test_sweep_rejects_oversized_grid(service):
+    grid = {'step_mults': [1.5, 2.0], 'recovery_mults': [1.0], 'entry_gaps': [4], 'max_steps': [6], 'base_stakes': [2.0]}
+    status, out = asyncio.run(service.dispatch('POST', '/sweep', json.dumps(grid).encode()))
+    assert status == 200 and out['configs'] == 2
+
+    grid['step_mults'] = [1 + i / 1000 for i in range(MAX_SWEEP_CONFIGS + 1)]
+    status, out = asyncio.run(service.dispatch('POST', '/sweep', json.dumps(grid).encode()))
+    assert status == 400
+    assert 'limit' in out['error']
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+import benchmarks
+
+
+def test_run_suite_smoke():
+    table = benchmarks.run_suite(scales=[1], games=benchmarks.GAMES[:2], repeats=1, memory=False,
+                                 log=lambda *a: None)
+    scripts = table[table['kind'] == 'script']
+    assert set(scripts['target']) == set(benchmarks.SCRIPTS)
+    assert set(table['dataset']) == {'1x', '1x_2games'}
+    assert (table['total_s'] > 0).all()
+
+
+def test_synthetic_dates_fit_pandas():
+    # 240x the current history still parses as nanosecond timestamps
+    dates = pd.to_datetime(benchmarks.synth_results(benchmarks.BASE_DAYS * 240)['Date'])
+    assert dates.is_monotonic_increasing
+    assert dates.iloc[-1] < pd.Timestamp(benchmarks.SYNTH_END)
+    assert np.all(dates.diff().dropna() == pd.Timedelta(days=1))
@@ -0,0 +1,69 @@
+import pytest
+
+import live_state
+from sim_kernel import ST_GAP
+
+
+def _state_at_gap(gap):
+    """Flat-stake state after a complete day, gap = `gap`."""
+    state = live_state.new_state(compound_ratio=0, min_stake=5.0)
+    state['kernel'][ST_GAP] = gap
+    state['date'] = '2026-01-01'
+    state['day_results'] = [1, 2, 3, 4]
+    return state
+
+
+def test_instructions_simulates_unapplied_races_mid_session():
+    state = _state_at_gap(4)
+    out = live_state.instructions(state, [5, 6])
+    # R1 pushes the gap to 5, R2 enters at 5 and loses -> step 2 at double stake
+    assert out['race'] == 3
+    assert out['status'] == 'IN SESSION Step 2/6'
+    assert out['stake_per_target'] == 10.0
+    assert out['targets'] == [5, 6]
+    assert state['kernel'][ST_GAP] == 4 # Hypothetical run only
+
+
+def test_instructions_r2_repeat_resets_gap():
+    out = live_state.instructions(_state_at_gap(4), [5, 5])
+    assert not out['bet']
+    assert out['status'] == 'WAIT (Gap 0/4)'
+
+
+def test_instructions_continues_the_applied_day():
+    state = _state_at_gap(4)
+    state['day_results'] = [5]
+    state['kernel'][ST_GAP] = 5 # R1 already applied through step()
+    out = live_state.instructions(state, [5, 6])
+    assert out['status'] == 'IN SESSION Step 2/6'
+    assert out['stake_per_target'] == 10.0
+
+
+def test_instructions_matches_step():
+    state = _state_at_gap(4)
+    expected = live_state.instructions(state, [5, 6, 7])
+    live_state.step(state, '2026-01-02', [5, 6, 7])
+    assert live_state.instructions(state) == expected
+
+
+def test_instructions_after_a_closed_three_race_day():
+    state = _state_at_gap(4)
+    live_state.step(state, '2026-01-02', [5, 6, 7], closed=True)
+    gap = state['kernel'][ST_GAP]
+    # Same first digits on the next day: a new day, not races 4+ of the old one
+    assert live_state.instructions(state)['status'] == 'DAY COMPLETE'
+    out = live_state.instructions(state, [5, 6, 7])
+    assert out['race'] == 4
+    assert out['status'] == 'IN SESSION Step 5/6' # Two more losing bets, not the step 3 of the old day
+    assert out == live_state.instructions(state, [5, 6, 7], date='2026-01-03')
+    assert state['kernel'][ST_GAP] == gap
+
+
+def test_step_rejects_a_rewritten_day():
+    state = _state_at_gap(4)
+    live_state.step(state, '2026-01-02', [5, 6])
+    with pytest.raises(ValueError):
+        live_state.step(state, '2026-01-02', [5, 8, 7])
+    with pytest.raises(ValueError):
+        live_state.instructions(state, [8, 6, 7], date='2026-01-02')
+    assert live_state.step(state, '2026-01-02', [5, 6, 7])[0]['race'] == 3
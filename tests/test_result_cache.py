@@ -0,0 +1,41 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import horse_events
+import result_cache
+
+DATA_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ny_horses_data.csv')
+
+
+@pytest.fixture
+def csv_path(tmp_path, monkeypatch):
+    monkeypatch.setenv('SIM_CACHE', str(tmp_path / 'cache'))
+    path = str(tmp_path / 'data.csv')
+    shutil.copy(DATA_CSV, path)
+    return path
+
+
+def _count(events, tag):
+    return int(np.sum(events['is_repeat']))
+
+
+def test_events_are_keyed_but_not_stored(csv_path):
+    ev = horse_events.load_events(csv_path)
+    assert ev['source'] == horse_events.load_events(csv_path)['source']
+    cache = result_cache.open_cache(csv_path)
+    assert cache.entries() == []
+
+    assert result_cache.on_events(ev, _count, 'a') == result_cache.on_events(ev, _count, 'a')
+    assert (cache.hits, len(cache.entries())) == (1, 1)
+
+
+def test_unkeyable_parameter_is_computed_and_warned_once(csv_path):
+    ev = horse_events.load_events(csv_path)
+    with pytest.warns(RuntimeWarning, match='not cached') as record:
+        for _ in range(2):
+            assert result_cache.on_events(ev, _count, object()) == _count(ev, None)
+    assert len(record) == 1
+    assert result_cache.open_cache(csv_path).entries() == []
@@ -0,0 +1,26 @@
+import numpy as np
+
+from sim_kernel import initial_state, ST_IN_SESSION, ST_STEP, ST_STAKE, ST_GAP
+from walk_forward import make_grid, switch_config, train_returns
+
+
+def test_switch_config_closes_session_of_other_ladder():
+    old, new = make_grid([4], [8], [2.0])[0], make_grid([4], [4], [1.5])[0]
+    state = initial_state(1000.0, old['min_stake'])
+    state[ST_IN_SESSION], state[ST_STEP], state[ST_STAKE], state[ST_GAP] = 1, 6, 64.0, 11
+    out = switch_config(state, old, new)
+    assert out[ST_IN_SESSION] == 0 and out[ST_STEP] == 0
+    assert out[ST_STAKE] == new['min_stake']
+    assert out[ST_GAP] == 11 # The market's gap is not the ladder's
+    assert state[ST_STEP] == 6 # Input untouched
+    # Same config: the run just continues
+    assert switch_config(state, old, dict(old)) is state
+
+
+def test_train_returns_ignore_bankroll_size():
+    # Config 0 doubled from a big bankroll, config 1 tripled from a small one
+    curves = np.array([[1000.0, 2000.0], [100.0, 300.0]])
+    windows = np.array([[0, 1, 1, 2]])
+    ret = train_returns(curves, windows)
+    assert np.argmax(ret[:, 0]) == 1
+    assert np.isneginf(train_returns(np.array([[0.0, 5.0]]), windows)[0, 0])
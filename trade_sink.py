@@ -0,0 +1,108 @@
+import numpy as np
+
+# pyarrow is optional: only needed for .parquet logs
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# What a trade log keeps:
+# - 'off':   nothing written, summary stats only (sweeps, benchmarks)
+# - 'cycle': one row per finished cycle (win / stop / dropped session)
+# - 'bet':   every logged event (the scripts' full trade log)
+DETAILS = ('off', 'cycle', 'bet')
+DETAIL = 'bet'
+CHUNK_ROWS = 50_000 # Rows built and written at a time
+
+
+class TradeSink:
+    """
+    Streaming trade log. Rows are built in chunks by the caller's `build`
+    function and appended to a CSV (or Parquet, by extension) as they
+    come, so a long replay never holds the whole log in memory.
+
+    Gross profit / gross loss are summed from every bet's P&L as it passes,
+    whatever the detail level, so reports don't need the DataFrame.
+    """
+
+    def __init__(self, path=None, detail=DETAIL, chunk_rows=CHUNK_ROWS):
+        if detail not in DETAILS:
+            raise ValueError(f"Unknown trade log detail {detail!r}, expected one of {DETAILS}")
+        self.path = path if detail != 'off' else None
+        self.detail = detail
+        self.chunk_rows = chunk_rows
+        self.parquet = bool(self.path) and self.path.endswith('.parquet')
+        if self.parquet and pq is None:
+            raise ImportError("Parquet trade logs need pyarrow (pip install pyarrow), or use a .csv path")
+
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.trades = 0 # Bets seen
+        self.rows = 0   # Rows written
+        self._header = True
+        self._writer = None
+        self._empty = None
+
+    @property
+    def profit_factor(self):
+        """Same rule as the reports: 999 when nothing was lost."""
+        return self.gross_profit / self.gross_loss if self.gross_loss > 0 else 999.0
+
+    def chunks(self, index, build, cycle_end=None):
+        """Yields the logged rows of `index` (event indices) as DataFrames of up to chunk_rows."""
+        if self.detail == 'off':
+            return
+        index = np.asarray(index)
+        if self.detail == 'cycle' and cycle_end is not None:
+            index = index[np.asarray(cycle_end)[index]]
+        if not len(index):
+            self._empty = build(index)
+        for a in range(0, len(index), self.chunk_rows):
+            yield build(index[a:a + self.chunk_rows])
+
+    def emit(self, index, build, pnl=None, cycle_end=None):
+        """
+        Logs the events `index`. `build(idx)` renders rows for a slice of
+        it, `pnl` (per event, optional) feeds the running stats and
+        `cycle_end` (per event bool) picks the rows kept at 'cycle' detail.
+        """
+        if pnl is not None:
+            index = np.asarray(index)
+            for a in range(0, len(index), self.chunk_rows):
+                part = pnl[index[a:a + self.chunk_rows]]
+                self.gross_profit += part[part > 0].sum()
+                self.gross_loss += abs(part[part < 0].sum())
+                self.trades += len(part)
+        for frame in self.chunks(index, build, cycle_end):
+            self._write(frame)
+
+    def _write(self, frame):
+        if self.path is None:
+            return
+        if self.parquet:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='w' if self._header else 'a', header=self._header, index=False)
+        self._header = False
+        self.rows += len(frame)
+
+    def close(self):
+        # An empty log still gets its header (or schema)
+        if self.path is not None and self.rows == 0 and self._empty is not None:
+            self._write(self._empty)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
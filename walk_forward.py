@@ -0,0 +1,168 @@
+import pandas as pd
+import numpy as np
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from horse_events import load_events
+from sim_kernel import run_kernel, DEFAULT_PARAMS, ST_BANKROLL, ST_IN_SESSION, ST_STEP, ST_STAKE
+from parallel_backtest import slice_events
+
+INPUT_CSV = r"c:\Users\Admin\Desktop\SniperStrategyProject\ny_horses_data.csv"
+OUTPUT_EQUITY = r"c:\Users\Admin\Desktop\SniperStrategyProject\walk_forward_equity.csv"
+
+TRAIN_DAYS = 180
+TEST_DAYS = 30
+
+_WORKER_EVENTS = None
+
+
+def make_grid(entry_gaps, max_steps, multipliers, **common):
+    """Gap/Stop/Multiplier grid as a list of full kernel param dicts."""
+    return [dict(DEFAULT_PARAMS, **common, entry_gap=int(g), max_steps=int(m), multiplier=float(x))
+            for g, m, x in itertools.product(entry_gaps, max_steps, multipliers)]
+
+
+def make_windows(n_days, train_days=TRAIN_DAYS, test_days=TEST_DAYS, step_days=None, anchored=False):
+    """
+    Rolling (or anchored = expanding) windows as an int array of rows
+    (train_start, train_end, test_start, test_end), day indices, ends exclusive.
+    Test slices follow their train slice and, with the default step, tile the
+    history after the first train window.
+    """
+    step_days = step_days or test_days
+    rows = []
+    for train_end in range(train_days, n_days, step_days):
+        train_start = 0 if anchored else train_end - train_days
+        rows.append((train_start, train_end, train_end, min(train_end + test_days, n_days)))
+    return np.array(rows, dtype=np.int64).reshape(-1, 4)
+
+
+def day_start_bankroll(events, result, start=None):
+    """Bankroll at the start of every day 0..n_days (last entry = after the last day)."""
+    n_days = len(events['dates'])
+    ends = np.searchsorted(events['date_idx'], np.arange(n_days + 1), side='left')
+    if start is None:
+        start = result['params']['starting_bankroll']
+    bank = np.concatenate(([start], result['bankroll']))
+    return bank[ends]
+
+
+def _init_worker(events):
+    global _WORKER_EVENTS
+    _WORKER_EVENTS = events
+
+
+def _run_configs(configs, events=None):
+    events = _WORKER_EVENTS if events is None else events
+    return np.array([day_start_bankroll(events, run_kernel(events, **p)) for p in configs])
+
+
+def config_curves(events, grid, workers=None):
+    """
+    (configs x n_days+1) day-start bankroll of one continuous run per config.
+    Any window's P&L is then a difference of two columns, so adding windows
+    costs nothing. Configs are split over a process pool (workers=1 runs inline).
+    """
+    if workers == 1 or len(grid) < 2:
+        return _run_configs(grid, events)
+    workers = workers or os.cpu_count() or 1
+    chunks = [grid[i::workers] for i in range(workers) if grid[i::workers]]
+    with ProcessPoolExecutor(max_workers=len(chunks), initializer=_init_worker, initargs=(events,)) as pool:
+        parts = list(pool.map(_run_configs, chunks))
+    # Undo the round-robin split
+    curves = np.empty((len(grid), len(events['dates']) + 1))
+    for i, part in enumerate(parts):
+        curves[i::len(parts)] = part
+    return curves
+
+
+def switch_config(state, params, new_params):
+    """
+    Kernel state to continue with `new_params`. A session still open under
+    different params is closed (its booked losses stay, no more steps):
+    its step and stake belong to the old ladder and may not fit the new
+    max_steps / multiplier. Gap and cool-down carry over.
+    """
+    if state is None or new_params == params or not state[ST_IN_SESSION]:
+        return state
+    state = np.array(state, dtype=np.float64)
+    state[ST_IN_SESSION] = 0.0
+    state[ST_STEP] = 0.0
+    state[ST_STAKE] = new_params['min_stake']
+    return state
+
+
+def train_returns(curves, windows):
+    """
+    (configs x windows) return over each train slice. Curves compound from one
+    continuous run, so a raw P&L difference would favour configs that were
+    already ahead; a bankroll at or below zero ranks last.
+    """
+    start, end = curves[:, windows[:, 0]], curves[:, windows[:, 1]]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(start > 0, end / start - 1, -np.inf)
+
+
+def walk_forward(events, grid, windows, workers=None):
+    """
+    Picks the best config on every train slice (highest return) and trades
+    it on the following test slice. The test slices are chained through the
+    kernel state, so the stitched out-of-sample curve is one bankroll that
+    switches parameters at each window boundary (see switch_config).
+
+    Returns (windows table, daily OOS equity DataFrame).
+    """
+    curves = config_curves(events, grid, workers=workers)
+    train_pnl = curves[:, windows[:, 1]] - curves[:, windows[:, 0]] # (configs x windows), all at once
+    train_ret = train_returns(curves, windows)
+    best = np.argmax(train_ret, axis=0)
+
+    rows, equity = [], []
+    state = None
+    params = None
+    for w, (tr_a, tr_b, te_a, te_b) in enumerate(windows):
+        state = switch_config(state, params, grid[best[w]])
+        params = grid[best[w]]
+        part = slice_events(events, te_a, te_b)
+        before = params['starting_bankroll'] if state is None else state[ST_BANKROLL]
+        res = run_kernel(part, state=state, **params)
+        state = res['state']
+        equity.append(day_start_bankroll(part, res, start=before)[te_a + 1:te_b + 1])
+        rows.append({
+            'train_start': events['dates'][tr_a],
+            'test_start': events['dates'][te_a],
+            'test_end': events['dates'][te_b - 1],
+            'entry_gap': params['entry_gap'],
+            'max_steps': params['max_steps'],
+            'multiplier': params['multiplier'],
+            'train_pnl': train_pnl[best[w], w],
+            'train_return': train_ret[best[w], w],
+            'oos_pnl': res['final_bankroll'] - before,
+            'oos_bankroll': res['final_bankroll'],
+        })
+
+    days = np.concatenate([np.arange(a, b) for _, _, a, b in windows]) if len(windows) else np.array([], dtype=np.int64)
+    curve = pd.DataFrame({'date': events['dates'][days],
+                          'bankroll': np.concatenate(equity) if equity else []})
+    return pd.DataFrame(rows), curve
+
+
+if __name__ == '__main__':
+    if not os.path.exists(INPUT_CSV):
+        print("Data file not found.")
+    else:
+        ev = load_events(INPUT_CSV)
+        grid = make_grid(range(2, 9), range(4, 9), (1.5, 1.7, 2.0, 2.2))
+        windows = make_windows(len(ev['dates']))
+
+        t0 = time.perf_counter()
+        table, curve = walk_forward(ev, grid, windows)
+        elapsed = time.perf_counter() - t0
+        curve.to_csv(OUTPUT_EQUITY, index=False)
+
+        print(f"# Walk-Forward ({len(grid)} configs x {len(windows)} windows, train {TRAIN_DAYS}d / test {TEST_DAYS}d) in {elapsed:.2f}s")
+        print(table.to_string(index=False, float_format=lambda x: f"{x:,.2f}"))
+        print(f"\nIn-Sample P&L (sum of train picks): ${table['train_pnl'].sum():,.2f}")
+        print(f"Out-of-Sample P&L (stitched): ${table['oos_pnl'].sum():,.2f}")